@@ -18,4 +18,24 @@ MAE = "mae"
 RMSE = "rmse"
 LOG_COSH = "log_cosh"
 
+# Island migration topologies
+RING = "ring"
+FULLY_CONNECTED = "full"
 
+# Population backends
+TREE_BACKEND = "tree"
+ARRAY_BACKEND = "array"
+
+# Racing thresholds
+ELITE_THRESHOLD = "elite"
+
+# Parent selection methods
+TOURNAMENT = "tournament"
+LEXICASE = "lexicase"
+
+# Multi-target fitting: one population per target, or one scored against every target
+PER_TARGET = "per_target"
+SHARED_POPULATION = "shared"
+
+# Bloat control: draws of a variation point before an over-limit child falls back to its parent
+MAX_VARIATION_ATTEMPTS = 10
@@ -0,0 +1,258 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+
+from .gp_node import GPNode
+
+if TYPE_CHECKING:
+    from .gp_tree import GPTree
+
+# Ufuncs that read better as infix operators in the generated source
+_INFIX_UFUNCS = {
+    np.add: "+",
+    np.subtract: "-",
+    np.multiply: "*",
+}
+
+
+class FunctionCache:
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        LRU cache of compiled tree functions, keyed by the tree's canonical prefix string.
+
+        Args:
+            maxsize: Maximum number of compiled functions to keep (0 disables caching)
+        """
+        if maxsize < 0:
+            raise ValueError("maxsize must be non-negative")
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Callable]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Callable]:
+        function = self._entries.get(key)
+        if function is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return function
+
+    def put(self, key: Hashable, function: Callable):
+        if self.maxsize == 0:
+            return
+        self._entries[key] = function
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def resize(self, maxsize: int):
+        """Change the size limit, evicting least recently used entries if needed."""
+        if maxsize < 0:
+            raise ValueError("maxsize must be non-negative")
+        self.maxsize = maxsize
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current fill level."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Process-wide cache used by GPTree.to_function()
+function_cache = FunctionCache()
+
+
+def set_function_cache_size(maxsize: int):
+    """Set the size limit of the process-wide compiled function cache."""
+    function_cache.resize(maxsize)
+
+
+def tree_to_source(tree: "GPTree") -> Tuple[str, Dict[str, object]]:
+    """
+    Translate a tree into the source of a single fused numpy expression.
+
+    Variables become columns of X (in the order of tree.variables), numpy ufuncs
+    are emitted as `np.<name>` calls or infix operators, and any other function
+    is called through a name bound in the returned namespace.
+
+    Args:
+        tree: The GPTree to translate
+
+    Returns:
+        Tuple (source, namespace), e.g. ("lambda X: np.sin(X[:, 0]) * (X[:, 1] + 3.2)", {...})
+    """
+    if tree.root is None:
+        raise ValueError("Cannot generate code for an empty tree")
+
+    var_index = {name: i for i, name in enumerate(tree.variables)}
+    namespace: Dict[str, object] = {"np": np}
+    bound: Dict[int, str] = {}
+
+    def emit(node: GPNode) -> Tuple[str, bool]:
+        # Returns (expression, is_scalar)
+        if not node.is_function():
+            if isinstance(node.value, str):
+                if node.value not in var_index:
+                    raise ValueError(f"Unknown variable '{node.value}'")
+                return f"X[:, {var_index[node.value]}]", False
+            return repr(float(node.value)), True
+
+        expression = node.value.expression
+        children = [emit(child) for child in node.next]
+        is_scalar = all(scalar for _, scalar in children)
+
+        if isinstance(expression, np.ufunc) and expression.nin == len(children):
+            if expression in _INFIX_UFUNCS and len(children) == 2:
+                (left, _), (right, _) = children
+                return f"({left} {_INFIX_UFUNCS[expression]} {right})", is_scalar
+
+        # Everything else receives full columns. Besides protecting callables such as
+        # protected division, this keeps results bit-identical to the interpreter,
+        # since numpy's scalar and vectorized transcendental kernels can differ in the last ulp.
+        args = [f"np.full(X.shape[0], {source})" if scalar else source for source, scalar in children]
+        if isinstance(expression, np.ufunc) and getattr(np, expression.__name__, None) is expression:
+            return f"np.{expression.__name__}({', '.join(args)})", False
+        call_name = _bind(expression, namespace, bound)
+        return f"{call_name}({', '.join(args)})", False
+
+    body, _ = emit(tree.root)
+    return f"lambda X: {body}", namespace
+
+
+def _bind(expression: Callable, namespace: Dict[str, object], bound: Dict[int, str]) -> str:
+    name = bound.get(id(expression))
+    if name is None:
+        name = f"_f{len(bound)}"
+        bound[id(expression)] = name
+        namespace[name] = expression
+    return name
+
+
+def tree_to_row_source(tree: "GPTree") -> Tuple[str, Dict[str, object]]:
+    """
+    Translate a tree into the source of an expression over a single sample.
+
+    Variables become elements of a row x (in the order of tree.variables) and constants
+    stay Python floats, so no array is built. add, sub and mul become Python operators,
+    which round exactly like their ufuncs; other functions are called on the scalars.
+
+    Args:
+        tree: The GPTree to translate
+
+    Returns:
+        Tuple (source, namespace), e.g. ("lambda x: np.sin(x[0]) * (x[1] + 3.2)", {...})
+    """
+    if tree.root is None:
+        raise ValueError("Cannot generate code for an empty tree")
+
+    var_index = {name: i for i, name in enumerate(tree.variables)}
+    namespace: Dict[str, object] = {"np": np}
+    bound: Dict[int, str] = {}
+
+    def emit(node: GPNode) -> str:
+        if not node.is_function():
+            if isinstance(node.value, str):
+                if node.value not in var_index:
+                    raise ValueError(f"Unknown variable '{node.value}'")
+                return f"x[{var_index[node.value]}]"
+            return repr(float(node.value))
+
+        expression = node.value.expression
+        children = [emit(child) for child in node.next]
+        if expression in _INFIX_UFUNCS and len(children) == 2:
+            return f"({children[0]} {_INFIX_UFUNCS[expression]} {children[1]})"
+        if isinstance(expression, np.ufunc) and getattr(np, expression.__name__, None) is expression:
+            return f"np.{expression.__name__}({', '.join(children)})"
+        return f"{_bind(expression, namespace, bound)}({', '.join(children)})"
+
+    return f"lambda x: {emit(tree.root)}", namespace
+
+
+def compile_row_function(tree: "GPTree") -> Optional[Callable]:
+    """
+    Compile a tree into a function of one sample (see tree_to_row_source).
+
+    Returns:
+        Function mapping a sequence of feature values to a float, or None if the
+        tree is too deep for the Python compiler
+    """
+    try:
+        source, namespace = tree_to_row_source(tree)
+        fused = eval(compile(source, "<gp_tree_row>", "eval"), namespace)
+    except (SyntaxError, RecursionError, MemoryError):
+        return None
+
+    def function(x) -> float:
+        return float(fused(x))
+
+    function.source = source
+    return function
+
+
+def compile_tree(tree: "GPTree", cache: Optional[FunctionCache] = None) -> Optional[Callable]:
+    """
+    Compile a tree into a native Python/numpy function, reusing cached functions.
+
+    The cache key is the tree's canonical prefix string together with its variables
+    and the identity of its functions, so trees with the same structure share one
+    compiled function.
+
+    Args:
+        tree: The GPTree to compile
+        cache: FunctionCache to use. Defaults to the process-wide function_cache.
+
+    Returns:
+        Function mapping X of shape (n_samples, n_features) to predictions of shape (n_samples,),
+        or None if the tree is too deep for the Python compiler
+    """
+    if cache is None:
+        cache = function_cache
+
+    key = (repr(tree), tuple(tree.variables), tuple(id(func) for func in tree.func_set))
+    function = cache.get(key)
+    if function is not None:
+        return function
+
+    try:
+        source, namespace = tree_to_source(tree)
+        fused = eval(compile(source, "<gp_tree>", "eval"), namespace)
+    except (SyntaxError, RecursionError, MemoryError):
+        # Very deep trees exceed the parser's nesting limit; callers fall back to the interpreter
+        return None
+
+    def function(X: np.ndarray) -> np.ndarray:
+        result = np.asarray(fused(X), dtype=float)
+        n_samples = X.shape[0]
+        if result.shape != (n_samples,):
+            return np.broadcast_to(result, (n_samples,)).copy()
+        if np.may_share_memory(result, X):
+            return result.copy()
+        return result
+
+    function.source = source
+    cache.put(key, function)
+    return function
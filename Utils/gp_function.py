@@ -1,9 +1,27 @@
+from typing import Callable, Optional, Sequence
+
 class GPFunction:
 
-    def __init__(self, name: str, expression: callable, arity: int):
+    __slots__ = ("name", "expression", "arity", "derivatives")
+
+    def __init__(self, name: str, expression: callable, arity: int,
+                 derivatives: Optional[Sequence[Callable]] = None):
+        """
+        Args:
+            name: Name used in the prefix representation
+            expression: Callable applied to the (vectorized) arguments
+            arity: Number of arguments
+            derivatives: Optional partial derivatives, one callable per argument taking the
+                         same arguments as expression, e.g. (lambda x, y: y, lambda x, y: x)
+                         for multiplication. Used by constant optimization; common numpy
+                         ufuncs are differentiated without them.
+        """
+        if derivatives is not None and len(derivatives) != arity:
+            raise ValueError("derivatives must provide one partial derivative per argument")
         self.name = name
         self.expression = expression
         self.arity = arity
+        self.derivatives = tuple(derivatives) if derivatives is not None else None
 
     def __call__(self, *args):
 
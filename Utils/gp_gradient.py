@@ -0,0 +1,195 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+import numpy as np
+
+from .gp_node import GPNode
+from .gp_function import GPFunction
+from .loss_function import loss_gradient
+
+if TYPE_CHECKING:
+    from .gp_tree import GPTree
+
+
+def _safe_reciprocal(x):
+    return np.divide(1.0, x, out=np.zeros_like(x, dtype=float), where=x != 0)
+
+# Partial derivatives of numpy ufuncs, used when a GPFunction does not provide its own
+UFUNC_DERIVATIVES: Dict[np.ufunc, Tuple[Callable, ...]] = {
+    np.add: (lambda x, y: np.ones_like(x), lambda x, y: np.ones_like(y)),
+    np.subtract: (lambda x, y: np.ones_like(x), lambda x, y: -np.ones_like(y)),
+    np.multiply: (lambda x, y: y, lambda x, y: x),
+    np.divide: (lambda x, y: _safe_reciprocal(y), lambda x, y: -x * _safe_reciprocal(y) ** 2),
+    np.negative: (lambda x: -np.ones_like(x),),
+    np.sin: (np.cos,),
+    np.cos: (lambda x: -np.sin(x),),
+    np.tan: (lambda x: 1.0 / np.cos(x) ** 2,),
+    np.exp: (np.exp,),
+    np.log: (_safe_reciprocal,),
+    np.sqrt: (lambda x: 0.5 * _safe_reciprocal(np.sqrt(x)),),
+    np.tanh: (lambda x: 1.0 - np.tanh(x) ** 2,),
+    np.square: (lambda x: 2.0 * x,),
+    np.abs: (np.sign,),
+}
+
+# Relative step of the central differences used for functions without known derivatives
+_FD_STEP = 1e-6
+
+
+def _partial(func: GPFunction, index: int, args: Sequence[np.ndarray]) -> np.ndarray:
+    """d func / d args[index], evaluated elementwise."""
+    if func.derivatives is not None:
+        return func.derivatives[index](*args)
+    known = UFUNC_DERIVATIVES.get(func.expression)
+    if known is not None and len(known) == func.arity:
+        return known[index](*args)
+    # Central difference on this argument only
+    step = _FD_STEP * np.maximum(1.0, np.abs(args[index]))
+    upper = list(args)
+    lower = list(args)
+    upper[index] = args[index] + step
+    lower[index] = args[index] - step
+    return (np.asarray(func(*upper), dtype=float) - np.asarray(func(*lower), dtype=float)) / (2 * step)
+
+
+def learnable_nodes(root: GPNode) -> List[GPNode]:
+    """Learnable constant (ERC) nodes of a tree, in prefix order."""
+    nodes = []
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        if node.is_learnable_constant():
+            nodes.append(node)
+        pending.extend(reversed(node.next))
+    return nodes
+
+
+def loss_and_gradient(tree: "GPTree",
+                      constants: Sequence[GPNode],
+                      X: np.ndarray,
+                      y: np.ndarray,
+                      loss_function: Callable) -> Tuple[float, np.ndarray]:
+    """
+    Loss of the tree and its gradient with respect to the given constant nodes.
+
+    A forward pass keeps the output column of every node whose subtree holds a learnable
+    constant; a reverse-mode pass then propagates d loss / d output from the root down
+    through the partial derivatives of each GPFunction.
+
+    Args:
+        tree: The tree (its variables give the columns of X)
+        constants: Learnable nodes to differentiate with respect to (see learnable_nodes)
+        X: Input array of shape (n_samples, n_features)
+        y: Targets of shape (n_samples,)
+        loss_function: One of the losses supported by loss_gradient
+
+    Returns:
+        Tuple (loss, gradient) with one gradient entry per node in constants
+    """
+    n_samples = X.shape[0]
+    var_index = {name: i for i, name in enumerate(tree.variables)}
+    position = {id(node): i for i, node in enumerate(constants)}
+    values: Dict[int, np.ndarray] = {}
+    # Subtrees without a learnable constant need no adjoint
+    varies: Dict[int, bool] = {}
+
+    def forward(node: GPNode) -> np.ndarray:
+        if not node.is_function():
+            if isinstance(node.value, str):
+                value = X[:, var_index[node.value]]
+            else:
+                value = np.full(n_samples, node.value, dtype=float)
+            varies[id(node)] = id(node) in position
+        else:
+            args = [forward(child) for child in node.next]
+            value = np.asarray(node.value(*args), dtype=float)
+            if value.shape != (n_samples,):
+                value = np.broadcast_to(value, (n_samples,))
+            varies[id(node)] = any(varies[id(child)] for child in node.next)
+        values[id(node)] = value
+        return value
+
+    predicted = forward(tree.root)
+    loss = float(loss_function(predicted, y))
+    gradient = np.zeros(len(constants))
+
+    pending = [(tree.root, loss_gradient(loss_function, predicted, y))]
+    while pending:
+        node, adjoint = pending.pop()
+        if not varies[id(node)]:
+            continue
+        if not node.is_function():
+            gradient[position[id(node)]] += float(np.sum(adjoint))
+            continue
+        args = [values[id(child)] for child in node.next]
+        for index, child in enumerate(node.next):
+            if varies[id(child)]:
+                pending.append((child, adjoint * _partial(node.value, index, args)))
+    return loss, gradient
+
+
+def optimize_constants(tree: "GPTree",
+                       X: np.ndarray,
+                       y: np.ndarray,
+                       loss_function: Callable,
+                       max_iter: int = 25) -> Optional[float]:
+    """
+    Refine the learnable constants of a tree in place with L-BFGS (scipy.optimize).
+
+    The new constants are kept only if they lower the loss as measured by eval_array;
+    the tree is invalidated either way, since its nodes were modified.
+
+    Args:
+        tree: The tree to tune
+        X: Input array of shape (n_samples, n_features)
+        y: Targets of shape (n_samples,)
+        loss_function: One of the losses supported by loss_gradient
+        max_iter: Maximum number of L-BFGS iterations
+
+    Returns:
+        The new loss if the constants were improved, None otherwise
+    """
+    from scipy.optimize import minimize
+
+    constants = learnable_nodes(tree.root)
+    if not constants:
+        return None
+    initial = np.array([node.value for node in constants], dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    def objective(theta: np.ndarray) -> Tuple[float, np.ndarray]:
+        for node, value in zip(constants, theta):
+            node.value = float(value)
+        with np.errstate(all="ignore"):
+            loss, gradient = loss_and_gradient(tree, constants, X, y, loss_function)
+        if not np.isfinite(loss) or not np.all(np.isfinite(gradient)):
+            # Steer the line search back towards the region where the tree is defined
+            return np.inf, np.zeros_like(theta)
+        return loss, gradient
+
+    with np.errstate(all="ignore"):
+        try:
+            start = float(loss_function(tree.eval_array(X), y))
+        except Exception:
+            return None
+        try:
+            result = minimize(objective, initial, jac=True, method="L-BFGS-B",
+                              options={"maxiter": max_iter})
+            candidate = np.asarray(result.x, dtype=float)
+        except Exception:
+            candidate = initial
+
+    for node, value in zip(constants, candidate):
+        node.value = float(value)
+    tree.invalidate()
+    with np.errstate(all="ignore"):
+        try:
+            loss = float(loss_function(tree.eval_array(X), y))
+        except Exception:
+            loss = np.inf
+    if np.isfinite(loss) and loss < start:
+        return loss
+
+    # No improvement: put the original constants back
+    for node, value in zip(constants, initial):
+        node.value = float(value)
+    tree.invalidate()
+    return None
@@ -1,7 +1,16 @@
+import hashlib
+import struct
+import sys
 from .gp_function import GPFunction
 
+# Shared, immutable child list of every leaf
+EMPTY_CHILDREN = ()
+
 class GPNode:
 
+    # Populations hold millions of nodes; slots drop the per-instance __dict__
+    __slots__ = ("value", "next", "is_learnable", "_hash", "size", "height")
+
     def __init__(self, 
                  value,
                  next=None,
@@ -10,12 +19,21 @@ class GPNode:
         Initialize a GP Node.
         Args:
             value: Either a GPFunction or a terminal value (constant/variable)
-            next: List of child nodes (for function nodes)
+            next: List of child nodes (for function nodes). Leaves share EMPTY_CHILDREN.
             is_learnable: True if this is a learnable constant (ERC), False for variables
         """
+        if isinstance(value, str):
+            # Variable names are interned, so all terminals of a variable share one string
+            value = sys.intern(value)
         self.value = value
-        self.next = next if next is not None else []
+        self.next = next if next else EMPTY_CHILDREN
         self.is_learnable = is_learnable
+        self._hash = None
+        # Subtree metadata, kept up to date by GPTree when subtrees are replaced
+        self.size = 1
+        self.height = 0
+        if self.next:
+            self.refresh()
 
     def is_function(self):
         return isinstance(self.value, GPFunction)
@@ -34,3 +52,53 @@ class GPNode:
     def arity(self):
         return self.value.arity if self.is_function() else 0
 
+    def structural_hash(self) -> bytes:
+        """
+        Merkle-style digest of the subtree rooted at this node.
+        A 128-bit blake2b digest of the function name and arity (or the variable name,
+        or the constant's float64 bytes) followed by the digests of the children, so
+        structurally identical subtrees hash equal and distinct ones practically never
+        do. Unlike hash(), it is the same in every process. The value is cached on the
+        node; call refresh_subtree() on the root after modifying the subtree in place.
+        """
+        if self._hash is None:
+            digest = hashlib.blake2b(digest_size=16)
+            if self.is_function():
+                name = self.value.name.encode()
+                digest.update(b"f" + struct.pack("<II", len(name), self.value.arity) + name)
+                for child in self.next:
+                    digest.update(child.structural_hash())
+            elif isinstance(self.value, str):
+                digest.update(b"v" + self.value.encode())
+            else:
+                digest.update((b"c" if self.is_learnable else b"k") + struct.pack("<d", float(self.value)))
+            self._hash = digest.digest()
+        return self._hash
+
+    def refresh(self):
+        """
+        Recompute size and height from the (up to date) children and drop the cached hash.
+        Only this node is updated, so a replaced subtree costs O(depth) to propagate.
+        """
+        size = 1
+        height = -1
+        for child in self.next:
+            size += child.size
+            if child.height > height:
+                height = child.height
+        self.size = size
+        self.height = height + 1
+        self._hash = None
+
+    def refresh_subtree(self):
+        """Recompute the metadata of this node and all its descendants (after manual edits)."""
+        # Post-order: children are refreshed before their parents
+        order = []
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            pending.extend(node.next)
+        for node in reversed(order):
+            node.refresh()
+
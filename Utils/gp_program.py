@@ -0,0 +1,286 @@
+import threading
+import numpy as np
+from typing import List, Optional, Sequence
+
+from .gp_node import GPNode
+from .gp_function import GPFunction
+
+# Opcodes for terminals. Function nodes use their (non-negative) index in func_set.
+VAR = -1        # Variable, operand is the index into the tree's variables
+ERC = -2        # Learnable constant (ephemeral random constant)
+CONST = -3      # Fixed (non-learnable) numeric constant
+
+# Per-thread scratch buffers shared by every program, grown on demand
+_scratch = threading.local()
+
+
+def _stack_buffers(stack_size: int, n_samples: int) -> np.ndarray:
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None or buffers.shape[1] < n_samples or buffers.shape[0] < stack_size:
+        buffers = np.empty((max(stack_size, 0 if buffers is None else buffers.shape[0]),
+                            max(n_samples, 0 if buffers is None else buffers.shape[1])), dtype=float)
+        _scratch.buffers = buffers
+    # Rows stay contiguous, so a chunk shorter than the buffers reuses them
+    return buffers[:, :n_samples]
+
+
+def subtree_sizes(codes: np.ndarray, arities: np.ndarray) -> np.ndarray:
+    """
+    Compute the subtree size at every position of a prefix-encoded tree.
+
+    Args:
+        codes: Prefix opcodes (function index >= 0, negative for terminals)
+        arities: Arity of each function index
+
+    Returns:
+        Array of subtree sizes, aligned with codes
+    """
+    sizes = np.ones(len(codes), dtype=np.int32)
+    stack = []
+    for i in range(len(codes) - 1, -1, -1):
+        code = codes[i]
+        if code >= 0:
+            for _ in range(arities[code]):
+                sizes[i] += stack.pop()
+        stack.append(int(sizes[i]))
+    return sizes
+
+
+def decode(func_set: Sequence[GPFunction],
+           codes: np.ndarray,
+           operands: np.ndarray,
+           constants: np.ndarray,
+           variables: List[str]) -> GPNode:
+    """
+    Build a tree of GPNodes from prefix-encoded arrays, without compiling a GPProgram.
+
+    Args:
+        func_set: Functions referenced by the non-negative opcodes
+        codes: Opcode per node
+        operands: Index into variables for VAR nodes
+        constants: Value for ERC / CONST nodes
+        variables: Variable names, indexed by the VAR operands
+
+    Returns:
+        Root node of the decoded tree
+    """
+    stack = []
+    push, pop = stack.append, stack.pop
+    arities = [func.arity for func in func_set]
+    # Plain lists: indexing numpy arrays element by element is much slower
+    for code, operand, constant in zip(reversed(codes.tolist()), reversed(operands.tolist()),
+                                       reversed(constants.tolist())):
+        if code >= 0:
+            # The first child is on top of the stack
+            arity = arities[code]
+            if arity == 2:
+                children = [pop(), pop()]
+            elif arity == 1:
+                children = [pop()]
+            else:
+                children = [pop() for _ in range(arity)]
+            push(GPNode(func_set[code], next=children))
+        elif code == VAR:
+            push(GPNode(variables[operand], is_learnable=False))
+        else:
+            push(GPNode(constant, is_learnable=code == ERC))
+    return stack[0]
+
+
+class GPProgram:
+
+    def __init__(self,
+                 func_set: Sequence[GPFunction],
+                 codes: np.ndarray,
+                 operands: np.ndarray,
+                 constants: np.ndarray):
+        """
+        Flat prefix-order encoding of a GP tree.
+
+        Args:
+            func_set: Functions referenced by the non-negative opcodes
+            codes: Opcode per node, either an index into func_set or VAR / ERC / CONST
+            operands: Index into the tree's variables for VAR nodes, 0 otherwise
+            constants: Value for ERC / CONST nodes, 0.0 otherwise
+        """
+        self.func_set = tuple(func_set)
+        self.codes = codes
+        self.operands = operands
+        self.constants = constants
+        self._sizes = None
+        self._instructions = None
+        self.stack_size = self._required_stack_size()
+
+    @classmethod
+    def compile(cls, root: GPNode, func_set: Sequence[GPFunction], variables: List[str]) -> "GPProgram":
+        """
+        Compile a tree of GPNodes into a flat prefix program.
+
+        Args:
+            root: Root node of the tree
+            func_set: Function set of the tree, used to resolve function indices
+            variables: Variable names of the tree, used to resolve variable indices
+
+        Returns:
+            The compiled GPProgram
+        """
+        if root is None:
+            raise ValueError("Cannot compile an empty tree")
+
+        func_index = {id(func): i for i, func in enumerate(func_set)}
+        func_list = list(func_set)
+        var_index = {name: i for i, name in enumerate(variables)}
+
+        codes, operands, constants = [], [], []
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if node.is_function():
+                index = func_index.get(id(node.value))
+                if index is None:
+                    # Function not part of the tree's set (e.g. swapped in by hand)
+                    index = len(func_list)
+                    func_index[id(node.value)] = index
+                    func_list.append(node.value)
+                codes.append(index)
+                operands.append(0)
+                constants.append(0.0)
+                # Push children in reverse so the first child is visited next
+                pending.extend(reversed(node.next))
+            elif isinstance(node.value, str):
+                if node.value not in var_index:
+                    raise ValueError(f"Unknown variable '{node.value}'")
+                codes.append(VAR)
+                operands.append(var_index[node.value])
+                constants.append(0.0)
+            else:
+                codes.append(ERC if node.is_learnable else CONST)
+                operands.append(0)
+                constants.append(float(node.value))
+
+        return cls(func_list,
+                   np.array(codes, dtype=np.int32),
+                   np.array(operands, dtype=np.int32),
+                   np.array(constants, dtype=float))
+
+    def _required_stack_size(self) -> int:
+        depth = 0
+        max_depth = 0
+        for code in self.codes[::-1]:
+            if code >= 0:
+                depth -= self.func_set[code].arity
+            depth += 1
+            max_depth = max(max_depth, depth)
+        return max_depth
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Subtree size for every position; the subtree at i spans codes[i:i + sizes[i]]."""
+        if self._sizes is None:
+            arities = np.array([func.arity for func in self.func_set], dtype=np.int32)
+            self._sizes = subtree_sizes(self.codes, arities)
+        return self._sizes
+
+    def to_node(self, variables: List[str]) -> GPNode:
+        """
+        Decode the program back into a tree of GPNodes.
+
+        Args:
+            variables: Variable names, indexed by the VAR operands
+
+        Returns:
+            Root node of the decoded tree
+        """
+        return decode(self.func_set, self.codes, self.operands, self.constants, variables)
+
+    def _instruction_list(self) -> List[tuple]:
+        # Right-to-left (code, payload, arity, in_place) tuples, decoded once per program:
+        # payload is the operand of VAR, the value of ERC / CONST, or the function's
+        # expression, and in_place marks ufuncs that can write into their stack slot.
+        if self._instructions is None:
+            instructions = []
+            for code, operand, value in zip(reversed(self.codes.tolist()), reversed(self.operands.tolist()),
+                                            reversed(self.constants.tolist())):
+                if code == VAR:
+                    instructions.append((VAR, operand, 0, False))
+                elif code < 0:
+                    instructions.append((code, value, 0, False))
+                else:
+                    expression, arity = self.func_set[code].expression, self.func_set[code].arity
+                    in_place = isinstance(expression, np.ufunc) and expression.nin == arity
+                    instructions.append((code, expression, arity, in_place))
+            self._instructions = instructions
+        return self._instructions
+
+    def execute(self, X: np.ndarray, columns: Optional[Sequence[int]] = None,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Evaluate the program over a batch of samples.
+
+        The prefix program is run right to left on a stack of column buffers that
+        is allocated once per call (and reused across calls on the same thread).
+        Numpy ufuncs write straight into their stack slot via `out=`.
+
+        Args:
+            X: Input array of shape (n_samples, n_features)
+            columns: Column of X for each variable index. Defaults to the identity.
+            out: Optional preallocated float array of shape (n_samples,) for the result.
+                 It takes the place of the bottom stack slot, so no result copy is made.
+
+        Returns:
+            Array of shape (n_samples,) with one prediction per row (out, if given)
+        """
+        n_samples = X.shape[0]
+        buffers = _stack_buffers(self.stack_size, n_samples)
+        slots = list(buffers)
+        if out is not None:
+            # Only values bound for the bottom of the stack (ultimately the result) use slot 0
+            slots[0] = out
+        values = [None] * self.stack_size
+
+        sp = 0
+        for code, payload, arity, in_place in self._instruction_list():
+            if code >= 0:
+                # The first child is on top of the stack
+                if arity == 2:
+                    args = (values[sp - 1], values[sp - 2])
+                elif arity == 1:
+                    args = (values[sp - 1],)
+                else:
+                    args = values[sp - arity:sp][::-1]
+                sp -= arity
+                if in_place:
+                    values[sp] = payload(*args, out=slots[sp])
+                else:
+                    result = payload(*args)
+                    if isinstance(result, np.ndarray) and np.may_share_memory(result, buffers):
+                        # Pass-through functions may return another slot's buffer
+                        np.copyto(slots[sp], result)
+                        result = slots[sp]
+                    values[sp] = result
+            elif code == VAR:
+                column = payload if columns is None else columns[payload]
+                if column < 0:
+                    raise ValueError("Variable is not mapped to a column of X")
+                values[sp] = X[:, column]
+            else:
+                buffer = slots[sp]
+                buffer.fill(payload)
+                values[sp] = buffer
+            sp += 1
+
+        if out is not None:
+            if values[0] is not out:
+                # A variable, or a function returning a new array
+                np.copyto(out, values[0])
+            return out
+        result = np.asarray(values[0], dtype=float)
+        if result.shape != (n_samples,):
+            return np.broadcast_to(result, (n_samples,)).copy()
+        # Never hand out a scratch buffer or a view into X
+        if np.may_share_memory(result, buffers) or np.may_share_memory(result, X):
+            return result.copy()
+        return result
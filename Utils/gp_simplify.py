@@ -0,0 +1,163 @@
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+from .gp_node import GPNode
+from .gp_function import GPFunction
+
+# A rule receives a function node whose children are already simplified and returns
+# an equivalent replacement node, or None to leave the node as it is.
+Rule = Callable[[GPNode], Optional[GPNode]]
+
+# Rules by GPFunction expression, so every GPFunction wrapping the same callable shares them
+_RULES: Dict[Callable, List[Rule]] = {}
+
+
+def register_rule(function: "GPFunction | Callable", rule: Rule):
+    """
+    Register a simplification rule for a function.
+
+    Rules must preserve the function's semantics for finite inputs; they are tried in
+    registration order after constant folding.
+
+    Args:
+        function: A GPFunction, or the callable it wraps (its expression)
+        rule: Callable taking a function node and returning a replacement node or None
+    """
+    expression = function.expression if isinstance(function, GPFunction) else function
+    _RULES.setdefault(expression, []).append(rule)
+
+
+def rules_for(function: GPFunction) -> List[Rule]:
+    """Rules registered for the callable wrapped by function."""
+    return _RULES.get(function.expression, [])
+
+
+def is_constant(node: GPNode, value: Optional[float] = None) -> bool:
+    """Whether node is a numeric terminal (equal to value, if given)."""
+    if node.is_function() or isinstance(node.value, str):
+        return False
+    return value is None or node.value == value
+
+
+def same_subtree(a: GPNode, b: GPNode) -> bool:
+    """Structural equality of two subtrees (same functions, variables and constants)."""
+    if a is b:
+        return True
+    if a.structural_hash() != b.structural_hash() or a.size != b.size:
+        return False
+    pending = [(a, b)]
+    while pending:
+        left, right = pending.pop()
+        if left.is_function() != right.is_function() or len(left.next) != len(right.next):
+            return False
+        if left.is_function():
+            if left.value.expression is not right.value.expression:
+                return False
+        elif left.value != right.value or left.is_learnable != right.is_learnable:
+            return False
+        pending.extend(zip(left.next, right.next))
+    return True
+
+
+def constant_node(value: float) -> GPNode:
+    """A new learnable constant node."""
+    return GPNode(float(value), is_learnable=True)
+
+
+def _fold(node: GPNode) -> Optional[GPNode]:
+    # Evaluate a function of constants once, on length-1 columns like the vectorized path
+    if not all(is_constant(child) for child in node.next):
+        return None
+    try:
+        with np.errstate(all="ignore"):
+            value = np.asarray(node.value(*[np.full(1, child.value, dtype=float) for child in node.next]),
+                               dtype=float)
+    except Exception:
+        return None
+    if value.size != 1 or not np.isfinite(value).all():
+        return None
+    return constant_node(value.reshape(-1)[0])
+
+
+def simplify_node(node: GPNode) -> GPNode:
+    """
+    Simplify the subtree rooted at node, bottom-up.
+
+    Constant-only subtrees are folded into one learnable constant, then the rules
+    registered for the function are applied. Unchanged subtrees are returned as is;
+    changed ones are rebuilt, so the input subtree is never modified.
+
+    Args:
+        node: Root of the subtree
+
+    Returns:
+        The simplified subtree (node itself if nothing changed)
+    """
+    if not node.is_function():
+        return node
+
+    children = [simplify_node(child) for child in node.next]
+    if any(new is not old for new, old in zip(children, node.next)):
+        node = GPNode(node.value, next=children, is_learnable=node.is_learnable)
+
+    folded = _fold(node)
+    if folded is not None:
+        return folded
+    for rule in rules_for(node.value):
+        replacement = rule(node)
+        if replacement is not None:
+            return replacement
+    return node
+
+
+# ----- Rules for the default function set -----
+# These hold for finite values; inf and nan can behave differently (e.g. 0 * inf).
+
+def _add_zero(node: GPNode) -> Optional[GPNode]:
+    left, right = node.next
+    if is_constant(left, 0.0):
+        return right
+    if is_constant(right, 0.0):
+        return left
+    return None
+
+
+def _sub_rules(node: GPNode) -> Optional[GPNode]:
+    left, right = node.next
+    if is_constant(right, 0.0):
+        return left
+    if same_subtree(left, right):
+        return constant_node(0.0)
+    return None
+
+
+def _mul_rules(node: GPNode) -> Optional[GPNode]:
+    left, right = node.next
+    if is_constant(left, 0.0) or is_constant(right, 0.0):
+        return constant_node(0.0)
+    if is_constant(left, 1.0):
+        return right
+    if is_constant(right, 1.0):
+        return left
+    return None
+
+
+def _div_by_one(node: GPNode) -> Optional[GPNode]:
+    if is_constant(node.next[1], 1.0):
+        return node.next[0]
+    return None
+
+
+def protected_div_rules(node: GPNode) -> Optional[GPNode]:
+    """Rules for a division that returns 0 where the divisor is 0."""
+    left, right = node.next
+    if is_constant(left, 0.0) or is_constant(right, 0.0):
+        return constant_node(0.0)
+    return _div_by_one(node)
+
+
+register_rule(np.add, _add_zero)
+register_rule(np.subtract, _sub_rules)
+register_rule(np.multiply, _mul_rules)
+register_rule(np.divide, _div_by_one)
+# np.sin and np.cos only need constant folding, which applies to every function
@@ -1,8 +1,15 @@
 from .gp_node import GPNode
 from .gp_function import GPFunction
+from .gp_program import GPProgram
+from . import gp_codegen
+from .gp_simplify import simplify_node
+from .subtree_cache import SubtreeCache
+import hashlib
 import random
+import sys
+import numpy as np
 from utils import constant
-from typing import List, Union, Iterable
+from typing import List, Union, Iterable, Dict, Optional, Tuple
 
 class GPTree:
     def __init__(self,
@@ -22,11 +29,132 @@ class GPTree:
             root: Root node of the tree
         """
         self.func_set = list(func_set)
-        self.variables = list(variables) if variables else []
+        # Interned like the variable terminals of GPNode, so mutation reuses the same strings
+        self.variables = [sys.intern(v) if isinstance(v, str) else v for v in variables] if variables else []
         self.use_erc = use_erc
         self.erc_range = erc_range
+        self._program = None
+        self._function = None
         self.root = root
         self.fitness = None
+
+    @property
+    def root(self) -> GPNode:
+        return self._root
+
+    @root.setter
+    def root(self, node: GPNode):
+        self._root = node
+        self._program = None
+        self._function = None
+
+    def invalidate(self):
+        """
+        Drop any compiled form and recompute the cached metadata (size, height, hash) of every node.
+        Must be called whenever nodes are modified in place outside of the GPTree methods
+        (e.g. constant tuning or hand edits).
+        """
+        self._reset_compiled()
+        if self._root is not None:
+            self._root.refresh_subtree()
+
+    def _reset_compiled(self):
+        self._program = None
+        self._function = None
+
+    def _node_at(self, index: int, start: GPNode = None) -> Tuple[GPNode, List[GPNode]]:
+        """
+        Return the node at a pre-order index below start (default: the root), together
+        with the path of its ancestors. Walks down using the cached subtree sizes, O(depth).
+        """
+        node = self.root if start is None else start
+        path = []
+        while index:
+            index -= 1
+            path.append(node)
+            for child in node.next:
+                if index < child.size:
+                    node = child
+                    break
+                index -= child.size
+        return node, path
+
+    def _random_node(self) -> Tuple[GPNode, List[GPNode]]:
+        """Pick a node uniformly at random, returning it with the path of its ancestors."""
+        return self._node_at(random.randrange(self.root.size))
+
+    def _replace_node(self, node: GPNode, path: List[GPNode], new_subtree: GPNode):
+        """
+        Overwrite node in place with the (detached) new_subtree and update the metadata
+        of its ancestors, given by path as returned from _node_at.
+        """
+        node.value = new_subtree.value
+        node.next = new_subtree.next
+        node.is_learnable = new_subtree.is_learnable
+        node.size = new_subtree.size
+        node.height = new_subtree.height
+        node._hash = new_subtree._hash
+        for ancestor in reversed(path):
+            ancestor.refresh()
+        self._reset_compiled()
+
+    def structural_hash(self) -> bytes:
+        """Canonical digest of the tree structure (see GPNode.structural_hash)."""
+        if self.root is None:
+            return hashlib.blake2b(constant.EMPTY_TREE.encode(), digest_size=16).digest()
+        return self.root.structural_hash()
+
+    def __getstate__(self):
+        # Generated functions are closures and cannot be pickled; compiled forms are rebuilt on demand
+        state = self.__dict__.copy()
+        state["_program"] = None
+        state["_function"] = None
+        return state
+
+    def simplify(self):
+        """
+        Simplify the tree in place: fold constant-only subtrees into one learnable constant
+        and apply the identity/annihilator rules registered per function (see gp_simplify).
+        Predictions are unchanged for finite intermediate values, up to floating-point rounding.
+
+        Returns:
+            Self (for method chaining)
+        """
+        if self.root is not None:
+            root = simplify_node(self.root)
+            if root is not self.root:
+                self.root = root
+        return self
+
+    def compile(self) -> GPProgram:
+        """Return the flat prefix program for this tree, compiling it on first use."""
+        if self._program is None:
+            self._program = GPProgram.compile(self.root, self.func_set, self.variables)
+        return self._program
+
+    def to_source(self) -> str:
+        """Return the tree as the source of a fused numpy lambda over X, e.g. 'lambda X: np.sin(X[:, 0])'."""
+        source, _ = gp_codegen.tree_to_source(self)
+        return source
+
+    def to_function(self, cache: Optional[gp_codegen.FunctionCache] = None):
+        """
+        Compile the tree into a native numpy function and keep it on the tree.
+
+        Once compiled, eval_array calls the fused expression instead of the
+        interpreter. Compiled functions are shared through an LRU cache keyed
+        by the canonical prefix string (see gp_codegen.function_cache).
+
+        Args:
+            cache: FunctionCache to use. Defaults to the process-wide cache.
+
+        Returns:
+            Function mapping X of shape (n_samples, n_features) to predictions,
+            or None if the tree is too deep to be compiled
+        """
+        if self._function is None:
+            self._function = gp_codegen.compile_tree(self, cache)
+        return self._function
      
     def random_init(self, min_d: int, max_d: int, method: str) -> GPNode:
         if method.lower() not in (constant.FULL, constant.GROW):
@@ -84,6 +212,84 @@ class GPTree:
         evaluated_args = [self._eval_recursive(child, **kwargs) for child in node.next]
         return node.value(*evaluated_args)
 
+    def eval_array(self,
+                   X: np.ndarray,
+                   variable_index: Optional[Dict[str, int]] = None,
+                   cache: Optional[SubtreeCache] = None) -> np.ndarray:
+        """
+        Evaluate the tree over a whole batch of samples in a single tree walk.
+
+        Every node receives full feature columns of shape (n_samples,), so the
+        numpy ufuncs wrapped by the GPFunctions do the per-sample work. The tree
+        is compiled once into a GPProgram which is cached until the tree changes.
+
+        Args:
+            X: Input array of shape (n_samples, n_features)
+            variable_index: Mapping from variable name to column index in X.
+                Defaults to the position of each name in self.variables.
+            cache: Optional SubtreeCache bound to X. Subtrees already evaluated by any
+                tree sharing the cache are looked up by structural hash instead of
+                being recomputed. The returned array is then read-only.
+
+        Returns:
+            Array of shape (n_samples,) with one prediction per row
+        """
+        if self.root is None:
+            raise ValueError("Cannot evaluate an empty tree")
+
+        X = np.asarray(X)
+        if X.ndim != 2:
+            raise ValueError("X must be a 2D array of shape (n_samples, n_features)")
+
+        columns = None
+        if variable_index is not None:
+            columns = [variable_index.get(name, -1) for name in self.variables]
+            if columns == list(range(len(self.variables))):
+                columns = None
+
+        if cache is not None and columns is None:
+            cache.bind(X)
+            var_index = {name: i for i, name in enumerate(self.variables)}
+            result, _ = self._eval_cached(self.root, X, var_index, cache)
+            if result.shape != (X.shape[0],):
+                result = np.broadcast_to(result, (X.shape[0],)).copy()
+            return result
+        if self._function is not None and columns is None:
+            return self._function(X)
+        return self.compile().execute(X, columns)
+
+    def _eval_cached(self,
+                     node: GPNode,
+                     X: np.ndarray,
+                     var_index: Dict[str, int],
+                     cache: SubtreeCache) -> Tuple[np.ndarray, int]:
+        # Returns (output column, subtree size)
+        if not node.is_function():
+            if isinstance(node.value, str):
+                if node.value not in var_index:
+                    raise ValueError(f"Unknown variable '{node.value}'")
+                return X[:, var_index[node.value]], 1
+            return np.full(X.shape[0], node.value, dtype=float), 1
+
+        key = node.structural_hash()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        size = 1
+        evaluated_args = []
+        for child in node.next:
+            column, child_size = self._eval_cached(child, X, var_index, cache)
+            evaluated_args.append(column)
+            size += child_size
+
+        result = np.asarray(node.value(*evaluated_args), dtype=float)
+        if np.may_share_memory(result, X):
+            # Never freeze a view into the caller's data
+            result = result.copy()
+        cache.put(key, result, size)
+        return result, size
+
     def copy(self):
         new_tree = GPTree(self.func_set, 
                          variables=self.variables,
@@ -91,38 +297,54 @@ class GPTree:
                          erc_range=self.erc_range)
         if self.root is not None:
             new_tree.root = self._copy_node(self.root)
+            # Compiled forms are immutable, so the copy can share them
+            new_tree._program = self._program
+            new_tree._function = self._function
         return new_tree
     
     def _copy_node(self, node: GPNode) -> GPNode:
         if node is None:
             return None
         copied_children = [self._copy_node(child) for child in node.next]
-        return GPNode(node.value, next=copied_children, is_learnable=node.is_learnable)
+        copied = GPNode(node.value, next=copied_children, is_learnable=node.is_learnable)
+        copied._hash = node._hash
+        return copied
 
-    def mutate(self, mutate_type: str):
+    def mutate(self, mutate_type: str,
+               max_tree_depth: Optional[int] = None,
+               max_tree_size: Optional[int] = None):
+        """
+        Mutate the tree in place.
+
+        Args:
+            mutate_type: 'point', 'subtree' or 'hoist'
+            max_tree_depth: Optional depth limit for the mutated tree (subtree mutation only,
+                            point and hoist mutation never grow the tree)
+            max_tree_size: Optional node count limit for the mutated tree (subtree mutation only)
 
+        Returns:
+            Self. If no subtree within the limits is found after MAX_VARIATION_ATTEMPTS
+            draws, the tree is left unchanged.
+        """
         if self.root is None:
             raise ValueError("Cannot mutate an empty tree")
         
         if mutate_type.lower() == constant.POINT:
             self._point_mutation()
         elif mutate_type.lower() == constant.SUBTREE:
-            self._subtree_mutation()
+            self._subtree_mutation(max_tree_depth=max_tree_depth, max_tree_size=max_tree_size)
         elif mutate_type.lower() == constant.HOIST:
             self._hoist_mutation()
         else:
             raise ValueError(f"mutate_type must be either '{constant.POINT}', '{constant.SUBTREE}', or '{constant.HOIST}'")
         
+        # The mutation operators keep the node metadata up to date themselves
+        self._reset_compiled()
         return self
 
     def _point_mutation(self):
 
-        all_nodes = self._collect_all_nodes(self.root)
-        
-        if not all_nodes:
-            return
-        
-        node_to_mutate = random.choice(all_nodes)
+        node_to_mutate, path = self._random_node()
         
         if node_to_mutate.is_function():
             same_arity_funcs = [f for f in self.func_set if f.arity == node_to_mutate.value.arity]
@@ -144,20 +366,32 @@ class GPTree:
                     new_terminal = self._choose_random_element(self.variables)
                     node_to_mutate.value = new_terminal
                     node_to_mutate.is_learnable = False
+        
+        # Shape is unchanged, only the hashes up to the root are stale
+        node_to_mutate._hash = None
+        for ancestor in path:
+            ancestor._hash = None
 
-    def _subtree_mutation(self, max_depth: int = 3):
+    def _subtree_mutation(self, max_depth: int = 3,
+                          max_tree_depth: Optional[int] = None,
+                          max_tree_size: Optional[int] = None):
 
-        all_nodes = self._collect_all_nodes(self.root)
-        
-        if not all_nodes:
+        for _ in range(constant.MAX_VARIATION_ATTEMPTS):
+            node_to_replace, path = self._random_node()
+
+            depth = max_depth
+            if max_tree_depth is not None:
+                # Growing no deeper than the room left below the node keeps the depth limit
+                depth = min(depth, max_tree_depth - len(path))
+                if depth < 0:
+                    continue
+            new_subtree = self._random_init_recursive(0, depth, constant.GROW)
+
+            if max_tree_size is not None and \
+                    self.root.size - node_to_replace.size + new_subtree.size > max_tree_size:
+                continue
+            self._replace_node(node_to_replace, path, new_subtree)
             return
-        
-        node_to_replace = random.choice(all_nodes)
-        
-        new_subtree = self._random_init_recursive(0, max_depth, constant.GROW)
-        
-        node_to_replace.value = new_subtree.value
-        node_to_replace.next = new_subtree.next
 
     def _hoist_mutation(self):
         """
@@ -165,35 +399,23 @@ class GPTree:
         and replace the larger subtree with the smaller one.
         This helps reduce tree size and control bloat.
         """
-        all_nodes = self._collect_all_nodes(self.root)
-        
-        # Filter nodes that have at least one child (function nodes)
-        function_nodes = [node for node in all_nodes if node.is_function() and node.next]
-        
-        if not function_nodes:
-            # If no function nodes, fall back to point mutation
+        if self.root.size == 1:
+            # A single terminal has no subtree to hoist, fall back to point mutation
             self._point_mutation()
             return
         
-        # Select a random subtree (must be a function node)
-        selected_subtree = random.choice(function_nodes)
+        # Select a random subtree (must be a function node with children);
+        # rejection sampling stays uniform over function nodes without building a list
+        selected_subtree, path = self._random_node()
+        while not selected_subtree.next:
+            selected_subtree, path = self._random_node()
         
-        # Collect all nodes within this subtree
-        subtree_nodes = self._collect_all_nodes(selected_subtree)
-        
-        # If the subtree only has the root, we can't hoist anything
-        if len(subtree_nodes) <= 1:
-            # Fall back to point mutation
-            self._point_mutation()
-            return
-        
-        # Select a random node from within the subtree (excluding the root)
+        # Select a random node from within the subtree (excluding its root)
         # This will be hoisted up to replace the selected_subtree
-        node_to_hoist = random.choice(subtree_nodes[1:])  # Exclude the first element (root)
+        node_to_hoist, _ = self._node_at(random.randrange(1, selected_subtree.size), start=selected_subtree)
         
         # Replace the selected subtree with the hoisted node
-        selected_subtree.value = node_to_hoist.value
-        selected_subtree.next = node_to_hoist.next
+        self._replace_node(selected_subtree, path, node_to_hoist)
 
     def _collect_all_nodes(self, node: GPNode) -> List[GPNode]:
 
@@ -208,28 +430,24 @@ class GPTree:
         return nodes
 
     def get_depth(self, node: GPNode = None) -> int:
-
+        """Height of the subtree at node (default: the root), read from the cached metadata."""
         if node is None:
             node = self.root
         
-        if node is None or not node.next:
+        if node is None:
             return 0
         
-        return 1 + max(self.get_depth(child) for child in node.next)
+        return node.height
 
     def count_nodes(self, node: GPNode = None) -> int:
-
+        """Number of nodes below node (default: the root), read from the cached metadata."""
         if node is None:
             node = self.root
         
         if node is None:
             return 0
         
-        count = 1
-        for child in node.next:
-            count += self.count_nodes(child)
-        
-        return count
+        return node.size
 
     def __repr__(self):
         return self._prefix(self.root)
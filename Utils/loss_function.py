@@ -16,6 +16,18 @@ def log_cosh(predicted: np.ndarray, actual: np.ndarray) -> float:
     """Log Cosh Loss: log(cosh(predicted - actual))
     Smoother than L1, less sensitive to outliers than L2.
     """
+    return np.mean(log_cosh_error(predicted, actual))
+
+# Per-row errors, used by the losses above and by PartialLoss
+
+def squared_error(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    return (predicted - actual) ** 2
+
+def absolute_error(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    return np.abs(predicted - actual)
+
+def log_cosh_error(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Per-row log(cosh(predicted - actual)), computed without overflow."""
     error = predicted - actual
     # Use numpy's vectorized operations
     # For large errors, log(cosh(x)) approx |x| - log(2)
@@ -39,4 +51,130 @@ def log_cosh(predicted: np.ndarray, actual: np.ndarray) -> float:
     # Calculate for large values using approximation
     loss[large_mask] = abs_error[large_mask] - np.log(2)
     
-    return np.mean(loss)
+    return loss
+
+# loss function -> (per-row error, transform applied to the mean error)
+_ROW_ERRORS = {
+    mse: (squared_error, None),
+    rmse: (squared_error, np.sqrt),
+    mae: (absolute_error, None),
+    log_cosh: (log_cosh_error, None),
+}
+
+def supports_partial(loss_function) -> bool:
+    """Whether the loss can be accumulated chunk by chunk with PartialLoss."""
+    return loss_function in _ROW_ERRORS
+
+def target_losses(loss_function, predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """
+    Loss of one prediction vector against several targets, as one matrix operation.
+
+    Args:
+        loss_function: One of mse, rmse, mae or log_cosh
+        predicted: Predictions of shape (n_samples,)
+        actual: Targets of shape (n_samples, n_targets)
+
+    Returns:
+        Array of shape (n_targets,) with the loss against each column of actual
+    """
+    if not supports_partial(loss_function):
+        raise ValueError("Multi-target losses are only available for mse, rmse, mae and log_cosh")
+    row_error, transform = _ROW_ERRORS[loss_function]
+    losses = row_error(predicted[:, None], actual).mean(axis=0)
+    return transform(losses) if transform is not None else losses
+
+class PartialLoss:
+
+    def __init__(self, loss_function):
+        """
+        Mergeable partial statistics of a loss over a subset of rows.
+
+        Every supported loss is a (transformed) mean of per-row errors, so the state is
+        just the error sum and the row count: chunks can be accumulated in any order and
+        partial results from different workers combined with merge().
+
+        Args:
+            loss_function: One of mse, rmse, mae or log_cosh
+        """
+        if not supports_partial(loss_function):
+            raise ValueError("Partial losses are only available for mse, rmse, mae and log_cosh")
+        self.loss_function = loss_function
+        self.total = 0.0
+        self.count = 0
+
+    def update(self, predicted: np.ndarray, actual: np.ndarray):
+        """Add the errors of one chunk of rows."""
+        row_error, _ = _ROW_ERRORS[self.loss_function]
+        errors = row_error(predicted, actual)
+        self.total += float(np.sum(errors))
+        self.count += errors.size
+
+    def merge(self, other: "PartialLoss"):
+        """Add the statistics accumulated by another PartialLoss of the same loss."""
+        if other.loss_function is not self.loss_function:
+            raise ValueError("Cannot merge partial statistics of different losses")
+        self.total += other.total
+        self.count += other.count
+
+    def lower_bound(self, n_samples: int) -> float:
+        """
+        Smallest loss the full dataset of n_samples rows can still reach, given the rows
+        seen so far (every per-row error is non-negative, so unseen rows add at least 0).
+        """
+        _, transform = _ROW_ERRORS[self.loss_function]
+        mean = self.total / n_samples
+        return float(transform(mean)) if transform is not None else mean
+
+    def value(self) -> float:
+        """The loss over all rows seen so far."""
+        if self.count == 0:
+            raise ValueError("No rows have been accumulated")
+        _, transform = _ROW_ERRORS[self.loss_function]
+        mean = self.total / self.count
+        return float(transform(mean)) if transform is not None else mean
+
+
+# Derivatives of the losses with respect to each prediction, for constant optimization
+
+def _mse_gradient(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    return 2.0 * (predicted - actual) / predicted.size
+
+def _mae_gradient(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    return np.sign(predicted - actual) / predicted.size
+
+def _rmse_gradient(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    error = predicted - actual
+    loss = np.sqrt(np.mean(error ** 2))
+    if loss == 0:
+        return np.zeros_like(error, dtype=float)
+    return error / (predicted.size * loss)
+
+def _log_cosh_gradient(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    return np.tanh(predicted - actual) / predicted.size
+
+_GRADIENTS = {
+    mse: _mse_gradient,
+    mae: _mae_gradient,
+    rmse: _rmse_gradient,
+    log_cosh: _log_cosh_gradient,
+}
+
+def supports_gradient(loss_function) -> bool:
+    """Whether loss_gradient() knows the derivative of the loss."""
+    return loss_function in _GRADIENTS
+
+def loss_gradient(loss_function, predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """
+    Gradient of the loss with respect to the predictions.
+
+    Args:
+        loss_function: One of mse, mae, rmse or log_cosh
+        predicted: Predictions of shape (n_samples,)
+        actual: Targets of shape (n_samples,)
+
+    Returns:
+        Array of shape (n_samples,) with d loss / d predicted[i]
+    """
+    if not supports_gradient(loss_function):
+        raise ValueError("Gradients are only available for mse, mae, rmse and log_cosh")
+    return _GRADIENTS[loss_function](predicted, actual)
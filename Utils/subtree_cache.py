@@ -0,0 +1,126 @@
+import weakref
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("column", "size", "hits", "last_used")
+
+    def __init__(self, column: np.ndarray, size: int, tick: int):
+        self.column = column
+        self.size = size
+        self.hits = 0
+        self.last_used = tick
+
+
+class SubtreeCache:
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, low_water: float = 0.8):
+        """
+        Cache of evaluated subtree output columns for one dataset (semantic memoization).
+
+        Entries are keyed by GPNode.structural_hash(), so identical subtrees shared by
+        different individuals (through crossover, elitism and copies) are evaluated once.
+        When the byte budget is exceeded, the least frequently reused entries are evicted
+        (ties broken by least recent use) until the cache is back under low_water * max_bytes.
+        Reuse counts are halved after each eviction round so old favourites can age out.
+
+        Args:
+            max_bytes: Memory budget for the cached columns
+            low_water: Fraction of max_bytes to shrink to when evicting
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        if not 0.0 <= low_water <= 1.0:
+            raise ValueError("low_water must be between 0 and 1")
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._entries: Dict[bytes, _Entry] = {}
+        self._data_ref = None
+        self._data_shape = None
+        self._tick = 0
+        self.nbytes = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nodes_saved = 0
+
+    def bind(self, X: np.ndarray):
+        """
+        Associate the cache with a dataset, clearing it if the dataset changed.
+
+        Args:
+            X: Input array the cached columns are computed from
+        """
+        bound = self._data_ref() if self._data_ref is not None else None
+        if bound is X and self._data_shape == X.shape:
+            return
+        self.clear()
+        self._data_ref = weakref.ref(X)
+        self._data_shape = X.shape
+
+    def get(self, key: bytes) -> Optional[Tuple[np.ndarray, int]]:
+        """Return (column, subtree size) cached for a subtree hash, or None."""
+        self._tick += 1
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        entry.hits += 1
+        entry.last_used = self._tick
+        self.hits += 1
+        self.nodes_saved += entry.size
+        return entry.column, entry.size
+
+    def put(self, key: bytes, column: np.ndarray, size: int):
+        """
+        Store the output column of a subtree.
+
+        Args:
+            key: Structural hash of the subtree
+            column: Evaluated output, shape (n_samples,). It is made read-only.
+            size: Number of nodes in the subtree (work saved by a future hit)
+        """
+        if key in self._entries or column.nbytes > self.max_bytes:
+            return
+        column.flags.writeable = False
+        self._entries[key] = _Entry(column, size, self._tick)
+        self.nbytes += column.nbytes
+        if self.nbytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        target = self.low_water * self.max_bytes
+        ranked = sorted(self._entries.items(), key=lambda item: (item[1].hits, item[1].last_used))
+        for key, entry in ranked:
+            if self.nbytes <= target:
+                break
+            del self._entries[key]
+            self.nbytes -= entry.column.nbytes
+            self.evictions += 1
+        for entry in self._entries.values():
+            entry.hits //= 2
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def info(self) -> Dict[str, float]:
+        """Return hit-rate statistics and the current memory use."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "nodes_saved": self.nodes_saved,
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
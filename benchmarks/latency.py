@@ -0,0 +1,126 @@
+"""
+Prediction latency of a fitted SymbolicRegressor.
+
+Fits a model on a benchmark problem, then times predict_one on single rows and
+predict on batches of several sizes, reporting p50 / p99 latency per request and
+rows per second. GPTree.eval_array on the same batches is timed as a reference.
+
+Usage:
+    python -m benchmarks.latency --problem keijzer-11 --batch-sizes 1 100 10000 1000000 \\
+        --requests 2000 --n-jobs 4
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.problems import get_problem
+from symbolic_regression.estimator import SymbolicRegressor
+
+
+def latency_statistics(timings: np.ndarray, rows_per_request: int) -> Dict[str, float]:
+    """p50, p99, mean and max of per-request seconds (reported in microseconds) and rows per second."""
+    return {
+        "p50_us": float(np.percentile(timings, 50) * 1e6),
+        "p99_us": float(np.percentile(timings, 99) * 1e6),
+        "mean_us": float(np.mean(timings) * 1e6),
+        "max_us": float(np.max(timings) * 1e6),
+        "rows_per_second": rows_per_request * len(timings) / float(np.sum(timings)),
+    }
+
+
+def time_requests(request: Callable[[int], object], n_requests: int, warmup: int = 10) -> np.ndarray:
+    """Call request(i) n_requests times after a warmup and return the seconds of each call."""
+    for i in range(warmup):
+        request(i)
+    clock = time.perf_counter
+    timings = np.empty(n_requests)
+    for i in range(n_requests):
+        start = clock()
+        request(i)
+        timings[i] = clock() - start
+    return timings
+
+
+def run_latency(problem_name: str = "keijzer-11",
+                batch_sizes: List[int] = (1, 100, 10000),
+                n_requests: int = 1000,
+                n_jobs: Optional[int] = 1,
+                seed: int = 0,
+                population_size: int = 500,
+                generations: int = 10) -> Dict[str, object]:
+    """
+    Fit a model and measure its prediction latency.
+
+    Args:
+        problem_name: Benchmark problem to fit (see benchmarks.problems.PROBLEMS)
+        batch_sizes: Rows per predict request
+        n_requests: Timed requests per mode (fewer for batches over 10^5 rows)
+        n_jobs: predict_n_jobs of the regressor
+        seed: Seed for the data, the fit and the request rows
+        population_size: Individuals of the fit
+        generations: Generations of the fit
+
+    Returns:
+        Dict with the model ('expression', 'tree_size') and one result per mode:
+        'predict_one', then 'predict' and 'eval_array' per batch size
+    """
+    problem = get_problem(problem_name)
+    X_train, y_train, _, _ = problem.dataset(seed)
+    estimator = SymbolicRegressor(population_size=population_size, generations=generations,
+                                  random_state=seed, predict_n_jobs=n_jobs, verbose=False)
+    estimator.fit(X_train, y_train)
+    tree = estimator.best_estimator_
+
+    rng = np.random.default_rng(seed)
+    low, high = X_train.min(axis=0), X_train.max(axis=0)
+    results = []
+
+    rows = rng.uniform(low, high, size=(n_requests, problem.n_variables)).tolist()
+    timings = time_requests(lambda i: estimator.predict_one(rows[i]), n_requests)
+    results.append({"mode": "predict_one", "batch_size": 1, **latency_statistics(timings, 1)})
+
+    for batch_size in batch_sizes:
+        X = rng.uniform(low, high, size=(batch_size, problem.n_variables))
+        out = np.empty(batch_size)
+        requests = max(5, min(n_requests, 10 ** 7 // batch_size))
+        timings = time_requests(lambda i: estimator.predict(X, out), requests, warmup=2)
+        results.append({"mode": "predict", "batch_size": batch_size, **latency_statistics(timings, batch_size)})
+        timings = time_requests(lambda i: tree.eval_array(X), requests, warmup=2)
+        results.append({"mode": "eval_array", "batch_size": batch_size, **latency_statistics(timings, batch_size)})
+
+    estimator.predictor_.close()
+    return {
+        "problem": problem.name,
+        "n_jobs": n_jobs,
+        "expression": repr(tree),
+        "tree_size": tree.count_nodes(),
+        "results": results,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Prediction latency of SymbolicRegressor")
+    parser.add_argument("--problem", default="keijzer-11")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10000, 1000000])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    report = run_latency(args.problem, args.batch_sizes, args.requests, args.n_jobs, args.seed)
+    print(f"{report['problem']}: {report['tree_size']} nodes, n_jobs={report['n_jobs']}")
+    print(f"{'mode':>12} {'rows':>9} {'p50 us':>10} {'p99 us':>10} {'rows/s':>12}")
+    for result in report["results"]:
+        print(f"{result['mode']:>12} {result['batch_size']:>9} {result['p50_us']:>10.1f} "
+              f"{result['p99_us']:>10.1f} {result['rows_per_second']:>12.3g}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Memory footprint of tree populations.
+
+Traces the allocations made by GAPopulation.initialize (ramped half-and-half) and
+reports bytes per node and per individual.
+
+Usage:
+    python -m benchmarks.memory --sizes 1000 10000 100000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+from typing import Dict, List
+
+from genetic_algorithm.population import GAPopulation
+from symbolic_regression.estimator import DEFAULT_FUNC_SET
+
+
+def measure_population(population_size: int,
+                       n_variables: int = 5,
+                       use_erc: bool = True,
+                       min_depth: int = 2,
+                       max_depth: int = 6,
+                       seed: int = 0) -> Dict[str, float]:
+    """
+    Initialize a population under tracemalloc and return its memory usage.
+
+    Args:
+        population_size: Number of individuals
+        n_variables: Number of input variables (x0, x1, ...)
+        use_erc: Whether trees contain ephemeral random constants
+        min_depth: Minimum depth for initialization
+        max_depth: Maximum depth for initialization
+        seed: Seed of the random module
+
+    Returns:
+        Dict with the population size, node count, retained and peak bytes,
+        and bytes per node / per individual
+    """
+    random.seed(seed)
+    variables = [f"x{i}" for i in range(n_variables)]
+    population = GAPopulation(population_size)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        population.initialize(DEFAULT_FUNC_SET, variables, use_erc=use_erc,
+                              min_depth=min_depth, max_depth=max_depth)
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    n_nodes = sum(tree.count_nodes() for tree in population.population)
+    retained = after - before
+    return {
+        "population_size": population_size,
+        "nodes": n_nodes,
+        "bytes": retained,
+        "peak_bytes": peak - before,
+        "bytes_per_node": retained / n_nodes,
+        "bytes_per_individual": retained / population_size,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Memory footprint of GAPopulation.initialize")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--variables", type=int, default=5)
+    parser.add_argument("--max-depth", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'individuals':>12} {'nodes':>10} {'MB':>9} {'peak MB':>9} {'B/node':>8} {'B/individual':>13}")
+    for size in args.sizes:
+        result = measure_population(size, n_variables=args.variables,
+                                    max_depth=args.max_depth, seed=args.seed)
+        print(f"{result['population_size']:>12} {result['nodes']:>10} "
+              f"{result['bytes'] / 2 ** 20:>9.1f} {result['peak_bytes'] / 2 ** 20:>9.1f} "
+              f"{result['bytes_per_node']:>8.1f} {result['bytes_per_individual']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Standard symbolic regression benchmark problems.
+
+Definitions and sampling follow the benchmark table of McDermott et al.,
+"Genetic Programming Needs Better Benchmarks" (GECCO 2012):
+
+    U[a, b, n]   n points drawn uniformly from [a, b] in every variable
+    E[a, b, s]   evenly spaced points from a to b (inclusive) with step s; for several
+                 variables, the full grid
+
+Usage:
+    from benchmarks.problems import get_problem
+    X_train, y_train, X_test, y_test = get_problem("nguyen-5").dataset(seed=0)
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+Sampler = Callable[[np.random.Generator], np.ndarray]
+
+
+def uniform(low: float, high: float, n_samples: int, n_variables: int = 1) -> Sampler:
+    """U[low, high, n_samples]: random points, shape (n_samples, n_variables)."""
+    def sample(rng: np.random.Generator) -> np.ndarray:
+        return rng.uniform(low, high, size=(n_samples, n_variables))
+    return sample
+
+
+def grid(low: float, high: float, step: float, n_variables: int = 1) -> Sampler:
+    """E[low, high, step]: evenly spaced points (the full grid for several variables)."""
+    def sample(rng: np.random.Generator) -> np.ndarray:
+        axis = np.arange(low, high + step / 2, step)
+        mesh = np.meshgrid(*[axis] * n_variables, indexing="ij")
+        return np.column_stack([m.ravel() for m in mesh])
+    return sample
+
+
+class Problem:
+
+    def __init__(self,
+                 name: str,
+                 function: Callable[..., np.ndarray],
+                 n_variables: int,
+                 train: Sampler,
+                 test: Optional[Sampler] = None):
+        """
+        A benchmark target function with its training (and optional test) sampling.
+
+        Args:
+            name: Identifier, e.g. 'nguyen-5'
+            function: Target taking one column per variable and returning y
+            n_variables: Number of input variables
+            train: Sampler of the training inputs
+            test: Sampler of the test inputs, None if the problem defines no test set
+        """
+        self.name = name
+        self.function = function
+        self.n_variables = n_variables
+        self.train = train
+        self.test = test
+
+    def target(self, X: np.ndarray) -> np.ndarray:
+        """Evaluate the target function on X of shape (n_samples, n_variables)."""
+        with np.errstate(divide="ignore"):
+            return np.asarray(self.function(*X.T), dtype=float)
+
+    def dataset(self, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Draw the problem's data.
+
+        Args:
+            seed: Seed for the random samplers (grids do not depend on it)
+
+        Returns:
+            Tuple (X_train, y_train, X_test, y_test); the test arrays are None
+            when the problem has no test set
+        """
+        rng = np.random.default_rng(seed)
+        X_train = self.train(rng)
+        if self.test is None:
+            return X_train, self.target(X_train), None, None
+        X_test = self.test(rng)
+        return X_train, self.target(X_train), X_test, self.target(X_test)
+
+    def __repr__(self) -> str:
+        return f"Problem(name='{self.name}', n_variables={self.n_variables})"
+
+
+def _harmonic(x):
+    # Keijzer-6: sum_{i=1}^{x} 1 / i, for integer x >= 1
+    x = np.asarray(x, dtype=int)
+    harmonic = np.concatenate(([0.0], np.cumsum(1.0 / np.arange(1, x.max() + 1))))
+    return harmonic[x]
+
+
+def _polynomial(degree: int) -> Callable[[np.ndarray], np.ndarray]:
+    # x + x^2 + ... + x^degree
+    return lambda x: sum(x ** k for k in range(1, degree + 1))
+
+
+_PROBLEMS: List[Problem] = [
+    Problem("koza-1", lambda x: x ** 4 + x ** 3 + x ** 2 + x, 1, uniform(-1, 1, 20)),
+    Problem("koza-2", lambda x: x ** 5 - 2 * x ** 3 + x, 1, uniform(-1, 1, 20)),
+    Problem("koza-3", lambda x: x ** 6 - 2 * x ** 4 + x ** 2, 1, uniform(-1, 1, 20)),
+
+    Problem("nguyen-1", _polynomial(3), 1, uniform(-1, 1, 20)),
+    Problem("nguyen-2", _polynomial(4), 1, uniform(-1, 1, 20)),
+    Problem("nguyen-3", _polynomial(5), 1, uniform(-1, 1, 20)),
+    Problem("nguyen-4", _polynomial(6), 1, uniform(-1, 1, 20)),
+    Problem("nguyen-5", lambda x: np.sin(x ** 2) * np.cos(x) - 1, 1, uniform(-1, 1, 20)),
+    Problem("nguyen-6", lambda x: np.sin(x) + np.sin(x + x ** 2), 1, uniform(-1, 1, 20)),
+    Problem("nguyen-7", lambda x: np.log(x + 1) + np.log(x ** 2 + 1), 1, uniform(0, 2, 20)),
+    Problem("nguyen-8", np.sqrt, 1, uniform(0, 4, 20)),
+    Problem("nguyen-9", lambda x, y: np.sin(x) + np.sin(y ** 2), 2, uniform(0, 1, 20, 2)),
+    Problem("nguyen-10", lambda x, y: 2 * np.sin(x) * np.cos(y), 2, uniform(0, 1, 20, 2)),
+    Problem("nguyen-11", lambda x, y: x ** y, 2, uniform(0, 1, 20, 2)),
+    Problem("nguyen-12", lambda x, y: x ** 4 - x ** 3 + y ** 2 / 2 - y, 2, uniform(0, 1, 20, 2)),
+
+    Problem("keijzer-1", lambda x: 0.3 * x * np.sin(2 * np.pi * x), 1,
+            grid(-1, 1, 0.1), grid(-1, 1, 0.001)),
+    Problem("keijzer-4", lambda x: x ** 3 * np.exp(-x) * np.cos(x) * np.sin(x) * (np.sin(x) ** 2 * np.cos(x) - 1),
+            1, grid(0, 10, 0.05), grid(0.05, 10.05, 0.05)),
+    Problem("keijzer-6", _harmonic, 1, grid(1, 50, 1), grid(1, 120, 1)),
+    Problem("keijzer-7", np.log, 1, grid(1, 100, 1), grid(1, 100, 0.1)),
+    Problem("keijzer-11", lambda x, y: x * y + np.sin((x - 1) * (y - 1)), 2,
+            uniform(-3, 3, 20, 2), grid(-3, 3, 0.01, 2)),
+    Problem("keijzer-12", lambda x, y: x ** 4 - x ** 3 + y ** 2 / 2 - y, 2,
+            uniform(-3, 3, 20, 2), grid(-3, 3, 0.01, 2)),
+    Problem("keijzer-14", lambda x, y: 8 / (2 + x ** 2 + y ** 2), 2,
+            uniform(-3, 3, 20, 2), grid(-3, 3, 0.01, 2)),
+    Problem("keijzer-15", lambda x, y: x ** 3 / 5 + y ** 3 / 2 - y - x, 2,
+            uniform(-3, 3, 20, 2), grid(-3, 3, 0.01, 2)),
+
+    Problem("pagie-1", lambda x, y: 1 / (1 + x ** -4.0) + 1 / (1 + y ** -4.0), 2, grid(-5, 5, 0.4, 2)),
+]
+
+PROBLEMS: Dict[str, Problem] = {problem.name: problem for problem in _PROBLEMS}
+
+
+def get_problem(name: str) -> Problem:
+    """Look a problem up by name (case-insensitive), e.g. 'koza-1' or 'Pagie-1'."""
+    try:
+        return PROBLEMS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown problem '{name}'. Available: {', '.join(PROBLEMS)}") from None
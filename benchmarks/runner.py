@@ -0,0 +1,248 @@
+"""
+Symbolic regression benchmark runner.
+
+Fits SymbolicRegressor on the standard problems (benchmarks/problems.py) with fixed
+seeds and writes throughput and quality metrics as JSON. Two result files can be
+compared to catch regressions in the evaluation hot path.
+
+Usage:
+    python -m benchmarks.runner run --problems koza-1 nguyen-5 pagie-1 --seeds 0 1 2 \\
+        --output results.json
+    python -m benchmarks.runner compare baseline.json results.json --tolerance 0.1
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from benchmarks.problems import PROBLEMS, Problem, get_problem
+from symbolic_regression.estimator import SymbolicRegressor
+from utils import loss_function
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Metrics checked by compare(): name -> True if higher is better
+COMPARED_METRICS = {
+    "seconds_per_generation": False,
+    "gpops": True,
+    "peak_rss_mb": False,
+}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def run_benchmark(problem: Problem,
+                  seed: int = 0,
+                  population_size: int = 500,
+                  generations: int = 20,
+                  **params) -> Dict[str, object]:
+    """
+    Fit one problem with a fixed seed and measure it.
+
+    Args:
+        problem: The benchmark problem
+        seed: Seed for the data and the regressor (random_state)
+        population_size: Number of individuals
+        generations: Number of generations
+        **params: Further SymbolicRegressor parameters (n_islands must stay 1)
+
+    Returns:
+        Dict of metrics. gpops is node evaluations (nodes times rows scored) per second
+        over the bred generations; peak_rss_mb is the peak resident memory of the process,
+        so it only describes this run when the run has a process of its own (see run_suite).
+    """
+    X_train, y_train, X_test, y_test = problem.dataset(seed)
+    estimator = SymbolicRegressor(population_size=population_size, generations=generations,
+                                  random_state=seed, verbose=False, **params)
+    start = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    wall_time = time.perf_counter() - start
+
+    engine = estimator.engine_
+    seconds = engine.generation_seconds
+    node_evaluations = int(np.sum(engine.node_evaluations))
+    tree = estimator.best_estimator_
+    with np.errstate(all="ignore"):
+        test_loss = None if X_test is None else float(loss_function.mse(estimator.predict(X_test), y_test))
+    return {
+        "problem": problem.name,
+        "seed": seed,
+        "population_size": population_size,
+        "generations": generations,
+        "n_samples": len(X_train),
+        "wall_time": wall_time,
+        "generation_seconds": list(seconds),
+        "seconds_per_generation": float(np.mean(seconds)) if seconds else None,
+        "node_evaluations": node_evaluations,
+        "gpops": node_evaluations / sum(seconds) if seconds and sum(seconds) > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "train_loss": float(tree.fitness),
+        "test_loss": test_loss,
+        "tree_size": tree.count_nodes(),
+        "tree_depth": tree.get_depth(),
+        "expression": repr(tree),
+    }
+
+
+def _run_isolated(args) -> Dict[str, object]:
+    name, seed, population_size, generations, params = args
+    return run_benchmark(get_problem(name), seed, population_size, generations, **params)
+
+
+def run_suite(problems: Iterable[str],
+              seeds: Iterable[int] = (0,),
+              population_size: int = 500,
+              generations: int = 20,
+              isolate: bool = True,
+              verbose: bool = True,
+              **params) -> Dict[str, object]:
+    """
+    Run every (problem, seed) pair and collect the results.
+
+    Args:
+        problems: Problem names (see benchmarks.problems.PROBLEMS)
+        seeds: Seeds, one run per problem and seed
+        population_size: Number of individuals
+        generations: Number of generations
+        isolate: Run each benchmark in a fresh process, so peak memory is per run
+                 and no caches carry over between runs
+        verbose: Print one line per run
+        **params: Further SymbolicRegressor parameters
+
+    Returns:
+        Dict with 'meta' (versions and settings) and 'results' (one dict per run)
+    """
+    tasks = [(get_problem(name).name, seed, population_size, generations, params)
+             for name in problems for seed in seeds]
+    results = []
+    if isolate:
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for result in pool.imap(_run_isolated, tasks):
+                results.append(result)
+                if verbose:
+                    _print_result(result)
+    else:
+        for task in tasks:
+            results.append(_run_isolated(task))
+            if verbose:
+                _print_result(results[-1])
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "population_size": population_size,
+            "generations": generations,
+            "params": params,
+        },
+        "results": results,
+    }
+
+
+def _print_result(result: Dict[str, object]):
+    gpops = result["gpops"]
+    print(f"{result['problem']:>12} seed={result['seed']:<3} "
+          f"{result['seconds_per_generation'] * 1000:8.1f} ms/gen "
+          f"{(gpops or 0) / 1e6:8.2f} MGPops/s "
+          f"train={result['train_loss']:.3g} size={result['tree_size']}")
+
+
+def compare(baseline: Dict[str, object],
+            candidate: Dict[str, object],
+            tolerance: float = 0.1) -> List[Dict[str, object]]:
+    """
+    Diff two run_suite results, matching runs by (problem, seed).
+
+    Args:
+        baseline: Reference results
+        candidate: New results
+        tolerance: Relative change beyond which a worse metric counts as a regression
+
+    Returns:
+        One row per matched run and metric in COMPARED_METRICS:
+        {'problem', 'seed', 'metric', 'baseline', 'candidate', 'change', 'regression'},
+        where change is candidate / baseline - 1
+    """
+    reference = {(run["problem"], run["seed"]): run for run in baseline["results"]}
+    rows = []
+    for run in candidate["results"]:
+        base = reference.get((run["problem"], run["seed"]))
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), run.get(metric)
+            if old is None or new is None or old == 0:
+                continue
+            change = new / old - 1
+            worse = -change if higher_is_better else change
+            rows.append({"problem": run["problem"], "seed": run["seed"], "metric": metric,
+                         "baseline": old, "candidate": new, "change": change,
+                         "regression": worse > tolerance})
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Symbolic regression benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run benchmarks and write JSON results")
+    run.add_argument("--problems", nargs="+", default=["koza-1", "nguyen-5", "nguyen-10", "keijzer-6", "pagie-1"],
+                     help=f"Problem names, or 'all' ({', '.join(PROBLEMS)})")
+    run.add_argument("--seeds", type=int, nargs="+", default=[0])
+    run.add_argument("--population-size", type=int, default=500)
+    run.add_argument("--generations", type=int, default=20)
+    run.add_argument("--backend", default="tree")
+    run.add_argument("--no-isolate", action="store_true", help="Run everything in this process")
+    run.add_argument("--output", help="JSON file for the results (printed if omitted)")
+
+    diff = commands.add_parser("compare", help="Compare two result files")
+    diff.add_argument("baseline")
+    diff.add_argument("candidate")
+    diff.add_argument("--tolerance", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        problems = list(PROBLEMS) if args.problems == ["all"] else args.problems
+        results = run_suite(problems, args.seeds, args.population_size, args.generations,
+                            isolate=not args.no_isolate, backend=args.backend)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            print(json.dumps(results, indent=2))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    rows = compare(baseline, candidate, args.tolerance)
+    print(f"{'problem':>12} {'seed':>4} {'metric':>24} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['problem']:>12} {row['seed']:>4} {row['metric']:>24} {row['baseline']:>12.4g} "
+              f"{row['candidate']:>12.4g} {row['change']:>+8.1%}{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{regressions} regression(s) beyond {args.tolerance:.0%} in {len(rows)} comparison(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,450 @@
+import random
+import time
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.gp_tree import GPTree
+from utils.gp_function import GPFunction
+from utils.gp_program import GPProgram, VAR, ERC, subtree_sizes
+from utils import constant
+from genetic_algorithm.population import GAPopulation
+from genetic_algorithm.parallel import ParallelEvaluator, resolve_n_jobs
+from genetic_algorithm.selection import batch_tournament, elite_indices, seeded_rng, tarpeian_mask
+from genetic_algorithm.streaming import ChunkedDataset, evaluate_streaming, DEFAULT_RACE_CHUNK_SIZE
+from utils.loss_function import supports_partial
+
+# One encoded individual: (codes, operands, constants, sizes), aligned in prefix order.
+# The subtree rooted at position i spans [i, i + sizes[i]).
+Encoded = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def splice(target: Encoded, position: int, donor: Encoded, start: int) -> Encoded:
+    """
+    Replace the subtree of target at position with the subtree of donor at start.
+
+    This is the single primitive behind crossover and subtree/hoist mutation:
+    three slices are concatenated, and the sizes of the ancestors of position
+    (the earlier positions whose subtree spans it) are shifted by the size difference.
+
+    Args:
+        target: Individual receiving the subtree
+        position: Root position of the subtree to replace in target
+        donor: Individual donating the subtree (may be target itself)
+        start: Root position of the donated subtree in donor
+
+    Returns:
+        The new encoded individual
+    """
+    codes, operands, constants, sizes = target
+    end = position + sizes[position]
+    donor_end = start + donor[3][start]
+
+    head_sizes = sizes[:position].copy()
+    ancestors = np.arange(position) + head_sizes > position
+    head_sizes[ancestors] += (donor_end - start) - (end - position)
+
+    return (np.concatenate((codes[:position], donor[0][start:donor_end], codes[end:])),
+            np.concatenate((operands[:position], donor[1][start:donor_end], operands[end:])),
+            np.concatenate((constants[:position], donor[2][start:donor_end], constants[end:])),
+            np.concatenate((head_sizes, donor[3][start:donor_end], sizes[end:])))
+
+
+def node_depths(sizes: np.ndarray) -> np.ndarray:
+    """
+    Depth of every position of a prefix-encoded tree (the root has depth 0).
+
+    Each node adds one to the depth of the positions its subtree spans after it,
+    [i + 1, i + sizes[i]); the depths are the running sum of those interval counts.
+
+    Args:
+        sizes: Subtree sizes in prefix order
+
+    Returns:
+        Array of depths, aligned with sizes
+    """
+    n = len(sizes)
+    positions = np.arange(n)
+    steps = np.bincount(positions + 1, minlength=n + 1) - np.bincount(positions + sizes, minlength=n + 1)
+    return np.cumsum(steps[:n])
+
+
+class ArrayPopulation:
+
+    def __init__(self,
+                 func_set: Iterable[GPFunction],
+                 variables: List[str],
+                 use_erc: bool = False,
+                 erc_range: tuple = (-1.0, 1.0),
+                 n_jobs: Optional[int] = 1,
+                 race_chunk_size: int = DEFAULT_RACE_CHUNK_SIZE):
+        """
+        Struct-of-arrays population backend.
+
+        All individuals live in four flat arrays (opcodes, variable operands, constants
+        and subtree sizes) in prefix order, plus an offsets array delimiting individuals.
+        Crossover and point/subtree/hoist mutation become array slicing and concatenation,
+        so breeding allocates a handful of arrays per child instead of a GPNode per position.
+        Individuals convert to and from GPTree at the API boundary.
+
+        Args:
+            func_set: Set of functions for the trees
+            variables: List of variable names
+            use_erc: Whether to use Ephemeral Random Constants
+            erc_range: Range for ERC values
+            n_jobs: Number of worker processes for evaluate() (-1 uses every core)
+            race_chunk_size: Rows per chunk when racing in-memory array data (see evaluate())
+        """
+        self.func_set = list(func_set)
+        self.variables = list(variables)
+        self.use_erc = use_erc
+        self.erc_range = erc_range
+        self.n_jobs = n_jobs
+        self.race_chunk_size = race_chunk_size
+        self.arities = np.array([func.arity for func in self.func_set], dtype=np.int32)
+        self._arity_groups = {arity: np.flatnonzero(self.arities == arity) for arity in set(self.arities.tolist())}
+        self._evaluator: Optional[ParallelEvaluator] = None
+        self.evaluation_stats = {"evaluated": 0, "cached": 0, "aborted": 0, "rows_saved": 0, "node_evaluations": 0}
+        self._store([], np.empty(0))
+
+    @property
+    def population_size(self) -> int:
+        return len(self.offsets) - 1
+
+    def __len__(self) -> int:
+        return self.population_size
+
+    def _store(self, individuals: List[Encoded], fitness: np.ndarray):
+        lengths = [len(individual[0]) for individual in individuals]
+        self.offsets = np.zeros(len(individuals) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(lengths)
+        if individuals:
+            self.codes, self.operands, self.constants, self.sizes = (
+                np.concatenate([individual[k] for individual in individuals]) for k in range(4))
+        else:
+            self.codes = np.empty(0, dtype=np.int32)
+            self.operands = np.empty(0, dtype=np.int32)
+            self.constants = np.empty(0, dtype=float)
+            self.sizes = np.empty(0, dtype=np.int32)
+        self.fitness = np.asarray(fitness, dtype=float)
+        # Individuals whose fitness is a racing lower bound rather than their exact loss
+        self.rejected = np.zeros(len(individuals), dtype=bool)
+
+    def set_arrays(self, codes: np.ndarray, operands: np.ndarray, constants: np.ndarray,
+                   offsets: np.ndarray, fitness: np.ndarray, sizes: Optional[np.ndarray] = None):
+        """
+        Replace the population with already concatenated arrays (e.g. from a checkpoint).
+
+        Args:
+            codes, operands, constants: Prefix arrays of all individuals, back to back
+            offsets: Individual i spans offsets[i]:offsets[i + 1]
+            fitness: Fitness per individual (nan if not evaluated)
+            sizes: Subtree sizes; computed from codes if None (every individual is a
+                   complete prefix program, so one right-to-left pass covers them all)
+        """
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.operands = np.asarray(operands, dtype=np.int32)
+        self.constants = np.asarray(constants, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.sizes = subtree_sizes(self.codes, self.arities) if sizes is None else np.asarray(sizes, dtype=np.int32)
+        self.fitness = np.array(fitness, dtype=float)
+        self.rejected = np.zeros(len(self.fitness), dtype=bool)
+
+    def individual(self, index: int) -> Encoded:
+        """Return views of the arrays of one individual."""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return (self.codes[start:end], self.operands[start:end],
+                self.constants[start:end], self.sizes[start:end])
+
+    def program(self, index: int) -> GPProgram:
+        codes, operands, constants, _ = self.individual(index)
+        return GPProgram(self.func_set, codes, operands, constants)
+
+    # ----- Conversion at the API boundary -----
+
+    def encode(self, tree: GPTree) -> Encoded:
+        program = GPProgram.compile(tree.root, self.func_set, self.variables)
+        if len(program.func_set) != len(self.func_set):
+            raise ValueError("Tree uses functions outside the population's function set")
+        return program.codes, program.operands, program.constants, subtree_sizes(program.codes, self.arities)
+
+    def set_trees(self, trees: Iterable[GPTree]):
+        """Replace the population with encoded copies of the given trees (fitness is kept)."""
+        trees = list(trees)
+        fitness = [np.nan if tree.fitness is None else tree.fitness for tree in trees]
+        self._store([self.encode(tree) for tree in trees], np.array(fitness, dtype=float))
+
+    def to_tree(self, index: int) -> GPTree:
+        tree = GPTree(self.func_set, self.variables, self.use_erc, self.erc_range)
+        tree.root = self.program(index).to_node(self.variables)
+        fitness = self.fitness[index]
+        tree.fitness = None if np.isnan(fitness) else float(fitness)
+        return tree
+
+    def to_trees(self) -> List[GPTree]:
+        return [self.to_tree(i) for i in range(self.population_size)]
+
+    def initialize(self, population_size: int, min_depth: int = 2, max_depth: int = 6):
+        """Initialize with Ramped Half-and-Half (see GAPopulation.initialize)."""
+        population = GAPopulation(population_size)
+        population.initialize(self.func_set, self.variables, self.use_erc, self.erc_range,
+                              min_depth=min_depth, max_depth=max_depth)
+        self.set_trees(population.population)
+
+    def best(self) -> GPTree:
+        """Return the fittest individual as a GPTree."""
+        fitness = np.where(np.isnan(self.fitness), np.inf, self.fitness)
+        return self.to_tree(int(np.argmin(fitness)))
+
+    def top(self, k: int) -> List[GPTree]:
+        """Return the k fittest individuals as GPTrees, best first."""
+        fitness = np.where(np.isnan(self.fitness), np.inf, self.fitness)
+        return [self.to_tree(int(i)) for i in elite_indices(fitness, k)]
+
+    # ----- Evaluation -----
+
+    def evaluate(self, data: np.ndarray, target_values, loss_function: Callable, threshold: Optional[float] = None):
+        """
+        Score every individual that has no fitness yet.
+        Individuals carried over unchanged (elites) keep their fitness; call
+        reset_fitness() first when the data changes.
+
+        Args:
+            data: Input array of shape (n_samples, n_features), or a ChunkedDataset
+            target_values: Target output values (None for a ChunkedDataset)
+            loss_function: Function that takes (predicted, actual) and returns a loss value
+            threshold: Optional racing threshold, as in GAPopulation.evaluate
+                       (serial evaluation only)
+        """
+        if self.population_size == 0:
+            raise ValueError("Population is empty. Call initialize() first.")
+        if not isinstance(data, (np.ndarray, ChunkedDataset)):
+            raise ValueError("ArrayPopulation only evaluates numpy array data or a ChunkedDataset")
+
+        pending = np.flatnonzero(np.isnan(self.fitness))
+        streaming = isinstance(data, ChunkedDataset)
+        targets = None if streaming else np.array(target_values)
+        parallel = not streaming and resolve_n_jobs(self.n_jobs) > 1
+        racing = threshold is not None and not parallel
+        if racing and not supports_partial(loss_function):
+            raise ValueError("Racing requires a loss with partial statistics (mse, rmse, mae or log_cosh)")
+
+        rows_saved = 0
+        lengths = self.offsets[pending + 1] - self.offsets[pending]
+        self.rejected[pending] = False
+        if streaming or racing:
+            dataset = data if streaming else ChunkedDataset(data, targets, chunk_size=self.race_chunk_size)
+            programs = [self.program(i) for i in pending]
+            fitness, rows = evaluate_streaming([program.execute for program in programs], dataset,
+                                               loss_function, threshold if racing else None)
+            self.fitness[pending] = fitness
+            node_evaluations = int(np.dot(lengths, rows))
+            if racing and dataset.n_samples is not None:
+                rows = np.asarray(rows)
+                self.rejected[pending] = rows < dataset.n_samples
+                rows_saved = int(np.sum(dataset.n_samples - rows[rows < dataset.n_samples]))
+        elif parallel and len(pending):
+            if self._evaluator is None:
+                self._evaluator = ParallelEvaluator(self.n_jobs, self.func_set)
+            self._evaluator.bind(data, targets)
+            programs = [self.program(i) for i in pending]
+            self.fitness[pending] = self._evaluator.evaluate(programs, loss_function)
+            node_evaluations = int(lengths.sum()) * len(data)
+        else:
+            for i in pending:
+                try:
+                    loss = loss_function(self.program(i).execute(data), targets)
+                except Exception:
+                    loss = np.inf
+                # NaN marks unevaluated individuals, so a NaN loss is stored as inf (as in score_tree)
+                self.fitness[i] = loss if np.isfinite(loss) else np.inf
+            node_evaluations = int(lengths.sum()) * len(data)
+
+        self.evaluation_stats = {"evaluated": len(pending), "cached": self.population_size - len(pending),
+                                 "aborted": int(np.count_nonzero(self.rejected[pending])), "rows_saved": rows_saved,
+                                 "node_evaluations": node_evaluations}
+
+    def reset_fitness(self):
+        self.fitness[:] = np.nan
+
+    def close(self):
+        """Shut down the worker processes used for parallel evaluation, if any."""
+        if self._evaluator is not None:
+            self._evaluator.close()
+            self._evaluator = None
+
+    # ----- Variation -----
+
+    def breed(self, crossover_rate: float, tournament_size: int, elitism_size: int,
+              max_tree_depth: Optional[int] = None,
+              max_tree_size: Optional[int] = None,
+              parsimony_coefficient: float = 0.0,
+              size_pressure: Optional[float] = None,
+              tarpeian_rate: float = 0.0,
+              timings: Optional[Dict[str, float]] = None,
+              rng: Optional[np.random.Generator] = None):
+        """
+        Replace the population with the next generation, mirroring EvolutionEngine:
+        elitism, then tournament selection with subtree crossover or a random
+        point/subtree/hoist mutation. Offspring have no fitness until evaluate().
+
+        The bloat control options match EvolutionEngine's (see batch_tournament,
+        tarpeian_mask and subtree_crossover); sizes are the individuals' lengths.
+        With a timings dict, seconds spent in the 'elitism', 'selection', 'crossover' and
+        'mutation' phases are added to it (see EvolutionEngine callbacks).
+        rng draws the selections; by default it is seeded from numpy's global state.
+        """
+        if timings is None:
+            timings = dict.fromkeys(("elitism", "selection", "crossover", "mutation"), 0.0)
+        if rng is None:
+            rng = seeded_rng()
+        clock = time.perf_counter
+        start = clock()
+        fitness = np.where(np.isnan(self.fitness), np.inf, self.fitness)
+        size = self.population_size
+
+        elites = elite_indices(fitness, elitism_size)
+        children = [self.individual(i) for i in elites]
+        # An elite whose fitness is only a racing bound is scored again
+        child_fitness = [np.nan if self.rejected[i] else fitness[i] for i in elites]
+        timings["elitism"] += clock() - start
+
+        start = clock()
+        # All parents of the generation in one batch: size penalty, Tarpeian rejection, tournaments
+        n_offspring = size - len(children)
+        crossover = rng.random(n_offspring) < crossover_rate
+        lengths = np.diff(self.offsets)
+        selection_fitness = fitness + parsimony_coefficient * lengths if parsimony_coefficient else fitness.copy()
+        selection_fitness[tarpeian_mask(lengths, tarpeian_rate, rng)] = np.inf
+        parents = batch_tournament(selection_fitness, n_offspring + int(np.count_nonzero(crossover)), rng,
+                                   tournament_size, lengths, size_pressure).tolist()
+        timings["selection"] += clock() - start
+
+        next_parent = 0
+        for is_crossover in crossover.tolist():
+            start = clock()
+            if is_crossover:
+                parent1, parent2 = parents[next_parent], parents[next_parent + 1]
+                next_parent += 2
+                child = self.crossover(self.individual(parent1), self.individual(parent2),
+                                       max_tree_depth, max_tree_size)
+                timings["crossover"] += clock() - start
+            else:
+                parent = parents[next_parent]
+                next_parent += 1
+                mut_type = random.choice([constant.POINT, constant.SUBTREE, constant.HOIST])
+                child = self.mutate(self.individual(parent), mut_type, max_tree_depth, max_tree_size)
+                timings["mutation"] += clock() - start
+            children.append(child)
+            child_fitness.append(np.nan)
+
+        self._store(children, np.array(child_fitness, dtype=float))
+
+    def crossover(self, parent1: Encoded, parent2: Encoded,
+                  max_tree_depth: Optional[int] = None,
+                  max_tree_size: Optional[int] = None) -> Encoded:
+        """
+        Subtree crossover: graft a random subtree of parent2 at a random position of parent1.
+
+        With limits, positions are redrawn up to MAX_VARIATION_ATTEMPTS times until the
+        child fits, otherwise parent1 is returned unchanged (see subtree_crossover).
+        """
+        if max_tree_depth is not None:
+            depths1, depths2 = node_depths(parent1[3]), node_depths(parent2[3])
+        for _ in range(constant.MAX_VARIATION_ATTEMPTS):
+            position = random.randrange(len(parent1[0]))
+            start = random.randrange(len(parent2[0]))
+            end, donor_end = position + parent1[3][position], start + parent2[3][start]
+            if max_tree_size is not None and \
+                    len(parent1[0]) - (end - position) + (donor_end - start) > max_tree_size:
+                continue
+            if max_tree_depth is not None:
+                donor_height = depths2[start:donor_end].max() - depths2[start]
+                kept = max(depths1[:position].max(initial=0), depths1[end:].max(initial=0))
+                if max(kept, depths1[position] + donor_height) > max_tree_depth:
+                    continue
+            return splice(parent1, position, parent2, start)
+        return parent1
+
+    def mutate(self, individual: Encoded, mutate_type: str,
+               max_tree_depth: Optional[int] = None,
+               max_tree_size: Optional[int] = None) -> Encoded:
+        """Mutated copy of the individual; limits apply to subtree mutation (see GPTree.mutate)."""
+        if mutate_type.lower() == constant.POINT:
+            return self._point_mutation(individual)
+        if mutate_type.lower() == constant.SUBTREE:
+            return self._subtree_mutation(individual, max_tree_depth=max_tree_depth, max_tree_size=max_tree_size)
+        if mutate_type.lower() == constant.HOIST:
+            return self._hoist_mutation(individual)
+        raise ValueError(f"mutate_type must be either '{constant.POINT}', '{constant.SUBTREE}', or '{constant.HOIST}'")
+
+    def _point_mutation(self, individual: Encoded) -> Encoded:
+        codes, operands, constants, sizes = (array.copy() for array in individual)
+        position = random.randrange(len(codes))
+        code = codes[position]
+
+        if code >= 0:
+            # Function node - swap for a function with the same arity
+            codes[position] = random.choice(self._arity_groups[self.arities[code]])
+        elif code == ERC:
+            if self.use_erc:
+                constants[position] = random.uniform(self.erc_range[0], self.erc_range[1])
+        elif self.variables:
+            # Variables (and fixed constants) become a random variable
+            codes[position] = VAR
+            operands[position] = random.randrange(len(self.variables))
+            constants[position] = 0.0
+        return codes, operands, constants, sizes
+
+    def _subtree_mutation(self, individual: Encoded, max_depth: int = 3,
+                          max_tree_depth: Optional[int] = None,
+                          max_tree_size: Optional[int] = None) -> Encoded:
+        sizes = individual[3]
+        depths = node_depths(sizes) if max_tree_depth is not None else None
+        for _ in range(constant.MAX_VARIATION_ATTEMPTS):
+            position = random.randrange(len(sizes))
+            depth = max_depth
+            if depths is not None:
+                # Growing no deeper than the room left below the position keeps the depth limit
+                depth = min(depth, max_tree_depth - int(depths[position]))
+                if depth < 0:
+                    continue
+            codes, operands, constants = [], [], []
+            self._grow(depth, codes, operands, constants)
+            if max_tree_size is not None and len(sizes) - sizes[position] + len(codes) > max_tree_size:
+                continue
+            codes = np.array(codes, dtype=np.int32)
+            subtree = (codes, np.array(operands, dtype=np.int32), np.array(constants, dtype=float),
+                       subtree_sizes(codes, self.arities))
+            return splice(individual, position, subtree, 0)
+        return individual
+
+    def _hoist_mutation(self, individual: Encoded) -> Encoded:
+        sizes = individual[3]
+        candidates = np.flatnonzero(sizes > 1)
+        if len(candidates) == 0:
+            return self._point_mutation(individual)
+        position = int(random.choice(candidates))
+        # Any node strictly inside the selected subtree replaces it
+        start = random.randrange(position + 1, position + sizes[position])
+        return splice(individual, position, individual, start)
+
+    def _grow(self, max_d: int, codes: List[int], operands: List[int], constants: List[float]):
+        # Array counterpart of GPTree._random_init_recursive(0, max_d, GROW)
+        terminal_count = len(self.variables) + (1 if self.use_erc else 0)
+        if max_d == 0 or random.random() < terminal_count / (terminal_count + len(self.func_set)):
+            if self.variables and not (self.use_erc and random.random() < 0.5):
+                codes.append(VAR)
+                operands.append(random.randrange(len(self.variables)))
+                constants.append(0.0)
+            else:
+                codes.append(ERC)
+                operands.append(0)
+                constants.append(random.uniform(self.erc_range[0], self.erc_range[1]))
+            return
+
+        code = random.randrange(len(self.func_set))
+        codes.append(code)
+        operands.append(0)
+        constants.append(0.0)
+        for _ in range(self.arities[code]):
+            self._grow(max_d - 1, codes, operands, constants)
@@ -0,0 +1,216 @@
+import json
+import os
+import random
+from typing import Dict, List, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+from utils.gp_tree import GPTree
+from utils.gp_function import GPFunction
+from utils.gp_program import GPProgram, decode
+from genetic_algorithm.array_population import ArrayPopulation
+
+if TYPE_CHECKING:
+    from genetic_algorithm.evolution import EvolutionEngine
+
+CHECKPOINT_VERSION = 1
+
+# Per-generation lists of EvolutionEngine stored in a checkpoint
+_ENGINE_LISTS = ("history", "evaluations_saved", "aborted_evaluations", "rows_saved",
+                 "node_evaluations", "generation_seconds")
+
+
+def encode_trees(trees: Sequence[GPTree],
+                 func_set: Sequence[GPFunction],
+                 variables: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Concatenate the prefix programs of several trees into flat arrays.
+
+    Args:
+        trees: Trees sharing func_set and variables
+        func_set: Function set, opcodes index into it
+        variables: Variable names, VAR operands index into it
+
+    Returns:
+        Dict with 'codes', 'operands', 'constants' (aligned, one entry per node) and
+        'offsets' (tree i spans offsets[i]:offsets[i + 1])
+    """
+    programs = []
+    for tree in trees:
+        # Reuse a compiled program if the tree has one, without caching new ones on the trees
+        program = tree._program if tree._program is not None else GPProgram.compile(tree.root, func_set, variables)
+        if len(program.func_set) != len(func_set):
+            raise ValueError("Tree uses functions outside the population's function set")
+        programs.append(program)
+    offsets = np.zeros(len(programs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(program.codes) for program in programs])
+    if not programs:
+        return {"codes": np.empty(0, dtype=np.int32), "operands": np.empty(0, dtype=np.int32),
+                "constants": np.empty(0), "offsets": offsets}
+    return {
+        "codes": np.concatenate([program.codes for program in programs]),
+        "operands": np.concatenate([program.operands for program in programs]),
+        "constants": np.concatenate([program.constants for program in programs]),
+        "offsets": offsets,
+    }
+
+
+def decode_trees(arrays: Dict[str, np.ndarray],
+                 template: GPTree,
+                 fitness: Optional[np.ndarray] = None) -> List[GPTree]:
+    """
+    Rebuild GPTrees from arrays written by encode_trees.
+
+    Args:
+        arrays: Dict with 'codes', 'operands', 'constants' and 'offsets'
+        template: Tree whose func_set, variables and ERC settings the new trees share
+        fitness: Optional fitness per tree (nan for None)
+
+    Returns:
+        The decoded trees
+    """
+    codes, operands, constants, offsets = (arrays[key] for key in ("codes", "operands", "constants", "offsets"))
+    trees = []
+    for i in range(len(offsets) - 1):
+        start, end = offsets[i], offsets[i + 1]
+        tree = GPTree(template.func_set, template.variables, template.use_erc, template.erc_range)
+        tree.root = decode(template.func_set, codes[start:end], operands[start:end], constants[start:end],
+                           template.variables)
+        if fitness is not None and not np.isnan(fitness[i]):
+            tree.fitness = float(fitness[i])
+        trees.append(tree)
+    return trees
+
+
+def _template(engine: "EvolutionEngine") -> GPTree:
+    population = engine.population
+    if isinstance(population, ArrayPopulation):
+        return GPTree(population.func_set, population.variables, population.use_erc, population.erc_range)
+    if not population.population:
+        raise ValueError("Initialize the population before saving or loading a checkpoint")
+    return population.population[0]
+
+
+def save_checkpoint(path: str, engine: "EvolutionEngine", generation: int, compress: bool = False):
+    """
+    Write the state of an evolution to a single .npz file.
+
+    The population is stored as flat prefix-encoded arrays (function indices, variable
+    indices and constants) with its fitness, next to the best individual, the engine's
+    per-generation statistics and the states of the random generators. The file is
+    written to a temporary name first and then renamed, so a crash while saving never
+    leaves a truncated checkpoint behind.
+
+    Args:
+        path: Destination file
+        engine: Engine to save (single population)
+        generation: Number of the last completed generation
+        compress: Use zip compression (smaller file, slower save and load)
+    """
+    population = engine.population
+    template = _template(engine)
+    if isinstance(population, ArrayPopulation):
+        arrays = {"codes": population.codes, "operands": population.operands,
+                  "constants": population.constants, "offsets": population.offsets,
+                  "sizes": population.sizes, "rejected": population.rejected}
+        fitness = population.fitness
+    else:
+        arrays = encode_trees(population.population, template.func_set, template.variables)
+        fitness = np.array([np.nan if tree.fitness is None else tree.fitness
+                            for tree in population.population], dtype=float)
+        if population.case_errors is not None:
+            # Lexicase selection reads them before the next evaluation
+            arrays["case_errors"] = population.case_errors
+
+    state = {
+        "version": np.array(CHECKPOINT_VERSION),
+        "generation": np.array(generation),
+        "function_names": np.array([func.name for func in template.func_set]),
+        "variables": np.array(template.variables),
+        "fitness": fitness,
+        **arrays,
+    }
+    best = engine.best_individual
+    if best is not None:
+        best_arrays = encode_trees([best], template.func_set, template.variables)
+        state.update({f"best_{key}": value for key, value in best_arrays.items()})
+        state["best_fitness"] = np.array(np.nan if best.fitness is None else best.fitness)
+    for name in _ENGINE_LISTS:
+        state[name] = np.array(getattr(engine, name), dtype=float)
+    state["total_evaluations"] = np.array(engine.total_evaluations)
+
+    # Random generators: the random module, numpy's global generator, the engine's and the sampler's
+    version, internal, gauss_next = random.getstate()
+    state["python_rng"] = np.array(internal, dtype=np.int64)
+    state["python_rng_extra"] = np.array([version, np.nan if gauss_next is None else gauss_next])
+    _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    state["numpy_rng_keys"] = keys
+    state["numpy_rng_extra"] = np.array([pos, has_gauss, cached_gaussian])
+    state["selection_rng"] = np.array(json.dumps(engine.rng.bit_generator.state))
+    if engine.sampler is not None:
+        state["sampler_rng"] = np.array(json.dumps(engine.sampler._rng.bit_generator.state))
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        (np.savez_compressed if compress else np.savez)(f, **state)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path: str, engine: "EvolutionEngine") -> int:
+    """
+    Restore an evolution saved by save_checkpoint into an engine.
+
+    The engine's population must already be set up with the same function set (by name
+    and order) and variables; its individuals, fitness, the best individual, the
+    per-generation statistics and the random generator states are replaced.
+
+    Args:
+        path: Checkpoint file
+        engine: Engine to restore into
+
+    Returns:
+        Number of the last completed generation stored in the checkpoint
+    """
+    with np.load(path) as data:
+        state = {key: data[key] for key in data.files}
+    if int(state["version"]) != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {int(state['version'])}")
+
+    template = _template(engine)
+    if state["function_names"].tolist() != [func.name for func in template.func_set]:
+        raise ValueError("The checkpoint was written with a different function set")
+    if state["variables"].tolist() != list(template.variables):
+        raise ValueError("The checkpoint was written with different variables")
+
+    population = engine.population
+    fitness = state["fitness"]
+    if isinstance(population, ArrayPopulation):
+        population.set_arrays(state["codes"], state["operands"], state["constants"], state["offsets"],
+                              fitness, state.get("sizes"))
+        if "rejected" in state:
+            population.rejected = state["rejected"]
+    else:
+        population.population = decode_trees(state, template, fitness)
+        population.population_size = len(population.population)
+        population.case_errors = state.get("case_errors")
+        population._case_error_rows = {}
+
+    if "best_codes" in state:
+        best_arrays = {key: state[f"best_{key}"] for key in ("codes", "operands", "constants", "offsets")}
+        engine.best_individual = decode_trees(best_arrays, template, state["best_fitness"].reshape(1))[0]
+    for name in _ENGINE_LISTS:
+        values = state[name].tolist()
+        setattr(engine, name, values if name in ("history", "generation_seconds") else [int(v) for v in values])
+    if "total_evaluations" in state:
+        engine.total_evaluations = int(state["total_evaluations"])
+
+    python_rng_version, gauss_next = state["python_rng_extra"].tolist()
+    random.setstate((int(python_rng_version), tuple(int(v) for v in state["python_rng"]),
+                     None if np.isnan(gauss_next) else gauss_next))
+    pos, has_gauss, cached_gaussian = state["numpy_rng_extra"].tolist()
+    np.random.set_state(("MT19937", state["numpy_rng_keys"], int(pos), int(has_gauss), cached_gaussian))
+    if "selection_rng" in state:
+        engine.rng.bit_generator.state = json.loads(str(state["selection_rng"]))
+    if engine.sampler is not None and "sampler_rng" in state:
+        engine.sampler._rng.bit_generator.state = json.loads(str(state["sampler_rng"]))
+    return int(state["generation"])
@@ -0,0 +1,125 @@
+import time
+from typing import Callable, Union
+import numpy as np
+
+from genetic_algorithm.population import GAPopulation, score_tree
+from genetic_algorithm.array_population import ArrayPopulation
+from utils.gp_tree import GPTree
+from utils.gp_gradient import learnable_nodes, optimize_constants
+from utils.gp_program import ERC
+from utils.loss_function import supports_gradient
+
+
+class ConstantOptimizer:
+
+    def __init__(self, top_k: int = 5, time_budget: float = 1.0, max_iter: int = 25):
+        """
+        Per-generation local search over the learnable constants (ERCs) of the best trees.
+
+        After each evaluation the top_k individuals that contain learnable constants are
+        tuned with gradient-based L-BFGS (see utils.gp_gradient.optimize_constants) until
+        the time budget for the generation runs out. Improved trees get their new fitness
+        (and, for lexicase selection, their new case errors) in place, so selection sees
+        the tuned constants.
+
+        Args:
+            top_k: Number of best individuals to tune per generation
+            time_budget: Wall-clock seconds allowed per generation
+            max_iter: Maximum L-BFGS iterations per tree
+        """
+        if top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        if time_budget <= 0:
+            raise ValueError("time_budget must be positive")
+        self.top_k = top_k
+        self.time_budget = time_budget
+        self.max_iter = max_iter
+        # Counts from the last optimize() call
+        self.stats = {"optimized": 0, "improved": 0, "seconds": 0.0}
+        # Structural hashes of trees already tuned on the current data
+        self._tuned = set()
+        self._data = None
+
+    def optimize(self,
+                 population: Union[GAPopulation, ArrayPopulation],
+                 data: np.ndarray,
+                 target_values,
+                 loss_function: Callable):
+        """
+        Tune the constants of the best individuals of an evaluated population in place.
+
+        Args:
+            population: The evaluated population
+            data: Input array the population was evaluated on
+            target_values: Target values
+            loss_function: Loss used for fitness (must be supported by loss_gradient)
+        """
+        if not supports_gradient(loss_function):
+            raise ValueError("Constant optimization requires mse, mae, rmse or log_cosh")
+        if data is not self._data:
+            # Tuned constants are only optimal for the data they were fitted on
+            self._tuned.clear()
+            self._data = data
+
+        start = time.perf_counter()
+        targets = np.asarray(target_values, dtype=float)
+        optimized = improved = 0
+        for index, tree in self._candidates(population):
+            if time.perf_counter() - start > self.time_budget:
+                break
+            optimized += 1
+            key = tree.structural_hash()
+            fitness = optimize_constants(tree, data, targets, loss_function, self.max_iter)
+            if fitness is not None and fitness < tree.fitness:
+                improved += 1
+                tree.fitness = fitness
+                self._store(population, index, tree, key, data, targets, loss_function)
+            self._tuned.add(tree.structural_hash())
+
+        self.stats = {"optimized": optimized, "improved": improved, "seconds": time.perf_counter() - start}
+
+    def _candidates(self, population: Union[GAPopulation, ArrayPopulation]):
+        # Yields (index, tree) for up to top_k of the fittest trees with untuned constants
+        # (for an ArrayPopulation, tree is decoded from the individual at index)
+        if isinstance(population, ArrayPopulation):
+            fitness = np.where(np.isnan(population.fitness), np.inf, population.fitness)
+            order = np.argsort(fitness, kind="stable")
+            ranked = ((int(i), None) for i in order if np.isfinite(fitness[i]))
+        else:
+            trees = [(i, tree) for i, tree in enumerate(population.population) if np.isfinite(tree.fitness)]
+            ranked = iter(sorted(trees, key=lambda item: item[1].fitness))
+
+        found = 0
+        for index, tree in ranked:
+            if found >= self.top_k:
+                return
+            if isinstance(population, ArrayPopulation):
+                if not np.any(population.individual(index)[0] == ERC):
+                    continue
+                tree = population.to_tree(index)
+            elif not learnable_nodes(tree.root):
+                continue
+            if tree.structural_hash() in self._tuned:
+                continue
+            found += 1
+            yield index, tree
+
+    def _store(self, population: Union[GAPopulation, ArrayPopulation], index: int, tree: GPTree, old_key: bytes,
+               data: np.ndarray, targets: np.ndarray, loss_function: Callable):
+        if isinstance(population, ArrayPopulation):
+            # Learnable constants appear in prefix order, like the ERC slots of the encoding
+            start, end = population.offsets[index], population.offsets[index + 1]
+            slots = start + np.flatnonzero(population.codes[start:end] == ERC)
+            population.constants[slots] = [node.value for node in learnable_nodes(tree.root)]
+            population.fitness[index] = tree.fitness
+            return
+        if population.fitness_cache is not None:
+            population.fitness_cache.put(tree, tree.fitness)
+        if population.case_errors is not None:
+            # Lexicase selection reads the row of the tuned tree, not the errors it had before
+            score_tree(tree, data, targets, loss_function, case_errors=population.case_errors[index])
+            rows = population._case_error_rows
+            if rows.get(old_key) == index:
+                # Clones with the old constants must not be served the new errors
+                del rows[old_key]
+            rows.setdefault(tree.structural_hash(), index)
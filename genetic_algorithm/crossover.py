@@ -1,8 +1,11 @@
 import random
+from typing import Optional
 from utils.gp_tree import GPTree
 from utils import constant
 
-def subtree_crossover(parent1: GPTree, parent2: GPTree) -> GPTree:
+def subtree_crossover(parent1: GPTree, parent2: GPTree,
+                      max_tree_depth: Optional[int] = None,
+                      max_tree_size: Optional[int] = None) -> GPTree:
     """
     Performs subtree crossover between two parents to produce a new child.
     
@@ -12,42 +15,47 @@ def subtree_crossover(parent1: GPTree, parent2: GPTree) -> GPTree:
     4. Replace the subtree at the crossover point in the copy with a copy of 
        the subtree from parent2.
        
+    With a depth or size limit, crossover points are drawn again (up to
+    MAX_VARIATION_ATTEMPTS times) until the child fits; otherwise the child is
+    a copy of parent1. The check uses the cached sizes and heights, so rejected
+    draws copy nothing.
+       
     Args:
         parent1: The first parent GPTree (receives the subtree)
         parent2: The second parent GPTree (donates the subtree)
+        max_tree_depth: Optional depth limit for the child
+        max_tree_size: Optional node count limit for the child
         
     Returns:
         A new GPTree instance representing the child.
     """
-    # Create a copy of parent1 to be the base of the child
-    child = parent1.copy()
-    
-    # Collect all nodes from the child (which is a copy of parent1)
-    child_nodes = child._collect_all_nodes(child.root)
-    if not child_nodes:
-        return child # Should not happen for valid trees
-        
-    # Select crossover point in child
-    destination_node = random.choice(child_nodes)
-    
-    # Collect all nodes from parent2
-    parent2_nodes = parent2._collect_all_nodes(parent2.root)
-    if not parent2_nodes:
-        return child # Parent2 is empty? Return parent1 copy
-        
-    # Select crossover point in parent2 (source of the new subtree)
-    source_node = random.choice(parent2_nodes)
-    
-    # Create a copy of the source subtree to avoid modifying parent2 later
-    # We can use the internal _copy_node method from the child instance 
-    # since it's a static utility effectively, or we need to access it publicly.
-    # GPTree._copy_node is technically internal but we can use it on the instance.
-    new_subtree = child._copy_node(source_node)
+    if parent1.root is None or parent2.root is None:
+        return parent1.copy() # Parent2 is empty? Return parent1 copy
     
-    # Replace the destination node's content with the new subtree
-    # Changing values in place works because we are modifying the 'child' tree objects
-    destination_node.value = new_subtree.value
-    destination_node.next = new_subtree.next
-    destination_node.is_learnable = new_subtree.is_learnable
-    
-    return child
+    for _ in range(constant.MAX_VARIATION_ATTEMPTS):
+        # Select crossover points in parent1 and in parent2 (source of the new subtree).
+        # Both picks walk down the cached subtree sizes instead of listing every node.
+        index = random.randrange(parent1.root.size)
+        destination_node, path = parent1._node_at(index)
+        source_node, _ = parent2._random_node()
+
+        if max_tree_depth is not None and len(path) + source_node.height > max_tree_depth:
+            continue
+        if max_tree_size is not None and \
+                parent1.root.size - destination_node.size + source_node.size > max_tree_size:
+            continue
+
+        # Create a copy of parent1 to be the base of the child
+        child = parent1.copy()
+        destination_node, path = child._node_at(index)
+
+        # Create a copy of the source subtree to avoid modifying parent2 later
+        new_subtree = child._copy_node(source_node)
+
+        # Replace the destination node's content with the new subtree;
+        # sizes, heights and hashes of its ancestors are updated on the way up
+        child._replace_node(destination_node, path, new_subtree)
+        return child
+
+    # No crossover point pair fits the limits: fall back to the parent
+    return parent1.copy()
@@ -1,115 +1,570 @@
+import heapq
 import random
+import time
 import copy
-from typing import List, Callable, Optional, Dict
+from typing import List, Callable, Optional, Dict, Iterator, Union
+import numpy as np
 
-from genetic_algorithm.population import GAPopulation
-from genetic_algorithm.selection import tournament_selection
+from genetic_algorithm.population import GAPopulation, score_tree
+from genetic_algorithm.array_population import ArrayPopulation
+from genetic_algorithm.selection import batch_tournament, elite_indices, fitness_array, lexicase_selection, \
+    seeded_rng, tarpeian_mask
 from genetic_algorithm.crossover import subtree_crossover
+from genetic_algorithm.sampling import ProgressiveSampler
+from genetic_algorithm.constant_optimizer import ConstantOptimizer
+from genetic_algorithm.metrics import Callback, new_timings, hit_rate, size_statistics
+from genetic_algorithm.checkpoint import save_checkpoint, load_checkpoint
+from genetic_algorithm.stopping import StoppingCriterion, first_stop
+from genetic_algorithm.array_population import node_depths
+from genetic_algorithm import islands
 from utils.gp_tree import GPTree
-from utils import constant
+from utils import constant, gp_codegen
 
 class EvolutionEngine:
     def __init__(self, 
-                 population: GAPopulation,
+                 population: Union[GAPopulation, ArrayPopulation],
                  crossover_rate: float = 0.9,
                  mutation_rate: float = 0.1,
                  tournament_size: int = 7,
-                 elitism_size: int = 1):
+                 elitism_size: int = 1,
+                 compile_elites: bool = True,
+                 n_jobs: Optional[int] = None,
+                 sampler: Optional[ProgressiveSampler] = None,
+                 racing: Optional[Union[str, float]] = None,
+                 constant_optimizer: Optional[ConstantOptimizer] = None,
+                 max_tree_depth: Optional[int] = None,
+                 max_tree_size: Optional[int] = None,
+                 parsimony_coefficient: float = 0.0,
+                 size_pressure: Optional[float] = None,
+                 tarpeian_rate: float = 0.0,
+                 callbacks: Optional[List[Callback]] = None,
+                 checkpoint_path: Optional[str] = None,
+                 checkpoint_interval: int = 10,
+                 stopping_criteria: Optional[List[StoppingCriterion]] = None,
+                 selection: str = constant.TOURNAMENT,
+                 lexicase_epsilon: Optional[float] = None,
+                 lexicase_cases: Optional[Union[int, float]] = None):
         """
         Engine to drive the genetic programming evolution process.
         
         Args:
-            population: An initialized GAPopulation object
+            population: An initialized GAPopulation (or ArrayPopulation) object
             crossover_rate: Probability of performing crossover
             mutation_rate: Probability of performing mutation (if not crossover)
             tournament_size: Size of tournament for selection
             elitism_size: Number of best individuals to carry over unchanged
+            compile_elites: Compile elites into native numpy functions, since they
+                            survive (and are re-evaluated) for several generations
+            n_jobs: Number of worker processes used to evaluate the population.
+                    None keeps the population's own setting.
+            sampler: Optional ProgressiveSampler. Each generation is then scored on a
+                     random mini-batch that grows over the run; the best individuals of
+                     every generation are re-scored on the full data, so best_individual
+                     and history always report full-data fitness.
+            racing: Optional early-abort threshold for evaluating offspring. 'elite' uses the
+                    worst fitness kept through elitism, a float q in (0, 1] the q-quantile of
+                    the previous generation's fitness. Trees whose partial loss provably
+                    exceeds it stop being scored (see GAPopulation.evaluate). Not with a
+                    sampler: the previous generation was scored on another batch, so its
+                    fitness bounds nothing on the current one.
+            constant_optimizer: Optional ConstantOptimizer that tunes the learnable constants
+                                of the best individuals after each evaluation (array data only).
+            max_tree_depth: Optional depth limit enforced by crossover and subtree mutation;
+                            offspring over the limit are redrawn, then fall back to the parent
+            max_tree_size: Optional node count limit, enforced like max_tree_depth
+            parsimony_coefficient: Tournaments rank by fitness + parsimony_coefficient * size
+            size_pressure: Optional double tournament pressure D in [1, 2] (see batch_tournament)
+            tarpeian_rate: Probability of rejecting each above-average-size individual
+                           before selection (see tarpeian_mask)
+            callbacks: Optional Callback objects (genetic_algorithm/metrics.py) notified at the
+                       start and end of evolve() and after every generation, with per-phase
+                       timings, size statistics, failed evaluations and cache hit rates.
+                       Island mode does not run them.
+            checkpoint_path: Optional .npz file that evolve() saves the run to every
+                             checkpoint_interval generations and after the last one
+                             (see genetic_algorithm/checkpoint.py). Single population only.
+            checkpoint_interval: Generations between checkpoints
+            stopping_criteria: Optional StoppingCriterion objects (TargetLoss, NoImprovement,
+                               TimeBudget, EvaluationBudget; see genetic_algorithm/stopping.py)
+                               checked after every generation. The run ends at the first one
+                               that fires, and its name is kept in stop_reason.
+                               Island mode does not support them (ValueError).
+            selection: 'tournament', or 'lexicase' for epsilon-lexicase selection on the
+                       per-case errors the population keeps (see lexicase_selection;
+                       GAPopulation only, without racing). parsimony_coefficient,
+                       size_pressure and tarpeian_rate only apply to tournaments.
+            lexicase_epsilon: Tolerance of lexicase selection. None uses each case's median
+                              absolute deviation; 0 is plain lexicase.
+            lexicase_cases: Optional down-sampling of the cases for each generation's
+                            selections: a number of cases (int) or a fraction of them (float)
         """
         self.population = population
         self.crossover_rate = crossover_rate
         self.mutation_rate = mutation_rate
         self.tournament_size = tournament_size
         self.elitism_size = elitism_size
+        self.compile_elites = compile_elites
+        if n_jobs is not None:
+            self.population.n_jobs = n_jobs
+        self.sampler = sampler
+        if racing is not None and racing != constant.ELITE_THRESHOLD \
+                and not (isinstance(racing, float) and 0 < racing <= 1):
+            raise ValueError(f"racing must be '{constant.ELITE_THRESHOLD}' or a quantile in (0, 1]")
+        if racing is not None and sampler is not None:
+            raise ValueError("racing cannot be combined with a sampler (sample_size)")
+        self.racing = racing
+        self.constant_optimizer = constant_optimizer
+        for name, limit in (("max_tree_depth", max_tree_depth), ("max_tree_size", max_tree_size)):
+            if limit is not None and limit < 1:
+                raise ValueError(f"{name} must be a positive integer")
+        if parsimony_coefficient < 0:
+            raise ValueError("parsimony_coefficient must be non-negative")
+        if size_pressure is not None and not 1 <= size_pressure <= 2:
+            raise ValueError("size_pressure must be in [1, 2]")
+        if not 0 <= tarpeian_rate <= 1:
+            raise ValueError("tarpeian_rate must be in [0, 1]")
+        self.max_tree_depth = max_tree_depth
+        self.max_tree_size = max_tree_size
+        self.parsimony_coefficient = parsimony_coefficient
+        self.size_pressure = size_pressure
+        self.tarpeian_rate = tarpeian_rate
+        if selection not in (constant.TOURNAMENT, constant.LEXICASE):
+            raise ValueError(f"selection must be '{constant.TOURNAMENT}' or '{constant.LEXICASE}'")
+        if selection == constant.LEXICASE:
+            if not isinstance(population, GAPopulation):
+                raise ValueError("Lexicase selection requires a GAPopulation")
+            if racing is not None:
+                raise ValueError("Lexicase selection cannot be combined with racing")
+            # Selection needs every individual's error on every case
+            population.keep_case_errors = True
+        if lexicase_cases is not None and not (isinstance(lexicase_cases, float) and 0 < lexicase_cases <= 1
+                                               or isinstance(lexicase_cases, int) and lexicase_cases >= 1):
+            raise ValueError("lexicase_cases must be a positive int or a fraction in (0, 1]")
+        self.selection = selection
+        self.lexicase_epsilon = lexicase_epsilon
+        self.lexicase_cases = lexicase_cases
+        self.callbacks: List[Callback] = list(callbacks) if callbacks else []
+        if checkpoint_interval < 1:
+            raise ValueError("checkpoint_interval must be a positive integer")
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.stopping_criteria: List[StoppingCriterion] = list(stopping_criteria) if stopping_criteria else []
+        self.stop_reason: Optional[str] = None # Why the last run ended: 'generations' or a criterion's name
+        self.rng = seeded_rng() # Selection draws (tournaments, crossover/mutation choice, Tarpeian rejection)
+        self._timings = new_timings() # Seconds per phase in the current generation
+        self._cache_snapshots: Dict[str, Dict[str, float]] = {} # Cache counters at the last report
+        self._full_fitness: Dict[bytes, float] = {} # Full-data fitness by structural hash (sampling mode)
         
         self.best_individual: Optional[GPTree] = None
         self.history: List[float] = [] # Track best fitness over generations
+        self.evaluations_saved: List[int] = [] # Evaluations skipped through the fitness cache, per generation
+        self.aborted_evaluations: List[int] = [] # Evaluations stopped early by racing, per generation
+        self.rows_saved: List[int] = [] # Rows not scored thanks to racing, per generation
+        self.generation_seconds: List[float] = [] # Wall time of each bred generation (breed + evaluate)
+        self.node_evaluations: List[int] = [] # Nodes evaluated times rows scored, per generation
+        self.total_evaluations = 0 # Individuals scored since the start (generation 0 included, cache hits excluded)
 
     def evolve(self, 
-               data: List[dict], 
+               data: Union[np.ndarray, List[dict]], 
                target_values: List[float], 
                loss_function: Callable,
                generations: int = 50,
-               verbose: bool = True):
+               verbose: bool = True,
+               resume_from: Optional[str] = None):
         """
-        Run the evolution for a specified number of generations.
+        Run the evolution for a specified number of generations, or until a stopping
+        criterion fires (see evolve_steps for a generation-by-generation interface).
         
         Args:
-            data: Input data for evaluation
+            data: Input data for evaluation, a (n_samples, n_features) array or a list of dicts
             target_values: Target output values
             loss_function: Loss function (predicted, actual) -> float
             generations: Number of generations to run
             verbose: Whether to print progress
+            resume_from: Optional checkpoint written by a previous run (see checkpoint_path).
+                         The population, best individual, statistics and random states are
+                         restored and the run continues after the saved generation, up to
+                         generations in total. The population must have been initialized
+                         with the same function set and variables.
         """
         
-        # Initial evaluation
-        self.population.evaluate(data, target_values, loss_function)
-        self._update_best_individual()
-        
-        if verbose:
-            print(f"Gen 0: Best Fitness = {self.best_individual.fitness:.5f}")
-        
-        for gen in range(1, generations + 1):
-            new_individuals = []
-            
-            # 1. Elitism
-            sorted_pop = sorted(self.population.population, key=lambda x: x.fitness)
-            elites = [ind.copy() for ind in sorted_pop[:self.elitism_size]]
-            for elite in elites:
-                elite.fitness = sorted_pop[elites.index(elite)].fitness # Copy fitness too (optimization)
-            new_individuals.extend(elites)
+        for _ in self.evolve_steps(data, target_values, loss_function, generations, verbose, resume_from):
+            pass
+        return self.best_individual
+
+    def evolve_steps(self,
+                     data: Union[np.ndarray, List[dict]],
+                     target_values: List[float],
+                     loss_function: Callable,
+                     generations: int = 50,
+                     verbose: bool = True,
+                     resume_from: Optional[str] = None) -> Iterator[Dict[str, object]]:
+        """
+        Run the evolution one generation at a time, as a generator.
+
+        Takes the same arguments as evolve(). After generation 0 (the initial evaluation,
+        skipped when resuming) and after every bred generation, yields a state dict with
+        generation, best_fitness, best_individual, seconds, elapsed, evaluations (see
+        StoppingCriterion) and stop_reason (None while the run goes on). The run ends after
+        generations, when a stopping criterion fires, or when the caller stops iterating;
+        callbacks' on_evolve_end runs in every case.
+
+        Example:
+            for state in engine.evolve_steps(X, y, mse, generations=500, verbose=False):
+                print(state["generation"], state["best_fitness"])
+        """
+        for callback in self.callbacks:
+            callback.on_evolve_begin(self)
+        try:
+            yield from self._evolve(data, target_values, loss_function, generations, verbose, resume_from)
+        finally:
+            for callback in self.callbacks:
+                callback.on_evolve_end(self)
+
+    def _evolve(self, data, target_values, loss_function: Callable, generations: int, verbose: bool,
+                resume_from: Optional[str] = None) -> Iterator[Dict[str, object]]:
+        started = time.perf_counter()
+        self.stop_reason = None
+        self._cache_snapshots.clear()
+        self._full_fitness.clear()
+        if resume_from is not None:
+            # The restored population is already evaluated
+            first = load_checkpoint(resume_from, self) + 1
+            if verbose:
+                print(f"Resumed from generation {first - 1}: Best Fitness = {self.best_individual.fitness:.5f}")
+        else:
+            # Initial evaluation
+            start = time.perf_counter()
+            self._timings = new_timings()
+            self._evaluate(data, target_values, loss_function, 0)
+            self._timed("best_update", self._update_best_individual, data, target_values, loss_function)
+            seconds = time.perf_counter() - start
+            self._report(0, seconds)
+            first = 1
             
-            # 2. Main Loop
-            while len(new_individuals) < self.population.population_size:
-                if random.random() < self.crossover_rate:
-                    # Crossover
-                    parent1 = tournament_selection(self.population.population, self.tournament_size)
-                    parent2 = tournament_selection(self.population.population, self.tournament_size)
-                    child = subtree_crossover(parent1, parent2)
-                else:
-                    # Mutation
-                    # Select one parent and mutate it
-                    parent = tournament_selection(self.population.population, self.tournament_size)
-                    child = parent.copy()
-                    
-                    # Choose mutation type
-                    mut_type = random.choice([constant.POINT, constant.SUBTREE, constant.HOIST])
-                    child.mutate(mut_type)
-                
-                new_individuals.append(child)
+            if verbose:
+                print(f"Gen 0: Best Fitness = {self.best_individual.fitness:.5f}")
+            yield self._step(0, generations, seconds, started, verbose)
+            if self.stop_reason is not None:
+                return
+        
+        for gen in range(first, generations + 1):
+            self._next_generation(data, target_values, loss_function)
+            self._report(gen, self.generation_seconds[-1])
+            saved = self.evaluations_saved[-1]
             
-            # 3. Update Population
-            self.population.population = new_individuals
+            if verbose and (gen % 1 == 0 or gen == generations):
+                message = f"Gen {gen}: Best Fitness = {self.best_individual.fitness:.5f}"
+                if getattr(self.population, "fitness_cache", None) is not None:
+                    message += f" (cached evaluations: {saved})"
+                if self.racing is not None:
+                    message += f" (aborted: {self.aborted_evaluations[-1]}, rows saved: {self.rows_saved[-1]})"
+                if self.constant_optimizer is not None:
+                    stats = self.constant_optimizer.stats
+                    message += f" (constants improved: {stats['improved']}/{stats['optimized']})"
+                if self.sampler is not None:
+                    message += f" (batch: {self.sampler.batch_size(len(self.history), len(data))} rows)"
+                print(message)
             
-            # 4. Evaluate New Population
-            # Check if we need to re-evaluate elites? 
-            # If data is static, we don't need to, but it's safer/easier to just call evaluate on all.
-            # Optimization: could skip elites if we carried over fitness.
-            self.population.evaluate(data, target_values, loss_function)
+            state = self._step(gen, generations, self.generation_seconds[-1], started, verbose)
+            if self.checkpoint_path is not None and \
+                    (gen % self.checkpoint_interval == 0 or self.stop_reason is not None):
+                save_checkpoint(self.checkpoint_path, self, gen)
+            yield state
+            if self.stop_reason is not None:
+                return
+
+    def _step(self, generation: int, generations: int, seconds: float, started: float,
+              verbose: bool) -> Dict[str, object]:
+        """State of a finished generation; sets stop_reason if the run ends with it."""
+        state = {
+            "generation": generation,
+            "best_fitness": self.best_individual.fitness,
+            "best_individual": self.best_individual,
+            "seconds": seconds,
+            "elapsed": time.perf_counter() - started,
+            "evaluations": self.total_evaluations,
+        }
+        reason = first_stop(self.stopping_criteria, self, state)
+        if reason is not None and generation < generations:
+            if verbose:
+                print(f"Stopping after generation {generation}: {reason}")
+        elif generation >= generations:
+            reason = "generations"
+        self.stop_reason = reason
+        state["stop_reason"] = reason
+        return state
+
+    def _timed(self, phase: str, function: Callable, *args):
+        """Call function(*args), adding its wall time to the phase."""
+        start = time.perf_counter()
+        result = function(*args)
+        self._timings[phase] += time.perf_counter() - start
+        return result
+
+    def _report(self, generation: int, seconds: float):
+        """Send the metrics of a finished generation to the callbacks (if any)."""
+        if not self.callbacks:
+            return
+        if isinstance(self.population, ArrayPopulation):
+            fitness = self.population.fitness
+            sizes = np.diff(self.population.offsets)
+            depths = np.array([node_depths(self.population.individual(i)[3]).max()
+                               for i in range(self.population.population_size)])
+            subtree_cache = fitness_cache = None
+        else:
+            trees = self.population.population
+            fitness = np.array([tree.fitness for tree in trees], dtype=float)
+            sizes = np.array([tree.root.size for tree in trees])
+            depths = np.array([tree.root.height for tree in trees])
+            subtree_cache = self.population.subtree_cache
+            fitness_cache = self.population.fitness_cache
+
+        caches = {}
+        for name, cache in (("fitness", fitness_cache), ("subtree", subtree_cache),
+                            ("function", gp_codegen.function_cache)):
+            if cache is not None:
+                info = cache.info()
+                caches[name] = hit_rate(info, self._cache_snapshots.get(name))
+                self._cache_snapshots[name] = info
+
+        metrics = {
+            "generation": generation,
+            "best_fitness": float(self.best_individual.fitness),
+            "seconds": seconds,
+            "timings": dict(self._timings),
+            "population": size_statistics(sizes, depths),
+            "evaluation": dict(self.population.evaluation_stats),
+            "failed_evaluations": int(np.count_nonzero(np.isposinf(fitness))),
+            "caches": caches,
+        }
+        for callback in self.callbacks:
+            callback.on_generation(self, metrics)
+
+    def evolve_islands(self,
+                       data: Union[np.ndarray, List[dict]],
+                       target_values: List[float],
+                       loss_function: Callable,
+                       generations: int = 50,
+                       n_islands: int = 4,
+                       migration_interval: int = 5,
+                       migration_size: int = 2,
+                       topology: str = constant.RING,
+                       verbose: bool = True):
+        """
+        Run the evolution as an island model, one process per sub-population.
+        
+        The population is dealt into n_islands sub-populations that evolve independently
+        (own tournament selection and variation loop). Every migration_interval generations
+        the best migration_size individuals of each island replace the worst individuals of
+        its neighbours. Islands talk to this process over local pipes only.
+        
+        Args:
+            data: Input data for evaluation, a (n_samples, n_features) array or a list of dicts
+            target_values: Target output values
+            loss_function: Loss function (predicted, actual) -> float (must be picklable)
+            generations: Number of generations to run
+            n_islands: Number of sub-populations / processes
+            migration_interval: Generations between migrations
+            migration_size: Number of individuals each island sends per migration
+            topology: 'ring' (island i sends to i + 1) or 'full' (each island sends to all others)
+            verbose: Whether to print progress
             
-            # 5. Statistics
-            self._update_best_individual()
-            self.history.append(self.best_individual.fitness)
+        Returns:
+            The best individual found on any island
+        """
+        if isinstance(self.population, ArrayPopulation):
+            raise ValueError("Island mode requires a GAPopulation")
+        if self.stopping_criteria:
+            raise ValueError("Stopping criteria are not supported in island mode")
+        return islands.run_islands(self, data, target_values, loss_function, generations,
+                                   n_islands, migration_interval, migration_size, topology, verbose)
+
+    def _next_generation(self,
+                         data: Union[np.ndarray, List[dict]],
+                         target_values: List[float],
+                         loss_function: Callable):
+        """Breed, evaluate and record one generation (the population must already be evaluated)."""
+        start = time.perf_counter()
+        self._timings = new_timings()
+        # Racing threshold, taken from the generation about to be replaced
+        threshold = self._race_threshold()
+        
+        if isinstance(self.population, ArrayPopulation):
+            # Struct-of-arrays backend: variation is array slicing, elites keep their fitness
+            self.population.breed(self.crossover_rate, self.tournament_size, self.elitism_size,
+                                  max_tree_depth=self.max_tree_depth,
+                                  max_tree_size=self.max_tree_size,
+                                  parsimony_coefficient=self.parsimony_coefficient,
+                                  size_pressure=self.size_pressure,
+                                  tarpeian_rate=self.tarpeian_rate,
+                                  timings=self._timings,
+                                  rng=self.rng)
+        else:
+            self._breed_trees()
+        
+        # 4. Evaluate New Population
+        # Elites and clones of already scored trees are served by the
+        # population's fitness cache (if any) instead of being re-evaluated.
+        self._evaluate(data, target_values, loss_function, len(self.history) + 1, threshold)
+        
+        # 5. Statistics
+        self._timed("best_update", self._update_best_individual, data, target_values, loss_function)
+        self.history.append(self.best_individual.fitness)
+        stats = self.population.evaluation_stats
+        self.evaluations_saved.append(stats["cached"])
+        self.aborted_evaluations.append(stats["aborted"])
+        self.rows_saved.append(stats["rows_saved"])
+        self.node_evaluations.append(stats["node_evaluations"])
+        self.generation_seconds.append(time.perf_counter() - start)
+
+    def _evaluate(self,
+                  data: Union[np.ndarray, List[dict]],
+                  target_values: List[float],
+                  loss_function: Callable,
+                  generation: int,
+                  threshold: Optional[float] = None):
+        """Score the population on the full data, or on the sampler's batch for this generation."""
+        if self.sampler is not None:
+            data, target_values = self.sampler.sample(generation, data, target_values)
+            if isinstance(self.population, ArrayPopulation):
+                # Elites keep their fitness, which was measured on the previous batch.
+                # (The GAPopulation fitness cache is cleared by binding the new batch.)
+                self.population.reset_fitness()
+        self._timed("evaluation", self.population.evaluate, data, target_values, loss_function, threshold)
+        self.total_evaluations += self.population.evaluation_stats["evaluated"]
+        if self.constant_optimizer is not None and isinstance(data, np.ndarray):
+            self._timed("constant_optimization", self.constant_optimizer.optimize,
+                        self.population, data, target_values, loss_function)
+
+    def _race_threshold(self) -> Optional[float]:
+        """Racing threshold from the current (already evaluated) population, or None."""
+        if self.racing is None:
+            return None
+        if isinstance(self.population, ArrayPopulation):
+            fitness = np.array(self.population.fitness, dtype=float)
+        else:
+            fitness = np.array([tree.fitness for tree in self.population.population], dtype=float)
+        fitness = fitness[np.isfinite(fitness)]
+        if fitness.size == 0:
+            return None
+        if self.racing == constant.ELITE_THRESHOLD:
+            # Worst fitness kept through elitism
+            k = min(max(self.elitism_size, 1), fitness.size) - 1
+            return float(np.partition(fitness, k)[k])
+        return float(np.quantile(fitness, self.racing))
+
+    def _breed_trees(self):
+        new_individuals = []
+        timings = self._timings
+        clock = time.perf_counter
+        population = self.population.population
+        
+        # 1. Elitism
+        start = clock()
+        fitness = fitness_array(population)
+        for i in elite_indices(fitness, self.elitism_size):
+            elite = population[i].copy()
+            elite.fitness = population[i].fitness # Copy fitness too (optimization)
+            if self.compile_elites:
+                elite.to_function()
+            new_individuals.append(elite)
+        timings["elitism"] += clock() - start
+        
+        # 2. Selection: every parent of the generation in one batch (of tournaments or lexicase)
+        start = clock()
+        n_offspring = self.population.population_size - len(new_individuals)
+        crossover = self.rng.random(n_offspring) < self.crossover_rate
+        n_parents = n_offspring + int(np.count_nonzero(crossover))
+        if self.selection == constant.LEXICASE:
+            parents = self._lexicase_parents(n_parents).tolist()
+        else:
+            sizes = np.array([ind.root.size for ind in population]) \
+                if self.parsimony_coefficient or self.size_pressure is not None or self.tarpeian_rate > 0 else None
+            if self.parsimony_coefficient:
+                fitness = fitness + self.parsimony_coefficient * sizes
+            # Bloat control: oversized individuals may be excluded from selection (elites are kept)
+            if self.tarpeian_rate > 0:
+                fitness[tarpeian_mask(sizes, self.tarpeian_rate, self.rng)] = np.inf
+            parents = batch_tournament(fitness, n_parents, self.rng,
+                                       self.tournament_size, sizes, self.size_pressure).tolist()
+        timings["selection"] += clock() - start
+        
+        # 3. Variation
+        next_parent = 0
+        for is_crossover in crossover.tolist():
+            start = clock()
+            if is_crossover:
+                parent1 = population[parents[next_parent]]
+                parent2 = population[parents[next_parent + 1]]
+                next_parent += 2
+                child = subtree_crossover(parent1, parent2, self.max_tree_depth, self.max_tree_size)
+                timings["crossover"] += clock() - start
+            else:
+                # Mutation
+                child = population[parents[next_parent]].copy()
+                next_parent += 1
+                
+                # Choose mutation type
+                mut_type = random.choice([constant.POINT, constant.SUBTREE, constant.HOIST])
+                child.mutate(mut_type, self.max_tree_depth, self.max_tree_size)
+                timings["mutation"] += clock() - start
             
-            if verbose and (gen % 1 == 0 or gen == generations):
-                print(f"Gen {gen}: Best Fitness = {self.best_individual.fitness:.5f}")
+            new_individuals.append(child)
+        
+        # 4. Update Population
+        self.population.population = new_individuals
 
-        return self.best_individual
+    def _lexicase_parents(self, n_parents: int) -> np.ndarray:
+        errors = self.population.case_errors
+        if errors is None or len(errors) != len(self.population.population):
+            raise ValueError("Lexicase selection needs the case errors of the current population; "
+                             "evaluate it with keep_case_errors=True first")
+        n_cases = self.lexicase_cases
+        if isinstance(n_cases, float):
+            n_cases = max(1, round(n_cases * errors.shape[1]))
+        return lexicase_selection(errors, n_parents, self.rng, self.lexicase_epsilon, n_cases)
 
-    def _update_best_individual(self):
+    def _update_best_individual(self,
+                                data: Union[np.ndarray, List[dict]],
+                                target_values: List[float],
+                                loss_function: Callable):
         """Find the best individual in current population and update global best."""
-        current_best = min(self.population.population, key=lambda x: x.fitness)
+        if self.sampler is not None:
+            self._update_best_sampled(data, target_values, loss_function)
+            return
+        if isinstance(self.population, ArrayPopulation):
+            current_best = self.population.best()
+        else:
+            current_best = min(self.population.population, key=lambda x: x.fitness)
+        self._consider_best(current_best)
+
+    def _update_best_sampled(self,
+                             data: Union[np.ndarray, List[dict]],
+                             target_values: List[float],
+                             loss_function: Callable):
+        # Batch fitness is only comparable within one generation, so the elites
+        # are re-scored on the full data before competing for the global best
+        n_candidates = max(1, self.elitism_size)
+        if isinstance(self.population, ArrayPopulation):
+            candidates = self.population.top(n_candidates)
+        else:
+            candidates = heapq.nsmallest(n_candidates, self.population.population, key=lambda x: x.fitness)
         
-        if self.best_individual is None or current_best.fitness < self.best_individual.fitness:
+        targets = np.asarray(target_values)
+        for candidate in candidates:
+            key = candidate.structural_hash()
+            fitness = self._full_fitness.get(key)
+            if fitness is None:
+                fitness = score_tree(candidate, data, targets, loss_function)
+                self._full_fitness[key] = fitness
+            if self.best_individual is None or fitness < self.best_individual.fitness:
+                self.best_individual = candidate.copy()
+                self.best_individual.fitness = fitness
+
+    def _consider_best(self, candidate: GPTree):
+        """Replace the global best individual if the candidate is fitter."""
+        if self.best_individual is None or candidate.fitness < self.best_individual.fitness:
             # We copy it so it doesn't get mutated in next generation if it wasn't an elite
-            self.best_individual = current_best.copy()
-            self.best_individual.fitness = current_best.fitness
+            self.best_individual = candidate.copy()
+            self.best_individual.fitness = candidate.fitness
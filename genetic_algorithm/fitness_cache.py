@@ -0,0 +1,107 @@
+import hashlib
+import pickle
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import numpy as np
+
+from utils.gp_tree import GPTree
+from genetic_algorithm.streaming import ChunkedDataset
+
+
+def dataset_fingerprint(data, target_values) -> str:
+    """
+    Content hash of an evaluation dataset.
+
+    Args:
+        data: Input array (or list of dicts, or a ChunkedDataset, which is read once)
+        target_values: Target values
+
+    Returns:
+        Hex digest identifying the dataset contents
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (data, target_values):
+        if isinstance(part, ChunkedDataset):
+            for X_chunk, y_chunk in part:
+                for array in (X_chunk, y_chunk):
+                    digest.update(np.ascontiguousarray(array).data)
+        elif isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            digest.update(str((part.shape, part.dtype.str)).encode())
+            digest.update(part.data)
+        else:
+            digest.update(pickle.dumps(part))
+    return digest.hexdigest()
+
+
+class FitnessCache:
+
+    def __init__(self, max_entries: int = 100_000):
+        """
+        Cache of fitness values keyed by canonical tree hash, for one dataset and loss.
+
+        Elites and offspring that are exact clones of already scored trees are
+        looked up instead of being evaluated again. Binding a different dataset
+        or loss function clears the cache.
+
+        Args:
+            max_entries: Maximum number of fitness values to keep (least recently used are dropped)
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._data = None
+        self._targets = None
+        self._dataset_key = None
+        self.hits = 0
+        self.misses = 0
+
+    def bind(self, data, target_values, loss_function: Callable):
+        """
+        Associate the cache with a dataset and loss function, clearing it if either changed.
+
+        The same objects passed again are recognised without re-hashing their contents.
+        """
+        if data is self._data and target_values is self._targets and self._dataset_key is not None \
+                and self._dataset_key[0] is loss_function:
+            return
+        key = (loss_function, dataset_fingerprint(data, target_values))
+        if key != self._dataset_key:
+            self.clear()
+            self._dataset_key = key
+        # Keep references so identity checks stay valid for the next call
+        self._data = data
+        self._targets = target_values
+
+    def get(self, tree: GPTree) -> Optional[float]:
+        key = tree.structural_hash()
+        fitness = self._entries.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return fitness
+
+    def put(self, tree: GPTree, fitness: float):
+        key = tree.structural_hash()
+        self._entries[key] = fitness
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
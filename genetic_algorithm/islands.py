@@ -0,0 +1,216 @@
+import multiprocessing
+import random
+from typing import Callable, List, Optional, Sequence, TYPE_CHECKING
+import numpy as np
+
+from genetic_algorithm.population import GAPopulation
+from genetic_algorithm.fitness_cache import FitnessCache
+from genetic_algorithm.selection import fitness_array
+from utils.gp_tree import GPTree
+from utils.subtree_cache import SubtreeCache
+from utils import constant
+
+if TYPE_CHECKING:
+    from genetic_algorithm.evolution import EvolutionEngine
+
+
+def migration_targets(topology: str, n_islands: int) -> List[List[int]]:
+    """
+    Destination islands for the emigrants of each island.
+
+    Args:
+        topology: 'ring' (island i sends to i + 1) or 'full' (every island sends to all others)
+        n_islands: Number of islands
+
+    Returns:
+        List where entry i holds the islands receiving migrants from island i
+    """
+    if topology == constant.RING:
+        return [[(i + 1) % n_islands] if n_islands > 1 else [] for i in range(n_islands)]
+    if topology == constant.FULLY_CONNECTED:
+        return [[j for j in range(n_islands) if j != i] for i in range(n_islands)]
+    raise ValueError(f"topology must be either '{constant.RING}' or '{constant.FULLY_CONNECTED}'")
+
+
+def split_population(population: Sequence[GPTree], n_islands: int) -> List[List[GPTree]]:
+    """Deal individuals round-robin into n_islands sub-populations."""
+    if n_islands < 1 or n_islands > len(population):
+        raise ValueError("n_islands must be between 1 and the population size")
+    return [list(population[i::n_islands]) for i in range(n_islands)]
+
+
+def emigrate(population: GAPopulation, migration_size: int):
+    """
+    The best migration_size individuals of an island, best first, with their case error
+    rows (None unless the population keeps case errors).
+    """
+    order = np.argsort(fitness_array(population.population), kind="stable")[:migration_size]
+    rows = population.case_errors[order] if population.case_errors is not None else None
+    return [population.population[i] for i in order], rows
+
+
+def immigrate(population: GAPopulation, immigrants: List[GPTree], rows: Optional[np.ndarray]):
+    """
+    Replace the worst individuals of an island by immigrants, whose fitness (and case error
+    rows) are valid on the island's data. Case errors are reordered with the individuals,
+    so lexicase selection keeps reading each individual's own row.
+    """
+    immigrants = immigrants[:len(population.population)]
+    if not immigrants:
+        return
+    order = np.argsort(fitness_array(population.population), kind="stable")
+    population.population = [population.population[i] for i in order]
+    population.population[-len(immigrants):] = immigrants
+    if population.case_errors is not None:
+        errors = population.case_errors[order]
+        errors[-len(immigrants):] = rows[:len(immigrants)]
+        population.case_errors = errors
+        rows_by_key = {}
+        for i, tree in enumerate(population.population):
+            rows_by_key.setdefault(tree.structural_hash(), i)
+        population._case_error_rows = rows_by_key
+
+
+def _island_main(conn, engine: "EvolutionEngine", data, target_values, loss_function: Callable,
+                 migration_size: int, seed: int):
+    """
+    Island process: evolve a sub-population on request and exchange migrants over conn.
+
+    Messages received: ('run', n_generations), ('immigrate', trees, case error rows), ('stop',).
+    """
+    random.seed(seed)
+    np.random.seed(seed % (2 ** 32))
+    engine.rng = np.random.default_rng(seed)
+    population = engine.population
+
+    engine._evaluate(data, target_values, loss_function, 0)
+    engine._update_best_individual(data, target_values, loss_function)
+
+    while True:
+        message = conn.recv()
+        if message[0] == "run":
+            start = len(engine.history)
+            for _ in range(message[1]):
+                engine._next_generation(data, target_values, loss_function)
+            emigrants, rows = emigrate(population, migration_size)
+            conn.send((emigrants, rows, engine.best_individual, engine.history[start:]))
+        elif message[0] == "immigrate":
+            immigrate(population, message[1], message[2])
+        elif message[0] == "stop":
+            population.close()
+            conn.send(population.population)
+            break
+
+
+def run_islands(engine: "EvolutionEngine",
+                data,
+                target_values,
+                loss_function: Callable,
+                generations: int,
+                n_islands: int,
+                migration_interval: int,
+                migration_size: int,
+                topology: str,
+                verbose: bool):
+    """
+    Drive an island-model run for an EvolutionEngine (see EvolutionEngine.evolve_islands).
+    """
+    if migration_interval < 1:
+        raise ValueError("migration_interval must be at least 1")
+    targets = migration_targets(topology, n_islands)
+    groups = split_population(engine.population.population, n_islands)
+
+    islands = []
+    for group in groups:
+        source = engine.population
+        population = GAPopulation(
+            len(group),
+            subtree_cache=SubtreeCache(source.subtree_cache.max_bytes, source.subtree_cache.low_water)
+            if source.subtree_cache is not None else None,
+            fitness_cache=FitnessCache() if source.fitness_cache is not None else None,
+            n_jobs=1,
+            race_chunk_size=source.race_chunk_size,
+            simplify=source.simplify
+        )
+        population.population = group
+        island = type(engine)(population,
+                              crossover_rate=engine.crossover_rate,
+                              mutation_rate=engine.mutation_rate,
+                              tournament_size=engine.tournament_size,
+                              elitism_size=engine.elitism_size,
+                              compile_elites=engine.compile_elites,
+                              sampler=engine.sampler,
+                              racing=engine.racing,
+                              constant_optimizer=engine.constant_optimizer,
+                              max_tree_depth=engine.max_tree_depth,
+                              max_tree_size=engine.max_tree_size,
+                              parsimony_coefficient=engine.parsimony_coefficient,
+                              size_pressure=engine.size_pressure,
+                              tarpeian_rate=engine.tarpeian_rate,
+                              selection=engine.selection,
+                              lexicase_epsilon=engine.lexicase_epsilon,
+                              lexicase_cases=engine.lexicase_cases)
+        islands.append(island)
+
+    connections, processes = [], []
+    try:
+        for island in islands:
+            parent_conn, child_conn = multiprocessing.Pipe()
+            # Seeds derive from the coordinator's RNG, so a seeded run is reproducible
+            seed = random.getrandbits(64)
+            process = multiprocessing.Process(
+                target=_island_main,
+                args=(child_conn, island, data, target_values, loss_function, migration_size, seed),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            connections.append(parent_conn)
+            processes.append(process)
+
+        done = 0
+        while done < generations:
+            epoch = min(migration_interval, generations - done)
+            for conn in connections:
+                conn.send(("run", epoch))
+            results = [conn.recv() for conn in connections]
+
+            # Global statistics, tracked generation by generation across islands
+            for step in range(epoch):
+                best_fitness = min(island_history[step] for _, _, _, island_history in results)
+                if engine.best_individual is not None:
+                    best_fitness = min(best_fitness, engine.best_individual.fitness)
+                engine.history.append(best_fitness)
+                if verbose:
+                    print(f"Gen {done + step + 1}: Best Fitness = {best_fitness:.5f}")
+            for _, _, island_best, _ in results:
+                engine._consider_best(island_best)
+            done += epoch
+
+            if done < generations:
+                incoming = [[] for _ in islands]
+                incoming_rows = [[] for _ in islands]
+                for source, (emigrants, rows, _, _) in enumerate(results):
+                    for destination in targets[source]:
+                        # Each message is pickled separately, so islands never share tree objects
+                        incoming[destination].extend(emigrants)
+                        if rows is not None:
+                            incoming_rows[destination].append(rows)
+                for conn, immigrants, rows in zip(connections, incoming, incoming_rows):
+                    conn.send(("immigrate", immigrants, np.concatenate(rows) if rows else None))
+
+        final = []
+        for conn in connections:
+            conn.send(("stop",))
+            final.extend(conn.recv())
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for conn in connections:
+            conn.close()
+
+    engine.population.population = final
+    return engine.best_individual
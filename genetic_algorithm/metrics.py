@@ -0,0 +1,142 @@
+import cProfile
+import json
+import pstats
+from typing import Dict, IO, List, Optional, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from genetic_algorithm.evolution import EvolutionEngine
+
+# Phases timed by EvolutionEngine, in seconds per generation
+PHASES = ("elitism", "selection", "crossover", "mutation", "evaluation", "constant_optimization", "best_update")
+
+
+def new_timings() -> Dict[str, float]:
+    """Zeroed per-phase timings."""
+    return dict.fromkeys(PHASES, 0.0)
+
+
+def hit_rate(info: Dict[str, float], previous: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Hits, misses and hit rate of a cache since a previous info() snapshot.
+
+    Args:
+        info: Current cache.info() (cumulative 'hits' and 'misses')
+        previous: Earlier snapshot, or None to count from the start
+
+    Returns:
+        Dict with 'hits', 'misses' and 'hit_rate' for the interval
+    """
+    hits = info["hits"] - (previous["hits"] if previous else 0)
+    misses = info["misses"] - (previous["misses"] if previous else 0)
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0}
+
+
+def size_statistics(sizes: np.ndarray, depths: np.ndarray) -> Dict[str, float]:
+    """Mean and max of the node counts and depths of a population."""
+    if len(sizes) == 0:
+        return {"size_mean": 0.0, "size_max": 0, "depth_mean": 0.0, "depth_max": 0}
+    return {"size_mean": float(np.mean(sizes)), "size_max": int(np.max(sizes)),
+            "depth_mean": float(np.mean(depths)), "depth_max": int(np.max(depths))}
+
+
+class Callback:
+    """
+    Base class of EvolutionEngine callbacks. Every hook is optional.
+
+    The metrics dict passed to on_generation holds:
+        generation: Generation number (0 is the initial evaluation)
+        best_fitness: Fitness of the best individual so far
+        seconds: Wall time of the generation
+        timings: Seconds per phase (see PHASES); variation phases are 0 for generation 0
+        population: size_mean, size_max, depth_mean, depth_max
+        evaluation: The population's evaluation_stats
+        failed_evaluations: Individuals whose fitness is inf (evaluation raised or overflowed)
+        caches: Hits, misses and hit rate during the generation, per enabled cache
+                ('fitness', 'subtree', 'function')
+    """
+
+    def on_evolve_begin(self, engine: "EvolutionEngine"):
+        pass
+
+    def on_generation(self, engine: "EvolutionEngine", metrics: Dict[str, object]):
+        pass
+
+    def on_evolve_end(self, engine: "EvolutionEngine"):
+        pass
+
+
+class MetricsRecorder(Callback):
+
+    def __init__(self):
+        """Keep every generation's metrics in memory (records), e.g. for a notebook."""
+        self.records: List[Dict[str, object]] = []
+
+    def on_generation(self, engine: "EvolutionEngine", metrics: Dict[str, object]):
+        self.records.append(metrics)
+
+    def phase_totals(self) -> Dict[str, float]:
+        """Seconds spent in each phase over all recorded generations, slowest first."""
+        totals = new_timings()
+        for record in self.records:
+            for phase, seconds in record["timings"].items():
+                totals[phase] += seconds
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+class JSONLinesLogger(Callback):
+
+    def __init__(self, path: str, mode: str = "a"):
+        """
+        Write one JSON object per generation to a file, flushed every line, so a
+        running job can be followed with tail -f.
+
+        Args:
+            path: Output file
+            mode: 'a' appends to an existing file, 'w' truncates it
+        """
+        self.path = path
+        self.mode = mode
+        self._file: Optional[IO[str]] = None
+
+    def on_evolve_begin(self, engine: "EvolutionEngine"):
+        self._file = open(self.path, self.mode)
+
+    def on_generation(self, engine: "EvolutionEngine", metrics: Dict[str, object]):
+        self._file.write(json.dumps(metrics, default=float) + "\n")
+        self._file.flush()
+
+    def on_evolve_end(self, engine: "EvolutionEngine"):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CProfileCallback(Callback):
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Profile the whole evolve() call with cProfile.
+
+        Args:
+            path: Optional file to dump the stats to (readable with pstats or snakeviz)
+        """
+        self.path = path
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def on_evolve_begin(self, engine: "EvolutionEngine"):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def on_evolve_end(self, engine: "EvolutionEngine"):
+        self.profiler.disable()
+        if self.path is not None:
+            self.profiler.dump_stats(self.path)
+
+    def stats(self, sort: str = "cumulative") -> pstats.Stats:
+        """pstats.Stats of the last run, sorted by the given key."""
+        if self.profiler is None:
+            raise ValueError("No profile recorded yet, run evolve() first")
+        return pstats.Stats(self.profiler).sort_stats(sort)
@@ -0,0 +1,186 @@
+import os
+import sys
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from utils.gp_function import GPFunction
+from utils.gp_program import GPProgram
+
+# (shared memory name, shape, dtype string, Fortran order)
+ArrayDescriptor = Tuple[str, Tuple[int, ...], str, bool]
+
+# Worker process state, set by _init_worker
+_worker_func_set: Tuple[GPFunction, ...] = ()
+_worker_blocks: Dict[str, Tuple[shared_memory.SharedMemory, np.ndarray]] = {}
+
+
+def resolve_n_jobs(n_jobs: Optional[int]) -> int:
+    """Translate an n_jobs setting (None, positive, or negative as in joblib) into a worker count."""
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def _init_worker(func_set: Sequence[GPFunction]):
+    global _worker_func_set
+    _worker_func_set = tuple(func_set)
+
+
+def _attach(descriptor: ArrayDescriptor) -> np.ndarray:
+    name, shape, dtype, fortran = descriptor
+    if name not in _worker_blocks:
+        if sys.version_info >= (3, 13):
+            # The parent owns (and unlinks) the block
+            block = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Pool workers share the parent's resource tracker, so registering again is harmless
+            block = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf, order="F" if fortran else "C")
+        _worker_blocks[name] = (block, array)
+    return _worker_blocks[name][1]
+
+
+def _release_stale(active: Sequence[str]):
+    for name in list(_worker_blocks):
+        if name not in active:
+            block, _ = _worker_blocks.pop(name)
+            block.close()
+
+
+def _evaluate_chunk(data: ArrayDescriptor,
+                    targets: ArrayDescriptor,
+                    loss_function: Callable,
+                    encoded: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]) -> List[float]:
+    _release_stale((data[0], targets[0]))
+    X = _attach(data)
+    y = _attach(targets)
+    codes, operands, constants, offsets = encoded
+
+    fitness = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        program = GPProgram(_worker_func_set, codes[start:end], operands[start:end], constants[start:end])
+        try:
+            loss = float(loss_function(program.execute(X), y))
+            # Non-finite losses rank last, as in score_tree
+            fitness.append(loss if np.isfinite(loss) else float("inf"))
+        except Exception:
+            fitness.append(float("inf"))
+    return fitness
+
+
+def encode_programs(programs: Sequence[GPProgram]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenate programs into flat (codes, operands, constants, offsets) arrays."""
+    offsets = np.zeros(len(programs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(program) for program in programs])
+    return (np.concatenate([program.codes for program in programs]),
+            np.concatenate([program.operands for program in programs]),
+            np.concatenate([program.constants for program in programs]),
+            offsets)
+
+
+def _unlink_blocks(blocks: List[shared_memory.SharedMemory]):
+    for block in blocks:
+        block.close()
+        block.unlink()
+    blocks.clear()
+
+
+class ParallelEvaluator:
+
+    def __init__(self, n_jobs: int, func_set: Sequence[GPFunction], chunks_per_job: int = 4):
+        """
+        Persistent process pool that scores compiled trees against a shared-memory dataset.
+
+        X and y are copied once into multiprocessing.shared_memory blocks that workers map
+        zero-copy; only flat program encodings go to the workers and fitness values come back.
+        The function set (and the loss function) must be picklable, e.g. module-level functions
+        or numpy ufuncs.
+
+        Args:
+            n_jobs: Number of worker processes (negative values count back from the CPU count)
+            func_set: Function set shared by all trees that will be evaluated
+            chunks_per_job: Number of task chunks per worker, to balance uneven tree sizes
+        """
+        self.n_jobs = resolve_n_jobs(n_jobs)
+        self.func_set = tuple(func_set)
+        self.chunks_per_job = chunks_per_job
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self._X = self._X_descriptor = self._X_block = None
+        self._y = self._y_descriptor = self._y_block = None
+        self._finalizer = weakref.finalize(self, _unlink_blocks, self._blocks)
+
+    def _share(self, array: np.ndarray) -> Tuple[ArrayDescriptor, shared_memory.SharedMemory]:
+        fortran = array.flags.f_contiguous and not array.flags.c_contiguous
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, order="F" if fortran else "C")
+        shared[...] = array
+        self._blocks.append(block)
+        return (block.name, array.shape, array.dtype.str, fortran), block
+
+    def _release(self, block: Optional[shared_memory.SharedMemory]):
+        if block is not None:
+            self._blocks.remove(block)
+            _unlink_blocks([block])
+
+    def bind(self, X: np.ndarray, y: np.ndarray):
+        """
+        Place X and y in shared memory.
+        X is re-shared only when a different array is passed, y only when its values change.
+        """
+        if self._X is not X:
+            self._release(self._X_block)
+            self._X_descriptor, self._X_block = self._share(np.asarray(X, dtype=float))
+            self._X = X
+        if self._y is None or not np.array_equal(self._y, y):
+            self._release(self._y_block)
+            self._y = np.array(y, dtype=float)
+            self._y_descriptor, self._y_block = self._share(self._y)
+
+    def evaluate(self, programs: Sequence[GPProgram], loss_function: Callable) -> List[float]:
+        """
+        Score programs on the bound dataset in the worker processes.
+
+        Args:
+            programs: Compiled trees, all using this evaluator's function set
+            loss_function: Picklable function (predicted, actual) -> float
+
+        Returns:
+            Fitness per program, in order (inf where evaluation failed)
+        """
+        if self._X_descriptor is None:
+            raise ValueError("No dataset bound. Call bind() first.")
+        if not programs:
+            return []
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.n_jobs,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.func_set,))
+
+        n_chunks = min(len(programs), self.n_jobs * self.chunks_per_job)
+        bounds = np.linspace(0, len(programs), n_chunks + 1).astype(int)
+        data, targets = self._X_descriptor, self._y_descriptor
+        futures = [
+            self._executor.submit(_evaluate_chunk, data, targets, loss_function,
+                                  encode_programs(programs[start:end]))
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+        fitness = []
+        for future in futures:
+            fitness.extend(future.result())
+        return fitness
+
+    def close(self):
+        """Shut down the worker processes and release the shared memory."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        _unlink_blocks(self._blocks)
+        self._X = self._X_descriptor = self._X_block = None
+        self._y = self._y_descriptor = self._y_block = None
@@ -1,16 +1,120 @@
 from utils.gp_tree import GPTree
 from utils.gp_function import GPFunction
 from utils.gp_node import GPNode
+from utils.subtree_cache import SubtreeCache
 from utils import constant
+from genetic_algorithm.fitness_cache import FitnessCache
+from utils.loss_function import supports_partial, target_losses
+from genetic_algorithm.parallel import ParallelEvaluator, resolve_n_jobs
+from genetic_algorithm.streaming import ChunkedDataset, evaluate_streaming, DEFAULT_RACE_CHUNK_SIZE
 import random
 import numpy as np
-from typing import List, Union, Iterable
+from typing import Dict, List, Union, Iterable, Optional
+
+def score_tree(tree: GPTree,
+               data: Union[np.ndarray, List[dict]],
+               targets: np.ndarray,
+               loss_function: callable,
+               subtree_cache: Optional[SubtreeCache] = None,
+               case_errors: Optional[np.ndarray] = None) -> float:
+    """
+    Loss of a single tree on a dataset (inf if evaluation fails).
+
+    Args:
+        tree: The tree to score
+        data: 2D numpy array (columns in the order of the tree's variables) or a list of dicts
+        targets: Target values as a numpy array, or a (n_samples, n_targets) matrix to
+                 score the tree's predictions against every column at once (see target_losses)
+        loss_function: Function that takes (predicted, actual) and returns a loss value
+        subtree_cache: Optional SubtreeCache, already bound to data
+        case_errors: Optional array of len(targets) to fill with the absolute error on
+                     each case, or of n_targets to fill with the loss on each target
+                     (inf where it is not finite or evaluation fails)
+
+    Returns:
+        The loss value (with several targets, the mean of their losses)
+    """
+    try:
+        if isinstance(data, np.ndarray):
+            # One walk over the tree, whole feature columns per node
+            predictions = tree.eval_array(data, cache=subtree_cache)
+        else:
+            # Legacy row-by-row path for list-of-dict data
+            predictions = np.array([tree.eval_tree(**input_data) for input_data in data])
+        
+        if targets.ndim == 2:
+            # The tree is evaluated once, then scored against every target
+            with np.errstate(over="ignore", invalid="ignore"):
+                losses = target_losses(loss_function, np.asarray(predictions, dtype=float), targets)
+            losses[~np.isfinite(losses)] = np.inf
+            if case_errors is not None:
+                case_errors[:] = losses
+            return float(np.mean(losses))
+        if case_errors is not None:
+            # The residuals the loss reduces, kept per case (e.g. for lexicase selection)
+            with np.errstate(over="ignore", invalid="ignore"):
+                np.subtract(predictions, targets, out=case_errors, casting="same_kind")
+                np.abs(case_errors, out=case_errors)
+            case_errors[~np.isfinite(case_errors)] = np.inf
+        # Calculate fitness using the vectorized loss function
+        loss = loss_function(predictions, targets)
+        # A NaN loss (e.g. inf - inf in the predictions) would compare as neither better nor worse
+        return loss if np.isfinite(loss) else float('inf')
+    except Exception as e:
+        # If evaluation fails (e.g., division by zero), assign infinite fitness
+        if case_errors is not None:
+            case_errors[:] = np.inf
+        return float('inf')
+
 
 class GAPopulation:
 
-    def __init__(self, population_size =500):
+    def __init__(self,
+                 population_size =500,
+                 subtree_cache: Optional[SubtreeCache] = None,
+                 fitness_cache: Optional[FitnessCache] = None,
+                 n_jobs: Optional[int] = 1,
+                 race_chunk_size: int = DEFAULT_RACE_CHUNK_SIZE,
+                 simplify: bool = False,
+                 keep_case_errors: bool = False):
+        """
+        Args:
+            population_size: Number of individuals in the population
+            subtree_cache: Optional SubtreeCache shared by every individual during evaluate(),
+                           so identical subtrees are only evaluated once per dataset
+            fitness_cache: Optional FitnessCache, so trees already scored on the same
+                           dataset (elites, clones) are not evaluated again
+            n_jobs: Number of worker processes for evaluate() (-1 uses every core).
+                    Array data is shared with the workers through shared memory.
+            race_chunk_size: Rows per chunk when racing in-memory array data (see evaluate())
+            simplify: Algebraically simplify every tree in place before it is scored
+                      (see GPTree.simplify), so fewer nodes are evaluated
+            keep_case_errors: Keep the absolute error of every individual on every case
+                              in case_errors after evaluate() (for lexicase selection).
+                              Trees are then scored in this process (n_jobs is ignored),
+                              on in-memory data and without racing.
+                              Targets of shape (n_samples, n_targets) are handled the same
+                              way: each tree is evaluated once and scored against every
+                              target, its fitness is the mean of those losses and case_errors
+                              holds them, one column per target.
+        """
         self.population_size = population_size
         self.population = None
+        self.subtree_cache = subtree_cache
+        self.fitness_cache = fitness_cache
+        self.n_jobs = n_jobs
+        self.race_chunk_size = race_chunk_size
+        self.simplify = simplify
+        self.keep_case_errors = keep_case_errors
+        # (population_size, n_cases) float32 errors, or (population_size, n_targets) losses,
+        # of the last evaluate(), rows in population order, and the row of each structural
+        # hash (to copy the rows of fitness cache hits)
+        self.case_errors: Optional[np.ndarray] = None
+        self._case_error_rows: Dict[bytes, int] = {}
+        self._evaluator: Optional[ParallelEvaluator] = None
+        # Counts from the last evaluate() call: {'evaluated': ..., 'cached': ..., 'aborted': ...,
+        # 'rows_saved': ..., 'node_evaluations': ...} (node_evaluations: sum of size * rows scored)
+        self.evaluation_stats = {"evaluated": 0, "cached": 0, "aborted": 0, "rows_saved": 0, "node_evaluations": 0}
 
     def initialize(self, func_set: Iterable[GPFunction], 
                  variables: List[str],
@@ -62,36 +166,173 @@ class GAPopulation:
             tree.random_init(min_d=depth, max_d=depth, method=method)
             self.population.append(tree)
 
-    def evaluate(self, data: List[dict], target_values: List[float], loss_function: callable):
+    def evaluate(self,
+                 data: Union[np.ndarray, List[dict], ChunkedDataset],
+                 target_values: List[float],
+                 loss_function: callable,
+                 threshold: Optional[float] = None):
         """
         Evaluate the fitness of each individual in the population.
         
         Args:
-            data: List of dictionaries, where each dict contains variable values (e.g., [{'x': 1}, {'x': 2}])
+            data: Either a 2D numpy array of shape (n_samples, n_features) whose columns
+                  follow the order of the trees' variables, a ChunkedDataset that is streamed
+                  chunk by chunk (out-of-core data, evaluated serially), or (for backward
+                  compatibility) a list of dictionaries, where each dict contains variable
+                  values (e.g., [{'x': 1}, {'x': 2}])
             target_values: List of expected output values corresponding to the data points
+                           (None for a ChunkedDataset, which carries its own targets), or an
+                           array of shape (n_samples, n_targets) to score every tree against
+                           several targets (see keep_case_errors)
             loss_function: Function that takes (predicted, actual) and returns a loss value (lower is better)
+            threshold: Optional racing threshold (array or chunked data, serial evaluation only).
+                       Trees are scored in row chunks and abandoned as soon as their loss
+                       provably exceeds the threshold; they get that lower bound as fitness,
+                       which ranks them behind every fully scored tree. Requires a loss
+                       supported by PartialLoss (mse, rmse, mae, log_cosh).
         """
         if not self.population:
             raise ValueError("Population is empty. Call initialize() first.")
 
         # Convert target_values to numpy array once
-        targets = np.array(target_values)
+        streaming = isinstance(data, ChunkedDataset)
+        targets = None if streaming else np.array(target_values)
+        vectorized = isinstance(data, np.ndarray)
+        multi_target = targets is not None and targets.ndim == 2
+        errors = None
+        if self.keep_case_errors or multi_target:
+            if streaming or threshold is not None:
+                raise ValueError("Case errors and multiple targets require in-memory data "
+                                 "and cannot be combined with racing")
+            errors = np.empty((len(self.population), targets.shape[1]), dtype=float) if multi_target \
+                else np.empty((len(self.population), len(targets)), dtype=np.float32)
+        parallel = vectorized and resolve_n_jobs(self.n_jobs) > 1 and errors is None
+        racing = threshold is not None and (streaming or vectorized) and not parallel
+        if racing and not supports_partial(loss_function):
+            raise ValueError("Racing requires a loss with partial statistics (mse, rmse, mae or log_cosh)")
+        if vectorized and self.subtree_cache is not None:
+            self.subtree_cache.bind(data)
+        if self.fitness_cache is not None:
+            self.fitness_cache.bind(data, target_values, loss_function)
+
+        if self.simplify:
+            # Done before the cache lookup, so trees that simplify alike share one entry
+            for tree in self.population:
+                tree.simplify()
+
+        # Resolve cache hits and clones first, so only unseen trees are scored
+        pending = []
+        pending_rows = []
+        clones = []
+        first_seen = {}
+        for i, tree in enumerate(self.population):
+            if self.fitness_cache is not None:
+                key = tree.structural_hash()
+                # With case errors, a cached fitness is only used if its error row is at hand
+                if errors is None or key in self._case_error_rows:
+                    fitness = self.fitness_cache.get(tree)
+                    if fitness is not None:
+                        tree.fitness = fitness
+                        if errors is not None:
+                            errors[i] = self.case_errors[self._case_error_rows[key]]
+                            first_seen.setdefault(key, i)
+                        continue
+                if key in first_seen:
+                    clones.append((i, first_seen[key]))
+                    continue
+                first_seen[key] = i
+            pending.append(tree)
+            pending_rows.append(i)
 
-        for tree in self.population:
+        rejected = set()
+        rows_saved = 0
+        node_evaluations = 0
+        if streaming or racing:
+            # One pass over the chunks, scoring every pending tree on each chunk
+            dataset = data if streaming else ChunkedDataset(data, targets, chunk_size=self.race_chunk_size)
+            fitness, rows = evaluate_streaming([tree.eval_array for tree in pending], dataset,
+                                               loss_function, threshold if racing else None)
+            for tree, tree_fitness, tree_rows in zip(pending, fitness, rows):
+                tree.fitness = tree_fitness
+                node_evaluations += tree.root.size * tree_rows
+                if racing and dataset.n_samples is not None and tree_rows < dataset.n_samples:
+                    rejected.add(id(tree))
+                    rows_saved += dataset.n_samples - tree_rows
+        else:
+            if parallel:
+                self._evaluate_parallel(pending, data, targets, loss_function)
+            else:
+                for tree, row in zip(pending, pending_rows):
+                    self._evaluate_tree(tree, data, targets, loss_function, vectorized,
+                                        errors[row] if errors is not None else None)
+            node_evaluations = sum(tree.root.size for tree in pending) * len(data)
+
+        for i, original in clones:
+            self.population[i].fitness = self.population[original].fitness
+            if errors is not None:
+                errors[i] = errors[original]
+        if errors is not None:
+            self.case_errors = errors
+            self._case_error_rows = first_seen
+        if self.fitness_cache is not None:
+            for tree in pending:
+                # A rejected tree's fitness is only a bound for this threshold
+                if id(tree) not in rejected:
+                    self.fitness_cache.put(tree, tree.fitness)
+
+        self.evaluation_stats = {"evaluated": len(pending), "cached": len(self.population) - len(pending),
+                                 "aborted": len(rejected), "rows_saved": rows_saved,
+                                 "node_evaluations": node_evaluations}
+
+    def _evaluate_tree(self, tree: GPTree, data, targets: np.ndarray, loss_function: callable, vectorized: bool,
+                       case_errors: Optional[np.ndarray] = None):
+        tree.fitness = score_tree(tree, data, targets, loss_function, self.subtree_cache if vectorized else None,
+                                  case_errors)
+
+    def _evaluate_parallel(self, trees: List[GPTree], data: np.ndarray, targets: np.ndarray, loss_function: callable):
+        if not trees:
+            return
+        func_set = tuple(trees[0].func_set)
+        if self._evaluator is None or self._evaluator.func_set != func_set:
+            self.close()
+            self._evaluator = ParallelEvaluator(self.n_jobs, func_set)
+        self._evaluator.bind(data, targets)
+
+        remote, programs = [], []
+        for tree in trees:
             try:
-                # Vectorized evaluation if possible, or list comprehension then conversion
-                # Assuming eval_tree handles single point, we loop. 
-                # Optimization: If eval_tree could handle vectors, that would be better, 
-                # but for now we collect results.
-                predictions = np.array([tree.eval_tree(**input_data) for input_data in data])
-                
-                # Calculate fitness using the vectorized loss function
-                tree.fitness = loss_function(predictions, targets)
-            except Exception as e:
-                # If evaluation fails (e.g., division by zero), assign infinite fitness
+                program = tree.compile()
+            except Exception:
                 tree.fitness = float('inf')
+                continue
+            if program.func_set != func_set:
+                # Uses functions the workers do not know about, score it here
+                self._evaluate_tree(tree, data, targets, loss_function, True)
+                continue
+            remote.append(tree)
+            programs.append(program)
 
-    
+        for tree, fitness in zip(remote, self._evaluator.evaluate(programs, loss_function)):
+            tree.fitness = fitness
 
-        
+    def reset_fitness(self):
+        """
+        Forget every fitness value, cached ones included, so the next evaluate() scores
+        the whole population again (e.g. on a new batch of data). The caches recognise
+        a dataset passed again by identity, so they are cleared here rather than relying
+        on bind() to notice data modified in place.
+        """
+        for tree in self.population or []:
+            tree.fitness = None
+        if self.fitness_cache is not None:
+            self.fitness_cache.clear()
+        if self.subtree_cache is not None:
+            self.subtree_cache.clear()
+        self.case_errors = None
+        self._case_error_rows = {}
 
+    def close(self):
+        """Shut down the worker processes used for parallel evaluation, if any."""
+        if self._evaluator is not None:
+            self._evaluator.close()
+            self._evaluator = None
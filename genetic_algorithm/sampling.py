@@ -0,0 +1,70 @@
+import math
+from typing import Optional, Tuple, Union
+import numpy as np
+
+
+class ProgressiveSampler:
+
+    def __init__(self,
+                 sample_size: Union[int, float],
+                 growth: float = 1.5,
+                 seed: Optional[int] = None):
+        """
+        Schedule of random mini-batches that grow over the generations.
+
+        Generation g is scored on min(n_samples, sample_size * growth ** g) rows drawn
+        without replacement. Once the batch would cover the whole dataset the full data
+        is used as is, so late generations are scored exactly.
+
+        Args:
+            sample_size: Rows in the first batch. An int is a row count, a float in (0, 1]
+                         is a fraction of the dataset.
+            growth: Factor by which the batch grows every generation (1 keeps it constant)
+            seed: Seed of the sampler's own random generator, independent of the evolution RNG
+        """
+        if isinstance(sample_size, float):
+            if not 0 < sample_size <= 1:
+                raise ValueError("A fractional sample_size must be in (0, 1]")
+        elif sample_size < 1:
+            raise ValueError("sample_size must be a positive row count or a fraction in (0, 1]")
+        if growth < 1:
+            raise ValueError("growth must be at least 1")
+        self.sample_size = sample_size
+        self.growth = growth
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+
+    def batch_size(self, generation: int, n_samples: int) -> int:
+        """Number of rows used in the given generation (n_samples means the full data)."""
+        if isinstance(self.sample_size, float):
+            initial = self.sample_size * n_samples
+        else:
+            initial = self.sample_size
+        # Compare in log space, growth ** generation overflows for long runs
+        if initial <= 0 or math.log(n_samples / initial) <= generation * math.log(self.growth):
+            return n_samples
+        return max(1, min(n_samples, math.ceil(initial * self.growth ** generation)))
+
+    def indices(self, generation: int, n_samples: int) -> Optional[np.ndarray]:
+        """Sorted row indices of the batch for the generation, or None for the full data."""
+        size = self.batch_size(generation, n_samples)
+        if size >= n_samples:
+            return None
+        # Sorted indices keep the gather close to sequential memory access
+        return np.sort(self._rng.choice(n_samples, size=size, replace=False))
+
+    def sample(self, generation: int, data, target_values) -> Tuple[object, object]:
+        """
+        Return the (data, target_values) batch for the generation.
+
+        Arrays are gathered row-wise (X keeps a column-major layout), lists of dicts by index.
+        The inputs are returned unchanged once the batch covers the full dataset.
+        """
+        index = self.indices(generation, len(data))
+        if index is None:
+            return data, target_values
+        if isinstance(data, np.ndarray):
+            batch = np.asfortranarray(data[index])
+        else:
+            batch = [data[i] for i in index]
+        return batch, np.asarray(target_values)[index]
@@ -1,36 +1,323 @@
-import random
-from typing import List, TYPE_CHECKING
+from typing import List, Optional, TYPE_CHECKING
+
+import numpy as np
 
 if TYPE_CHECKING:
     from utils.gp_tree import GPTree
 
-def tournament_selection(population: List['GPTree'], tournament_size: int = 7) -> 'GPTree':
+def seeded_rng() -> np.random.Generator:
+    """Generator seeded from numpy's global state, so np.random.seed() keeps runs reproducible."""
+    return np.random.default_rng(np.random.randint(2 ** 32, dtype=np.int64))
+
+
+def fitness_array(population: List['GPTree']) -> np.ndarray:
+    """
+    Fitness of each individual as a float array, with inf for unevaluated (None) and
+    non-finite ones: np.argmin would otherwise pick a NaN over every real fitness.
+    """
+    fitness = np.array([np.inf if ind.fitness is None else ind.fitness for ind in population], dtype=float)
+    fitness[~np.isfinite(fitness)] = np.inf
+    return fitness
+
+
+def elite_indices(fitness: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k lowest fitness values, best first.
+
+    np.argpartition finds them in O(n); only the k elites are then sorted.
     """
-    Selects the best individual from a random subset of the population.
-    
+    k = min(k, len(fitness))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(fitness):
+        candidates = np.argpartition(fitness, k - 1)[:k]
+    else:
+        candidates = np.arange(len(fitness))
+    return candidates[np.argsort(fitness[candidates], kind="stable")]
+
+
+def tarpeian_mask(sizes: np.ndarray, rate: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Tarpeian bloat control (Poli): each individual larger than the population's average
+    size is excluded from selection (its selection fitness set to inf, so it loses every
+    tournament) with probability rate. Applied once per generation, after the elites
+    are chosen.
+
+    Returns:
+        Boolean mask of the individuals excluded from selection this generation
+    """
+    if rate <= 0 or len(sizes) == 0:
+        return np.zeros(len(sizes), dtype=bool)
+    return (sizes > sizes.mean()) & (rng.random(len(sizes)) < rate)
+
+
+def batch_tournament(fitness: np.ndarray,
+                     n_selections: int,
+                     rng: np.random.Generator,
+                     tournament_size: int = 7,
+                     sizes: Optional[np.ndarray] = None,
+                     size_pressure: Optional[float] = None) -> np.ndarray:
+    """
+    Run n_selections tournaments at once and return the winners' indices.
+
+    Contestants are drawn with replacement as one (n_selections, tournament_size) matrix
+    of indices and each row's winner is the argmin of its fitness, so selecting a whole
+    generation costs a few numpy calls.
+
     Args:
-        population: List of GPTree individuals
-        tournament_size: Number of individuals to compete in the tournament
-        
+        fitness: Selection fitness per individual (lower is better, inf never wins
+                 against a finite value, no NaN: see fitness_array); add any parsimony
+                 penalty (fitness + parsimony_coefficient * size) beforehand
+        n_selections: Number of parents to select
+        rng: Random generator
+        tournament_size: Number of contestants per tournament
+        sizes: Node count per individual, required with size_pressure
+        size_pressure: Optional double tournament (Luke & Panait), D in [1, 2]: the
+                       winners of two fitness tournaments meet, and the smaller one wins
+                       with probability D / 2 (1 disables the size bias)
+
     Returns:
-        The fittest GPTree from the tournament
+        Array of n_selections indices into fitness
     """
-    if not population:
+    if len(fitness) == 0:
         raise ValueError("Population is empty")
-        
-    # Ensure tournament size is not larger than population
-    k = min(tournament_size, len(population))
-    
-    # Randomly select k individuals
-    tournament = random.sample(population, k)
-    
-    # Return the one with the best (lowest) fitness
-    # Assuming lower fitness is better (e.g., error minimization)
-    # We filter out None fitness values just in case, though they should be evaluated
-    valid_contestants = [ind for ind in tournament if ind.fitness is not None]
-    
-    if not valid_contestants:
-        # Fallback if no fitnesses are set (should not happen in proper loop)
-        return random.choice(tournament)
-        
-    return min(valid_contestants, key=lambda ind: ind.fitness)
+    if size_pressure is not None:
+        first = batch_tournament(fitness, n_selections, rng, tournament_size)
+        second = batch_tournament(fitness, n_selections, rng, tournament_size)
+        first_smaller = sizes[first] <= sizes[second]
+        smaller = np.where(first_smaller, first, second)
+        larger = np.where(first_smaller, second, first)
+        return np.where(rng.random(n_selections) < size_pressure / 2, smaller, larger)
+
+    contestants = rng.integers(0, len(fitness), size=(n_selections, min(tournament_size, len(fitness))))
+    winners = np.argmin(fitness[contestants], axis=1)
+    return contestants[np.arange(n_selections), winners]
+
+
+def _median(values: np.ndarray) -> np.ndarray:
+    """
+    Median of each row. A partition around a single index is several times faster than
+    np.median (which partitions around two); for even lengths the lower middle value is
+    then the maximum of the left part.
+    """
+    n = values.shape[1]
+    k = n // 2
+    ordered = np.partition(values, k, axis=1)
+    upper = ordered[:, k]
+    if n % 2:
+        return upper
+    return (ordered[:, :k].max(axis=1) + upper) / 2
+
+
+def _median_absolute_deviation(by_case: np.ndarray) -> np.ndarray:
+    """
+    Median absolute deviation of each case's errors over the population, the epsilon of
+    epsilon-lexicase selection (La Cava et al.). Cases whose deviation is not finite
+    (more than half the errors are inf) get 0.
+
+    Args:
+        by_case: (n_cases, n_individuals) errors
+    """
+    with np.errstate(invalid="ignore"):
+        deviation = _median(np.abs(by_case - _median(by_case)[:, None]))
+    deviation[~np.isfinite(deviation)] = 0
+    return deviation
+
+
+def _group_identical_rows(errors: np.ndarray) -> np.ndarray:
+    """
+    Label the rows of an error matrix so that identical rows (clones, equivalent trees)
+    share a label, the index of their first row. Rows are bucketed by their dot product
+    with a fixed random vector and only merged after an exact comparison.
+    """
+    weights = np.random.default_rng(0).random(errors.shape[1], dtype=np.float32) + 0.5
+    keys = errors @ weights.astype(errors.dtype)
+    labels = np.arange(len(errors))
+    first = {}
+    for i, key in enumerate(keys.tolist()):
+        j = first.setdefault(key, i)
+        if j != i and np.array_equal(errors[i], errors[j]):
+            labels[i] = j
+    return labels
+
+
+def _filter_effective(candidate_errors: np.ndarray,
+                      tolerance: np.ndarray,
+                      candidates: np.ndarray,
+                      rng: np.random.Generator) -> np.ndarray:
+    """
+    Finish one lexicase selection on the cases that still remove a candidate.
+
+    Only those cases can change the outcome, and the next one in a random order is a
+    uniform draw among them. A case that removes nobody from a set removes nobody from
+    any subset either (the best error can only grow), so the error matrix shrinks to the
+    effective cases and the surviving candidates at each step.
+
+    Args:
+        candidate_errors: (len(candidates), n_cases) errors of the candidates
+        tolerance: Epsilon per case
+        candidates: Indices of the candidates
+        rng: Random generator
+
+    Returns:
+        The candidates left when no case removes anyone (one, or a tie)
+    """
+    while len(candidates) > 1:
+        keep = candidate_errors <= candidate_errors.min(axis=0) + tolerance
+        effective = np.flatnonzero(~keep.all(axis=0))
+        if len(effective) == 0:
+            break
+        kept = keep[:, effective[rng.integers(len(effective))]]
+        candidates = candidates[kept]
+        candidate_errors = candidate_errors[kept][:, effective]
+        tolerance = tolerance[effective]
+    return candidates
+
+
+def _pack(candidates: np.ndarray, valid: np.ndarray):
+    """Move the valid candidates of each row to its front and drop the columns left empty."""
+    width = int(valid.sum(axis=1).max())
+    order = np.argsort(~valid, axis=1, kind="stable")[:, :width]
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(valid, order, axis=1)
+
+
+def lexicase_selection(errors: np.ndarray,
+                       n_selections: int,
+                       rng: np.random.Generator,
+                       epsilon: Optional[float] = None,
+                       n_cases: Optional[int] = None,
+                       max_block: int = 16,
+                       round_budget: int = 1 << 21) -> np.ndarray:
+    """
+    Epsilon-lexicase selection (Spector; La Cava et al.): each parent is chosen by
+    filtering the population case by case, in a random order of the training cases,
+    keeping the individuals within epsilon of the best error among those left, until
+    one is left or the cases run out (then one of the remaining is drawn at random).
+
+    The selections follow that definition exactly, but all of them are filtered together
+    and most of the work is skipped:
+    - Individuals with identical error rows are filtered as one group, and a random
+      member of the winning group is returned.
+    - Cases are drawn with replacement. A case that was already used, or that every
+      candidate passes, removes nobody; skipping such cases leaves the order of the cases
+      that do remove someone uniformly random, as with a shuffle.
+    - The first case filters the whole population, so its pass/fail matrix (every group
+      against the best error of every case) is computed once for all selections.
+    - The candidate sets of all selections are rows of a padded matrix. Each round draws
+      a block of cases per selection, gathers the candidates' errors on them in one
+      indexing operation and applies the first case of the block that removes someone.
+      Blocks grow as the sets (and the matrix) shrink, within round_budget errors.
+    - A selection for which max_block cases in a row removed nobody finishes on the
+      cases that still remove someone (see _filter_effective), once per distinct set.
+      A tie left at the end is broken uniformly over individuals, not groups.
+
+    Args:
+        errors: (n_individuals, n_cases) per-case errors, lower is better (no NaN)
+        n_selections: Number of parents to select
+        rng: Random generator
+        epsilon: Tolerance around the best error of each case. None uses each case's
+                 median absolute deviation over the population; 0 is plain lexicase.
+        n_cases: Optional number of cases drawn (without replacement) for this call,
+                 down-sampled lexicase; None uses all of them
+        max_block: Most cases drawn per selection and round; after that many cases in a
+                   row that removed nobody, a selection finishes on its effective cases
+        round_budget: Errors gathered per round, bounding the memory of a round
+
+    Returns:
+        Array of n_selections indices into the rows of errors
+    """
+    if errors.ndim != 2 or errors.shape[0] == 0:
+        raise ValueError("errors must be a non-empty (n_individuals, n_cases) matrix")
+    if n_cases is not None and n_cases < errors.shape[1]:
+        errors = errors[:, np.sort(rng.choice(errors.shape[1], n_cases, replace=False))]
+    n_total = errors.shape[1]
+    if n_total == 0:
+        return rng.integers(0, len(errors), size=n_selections)
+
+    labels = _group_identical_rows(errors)
+    representatives, group_of, group_sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    members = np.argsort(group_of, kind="stable")
+    group_starts = np.cumsum(group_sizes) - group_sizes
+
+    # Case-major copy: the errors of all groups on one case are contiguous
+    by_case = np.ascontiguousarray(errors.T)
+    tolerance = _median_absolute_deviation(by_case) if epsilon is None \
+        else np.full(n_total, epsilon, dtype=by_case.dtype)
+    by_group = errors
+    if len(representatives) < len(errors):
+        by_case = by_case[:, representatives]
+        by_group = errors[representatives]
+    passes = by_case <= by_case.min(axis=1, keepdims=True) + tolerance[:, None]
+
+    # First case: rows of the pass/fail matrix, packed into (n_selections, width) candidates
+    first = passes[rng.integers(0, n_total, size=n_selections)]
+    rows, groups = np.nonzero(first)
+    counts = np.bincount(rows, minlength=n_selections)
+    position = np.arange(len(rows)) - (np.cumsum(counts) - counts)[rows]
+    candidates = np.zeros((n_selections, int(counts.max())), dtype=np.intp)
+    candidates[rows, position] = groups
+    valid = np.arange(candidates.shape[1]) < counts[:, None]
+
+    # Padding slots repeat a candidate of their row: the minimum and maximum error of each
+    # case over a row are then those of its set, without masking
+    candidates = np.where(valid, candidates, candidates[:, :1])
+
+    winners = np.empty(n_selections, dtype=np.intp) # Winning group of each selection
+    active = np.arange(n_selections)
+    idle = np.zeros(n_selections, dtype=np.intp) # Cases drawn since the set last shrank
+    stalled = []
+    while True:
+        finished = counts == 1
+        if finished.any():
+            winners[active[finished]] = candidates[finished, 0]
+            active, candidates, valid, counts, idle = (array[~finished]
+                                                       for array in (active, candidates, valid, counts, idle))
+            if len(active) == 0:
+                break
+        if counts.max() <= candidates.shape[1] // 2:
+            candidates, valid = _pack(candidates, valid)
+            candidates = np.where(valid, candidates, candidates[:, :1])
+
+        n_active, width = candidates.shape
+        block = int(min(max_block, max(1, round_budget // (n_active * width))))
+        cases = rng.integers(0, n_total, size=(n_active, block))
+        block_errors = by_case[cases[:, :, None], candidates[:, None, :]]
+        threshold = block_errors.min(axis=2) + tolerance[cases]
+        removes = block_errors.max(axis=2) > threshold
+        # Apply the first case of each block that removes a candidate
+        changed = removes.any(axis=1)
+        rows = np.flatnonzero(changed)
+        first_removing = removes[rows].argmax(axis=1)
+        kept = block_errors[rows, first_removing] <= threshold[rows, first_removing, None]
+        valid[rows] &= kept
+        candidates[rows] = np.where(valid[rows], candidates[rows], candidates[rows, kept.argmax(axis=1), None])
+        counts[rows] = valid[rows].sum(axis=1)
+        idle = np.where(changed, 0, idle + block)
+
+        stuck = idle >= max_block
+        if stuck.any():
+            # max_block cases in a row removed nobody (over one or several rounds, however
+            # small the blocks): finish these selections one by one
+            for row in np.flatnonzero(stuck):
+                stalled.append((active[row], candidates[row, valid[row]]))
+            active, candidates, valid, counts, idle = (array[~stuck]
+                                                       for array in (active, candidates, valid, counts, idle))
+            if len(active) == 0:
+                break
+
+    tied = {} # Sets no case can reduce, by their bytes
+    for selection, group_candidates in stalled:
+        key = group_candidates.tobytes()
+        if key not in tied:
+            remaining = _filter_effective(by_group[group_candidates], tolerance, group_candidates, rng)
+            if len(remaining) == len(group_candidates):
+                tied[key] = remaining
+            group_candidates = remaining
+        else:
+            group_candidates = tied[key]
+        # Ties are broken uniformly over individuals, so each group weighs its size
+        sizes = np.cumsum(group_sizes[group_candidates])
+        winners[selection] = group_candidates[np.searchsorted(sizes, rng.random() * sizes[-1], side="right")]
+
+    # A random member of each winning group
+    return members[group_starts[winners] + (rng.random(n_selections) * group_sizes[winners]).astype(np.intp)]
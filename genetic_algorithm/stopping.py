@@ -0,0 +1,111 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from genetic_algorithm.evolution import EvolutionEngine
+
+
+class StoppingCriterion(ABC):
+    """
+    Base class of EvolutionEngine stopping criteria.
+
+    After every generation (including generation 0, the initial evaluation) the engine
+    asks each criterion whether to stop, passing the state it is about to yield from
+    evolve_steps(). The state dict holds:
+        generation: Generation number
+        best_fitness: Fitness of the best individual so far
+        best_individual: The best individual so far
+        seconds: Wall time of the generation
+        elapsed: Wall time since evolve_steps() started
+        evaluations: Individuals scored since the start of the run (cached ones excluded)
+    """
+
+    # Reported as the engine's stop_reason
+    name = "criterion"
+
+    @abstractmethod
+    def should_stop(self, engine: "EvolutionEngine", state: Dict[str, object]) -> bool:
+        """Whether the run should end after the generation described by state."""
+
+
+class TargetLoss(StoppingCriterion):
+
+    name = "target_loss"
+
+    def __init__(self, target: float):
+        """Stop once the best fitness is at or below target."""
+        self.target = target
+
+    def should_stop(self, engine: "EvolutionEngine", state: Dict[str, object]) -> bool:
+        return state["best_fitness"] <= self.target
+
+
+class NoImprovement(StoppingCriterion):
+
+    name = "no_improvement"
+
+    def __init__(self, patience: int, min_delta: float = 0.0):
+        """
+        Stop when the best fitness has not improved by more than min_delta
+        over the last patience generations.
+
+        Args:
+            patience: Number of bred generations without improvement
+            min_delta: Smallest decrease of the best fitness counted as an improvement
+        """
+        if patience < 1:
+            raise ValueError("patience must be a positive integer")
+        self.patience = patience
+        self.min_delta = min_delta
+
+    def should_stop(self, engine: "EvolutionEngine", state: Dict[str, object]) -> bool:
+        # Read from the engine's history, so the count also survives a checkpoint
+        history = engine.history
+        if len(history) <= self.patience:
+            return False
+        return history[-self.patience - 1] - history[-1] <= self.min_delta
+
+
+class TimeBudget(StoppingCriterion):
+
+    name = "time_budget"
+
+    def __init__(self, seconds: float):
+        """
+        Stop before a generation that would end after the budget. A generation is
+        never interrupted, so its length is estimated from the previous one.
+
+        Args:
+            seconds: Wall-clock budget of the run (setup and initial evaluation included)
+        """
+        if seconds <= 0:
+            raise ValueError("seconds must be positive")
+        self.seconds = seconds
+
+    def should_stop(self, engine: "EvolutionEngine", state: Dict[str, object]) -> bool:
+        return state["elapsed"] + state["seconds"] > self.seconds
+
+
+class EvaluationBudget(StoppingCriterion):
+
+    name = "evaluation_budget"
+
+    def __init__(self, max_evaluations: int):
+        """
+        Stop once max_evaluations individuals have been scored. Checked between
+        generations, so the last generation may run over the budget.
+        """
+        if max_evaluations < 1:
+            raise ValueError("max_evaluations must be a positive integer")
+        self.max_evaluations = max_evaluations
+
+    def should_stop(self, engine: "EvolutionEngine", state: Dict[str, object]) -> bool:
+        return state["evaluations"] >= self.max_evaluations
+
+
+def first_stop(criteria, engine: "EvolutionEngine", state: Dict[str, object]) -> Optional[str]:
+    """Name of the first criterion asking to stop, or None."""
+    for criterion in criteria:
+        if criterion.should_stop(engine, state):
+            return criterion.name
+    return None
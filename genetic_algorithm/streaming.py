@@ -0,0 +1,156 @@
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from utils.loss_function import PartialLoss
+
+Chunk = Tuple[np.ndarray, np.ndarray]
+
+DEFAULT_CHUNK_SIZE = 65536
+# Smaller chunks give racing more chances to stop early, at some per-chunk overhead
+DEFAULT_RACE_CHUNK_SIZE = 8192
+
+
+class ChunkedDataset:
+
+    def __init__(self,
+                 X: Union[np.ndarray, Iterable[Chunk], Callable[[], Iterator[Chunk]]],
+                 y: Optional[np.ndarray] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Dataset that is read in row chunks, so only one chunk is held in memory at a time.
+
+        Args:
+            X: Either an array of shape (n_samples, n_features), typically an np.memmap,
+               together with y; or (with y=None) a source of (X_chunk, y_chunk) pairs: a
+               re-iterable such as a list, or a zero-argument callable returning a fresh
+               iterator. The source is read once per generation, so one-shot iterators
+               are rejected.
+            y: Targets of shape (n_samples,), array or np.memmap (only with an array X)
+            chunk_size: Rows per chunk when slicing an array X
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        if y is not None:
+            if len(X) != len(y):
+                raise ValueError("X and y must have the same number of rows")
+            self._X, self._y, self._source = X, y, None
+        else:
+            if not callable(X) and iter(X) is X:
+                raise ValueError("A one-shot iterator cannot be read once per generation; "
+                                 "pass a list or a callable returning a fresh iterator")
+            self._X, self._y, self._source = None, None, X
+        self._n_features = None
+        self._n_samples = len(X) if y is not None else None
+
+    def __iter__(self) -> Iterator[Chunk]:
+        if self._X is not None:
+            for start in range(0, len(self._X), self.chunk_size):
+                stop = start + self.chunk_size
+                yield (np.asfortranarray(self._X[start:stop], dtype=float),
+                       np.asarray(self._y[start:stop], dtype=float).ravel())
+        else:
+            source = self._source() if callable(self._source) else self._source
+            n_samples = 0
+            for X_chunk, y_chunk in source:
+                n_samples += len(X_chunk)
+                yield np.asfortranarray(X_chunk, dtype=float), np.asarray(y_chunk, dtype=float).ravel()
+            # Known once a full pass has been made
+            self._n_samples = n_samples
+
+    @property
+    def n_samples(self) -> Optional[int]:
+        """Number of rows, or None for a chunk source that has not been read to the end yet."""
+        return self._n_samples
+
+    @property
+    def n_features(self) -> int:
+        """Number of input columns (read from the first chunk of a chunk source)."""
+        if self._n_features is None:
+            if self._X is not None:
+                self._n_features = self._X.shape[1]
+            else:
+                X_chunk, _ = next(iter(self))
+                self._n_features = X_chunk.shape[1]
+        return self._n_features
+
+    def __reduce__(self):
+        # A memmap would be pickled with its full contents; reopen the file instead
+        if isinstance(self._X, np.memmap) and isinstance(self._y, np.memmap) \
+                and self._X.filename and self._y.filename:
+            return (_reopen, (_memmap_spec(self._X), _memmap_spec(self._y), self.chunk_size))
+        return super().__reduce__()
+
+
+def _memmap_spec(array: np.memmap):
+    return array.filename, array.dtype.str, array.offset, array.shape, \
+        "F" if array.flags.f_contiguous and not array.flags.c_contiguous else "C"
+
+
+def _reopen(X_spec, y_spec, chunk_size: int) -> ChunkedDataset:
+    def open_memmap(filename, dtype, offset, shape, order):
+        return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape, order=order)
+    return ChunkedDataset(open_memmap(*X_spec), open_memmap(*y_spec), chunk_size)
+
+
+def evaluate_streaming(predictors: Sequence[Callable[[np.ndarray], np.ndarray]],
+                       dataset: ChunkedDataset,
+                       loss_function: Callable,
+                       threshold: Optional[float] = None) -> Tuple[List[float], List[int]]:
+    """
+    Score several models in a single pass over a chunked dataset.
+
+    Each chunk is read once and every model is evaluated on it, accumulating a
+    PartialLoss per model; peak memory is bounded by the chunk size.
+
+    With a threshold (racing), a model stops being scored as soon as the lower bound
+    of its loss over the whole dataset exceeds the threshold. Its fitness is then that
+    lower bound, which is above the threshold and so ranks it behind every model that
+    finished. Racing needs the row count, so it starts once dataset.n_samples is known.
+
+    Args:
+        predictors: Functions mapping an X chunk to predictions (e.g. GPTree.eval_array)
+        dataset: The ChunkedDataset to score on
+        loss_function: One of the losses supported by PartialLoss
+        threshold: Optional racing threshold on the loss
+
+    Returns:
+        Tuple (fitness per predictor (inf where evaluation failed or the loss is not finite),
+        rows scored per predictor)
+    """
+    n_samples = dataset.n_samples if threshold is not None else None
+    partials = [PartialLoss(loss_function) for _ in predictors]
+    failed = [False] * len(predictors)
+    rejected = [False] * len(predictors)
+    active = list(range(len(predictors)))
+    for X_chunk, y_chunk in dataset:
+        remaining = []
+        for i in active:
+            try:
+                partials[i].update(predictors[i](X_chunk), y_chunk)
+            except Exception:
+                failed[i] = True
+                continue
+            if np.isnan(partials[i].total):
+                # A NaN error sum stays NaN, so the model is scored as failed right away
+                failed[i] = True
+                continue
+            if n_samples is not None and partials[i].lower_bound(n_samples) > threshold:
+                rejected[i] = True
+                continue
+            remaining.append(i)
+        active = remaining
+        if not active and n_samples is not None:
+            break
+
+    fitness = []
+    for fail, reject, partial in zip(failed, rejected, partials):
+        if fail or partial.count == 0:
+            fitness.append(float("inf"))
+        elif reject:
+            fitness.append(partial.lower_bound(n_samples))
+        else:
+            value = partial.value()
+            # Non-finite losses rank last, as in score_tree
+            fitness.append(value if np.isfinite(value) else float("inf"))
+    return fitness, [partial.count for partial in partials]
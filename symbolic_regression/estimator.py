@@ -1,26 +1,39 @@
+import random
 import numpy as np
-from typing import List, Optional, Union, Callable
+from typing import Iterable, List, Optional, Union, Callable
 
 from genetic_algorithm.population import GAPopulation
+from genetic_algorithm.array_population import ArrayPopulation
 from genetic_algorithm.evolution import EvolutionEngine
 from utils.gp_function import GPFunction
+from utils.gp_tree import GPTree
+from utils.subtree_cache import SubtreeCache
+from utils.gp_simplify import register_rule, protected_div_rules, same_subtree
+from genetic_algorithm.fitness_cache import FitnessCache
+from genetic_algorithm.sampling import ProgressiveSampler
+from genetic_algorithm.streaming import ChunkedDataset, DEFAULT_CHUNK_SIZE
+from genetic_algorithm.constant_optimizer import ConstantOptimizer
+from genetic_algorithm.metrics import Callback
+from genetic_algorithm.stopping import TargetLoss, NoImprovement, TimeBudget, EvaluationBudget
+from symbolic_regression.serving import Predictor, DEFAULT_PREDICT_CHUNK_SIZE
 from utils import loss_function, constant
 
 # Default Functions
-def _add(x, y): return x + y
-def _sub(x, y): return x - y
-def _mul(x, y): return x * y
+# Plain numpy ufuncs are used where possible so compiled programs can write
+# their results straight into preallocated buffers.
 def _div(x, y): return np.divide(x, y, out=np.zeros_like(x, dtype=float), where=y!=0)
-def _sin(x): return np.sin(x)
-def _cos(x): return np.cos(x)
+# Partial derivatives of the protected division (0 where it is protected)
+def _div_dx(x, y): return _div(np.ones_like(x, dtype=float), y)
+def _div_dy(x, y): return -_div(x, y * y)
+register_rule(_div, protected_div_rules)
 
 DEFAULT_FUNC_SET = [
-    GPFunction("add", _add, 2),
-    GPFunction("sub", _sub, 2),
-    GPFunction("mul", _mul, 2),
-    GPFunction("div", _div, 2),
-    GPFunction("sin", _sin, 1),
-    GPFunction("cos", _cos, 1),
+    GPFunction("add", np.add, 2),
+    GPFunction("sub", np.subtract, 2),
+    GPFunction("mul", np.multiply, 2),
+    GPFunction("div", _div, 2, derivatives=(_div_dx, _div_dy)),
+    GPFunction("sin", np.sin, 1),
+    GPFunction("cos", np.cos, 1),
 ]
 
 class SymbolicRegressor:
@@ -37,6 +50,44 @@ class SymbolicRegressor:
                  erc_range: tuple = (-10.0, 10.0),
                  func_set: Optional[List[GPFunction]] = None,
                  loss_metric: str = constant.MSE,
+                 subtree_cache_bytes: Optional[int] = None,
+                 fitness_cache: bool = True,
+                 n_jobs: Optional[int] = 1,
+                 random_state: Optional[int] = None,
+                 n_islands: int = 1,
+                 migration_interval: int = 5,
+                 migration_size: int = 2,
+                 migration_topology: str = constant.RING,
+                 backend: str = constant.TREE_BACKEND,
+                 sample_size: Optional[Union[int, float]] = None,
+                 sample_growth: float = 1.5,
+                 sample_seed: Optional[int] = None,
+                 chunk_size: Optional[int] = None,
+                 racing: Optional[Union[str, float]] = None,
+                 optimize_constants: bool = False,
+                 optimize_top_k: int = 5,
+                 optimize_time_budget: float = 1.0,
+                 simplify: bool = False,
+                 max_tree_depth: Optional[int] = None,
+                 max_tree_size: Optional[int] = None,
+                 parsimony_coefficient: float = 0.0,
+                 size_pressure: Optional[float] = None,
+                 tarpeian_rate: float = 0.0,
+                 selection: str = constant.TOURNAMENT,
+                 lexicase_epsilon: Optional[float] = None,
+                 lexicase_cases: Optional[Union[int, float]] = None,
+                 callbacks: Optional[List[Callback]] = None,
+                 checkpoint_path: Optional[str] = None,
+                 checkpoint_interval: int = 10,
+                 target_loss: Optional[float] = None,
+                 patience: Optional[int] = None,
+                 time_budget: Optional[float] = None,
+                 max_evaluations: Optional[int] = None,
+                 warm_start: bool = False,
+                 partial_fit_generations: int = 5,
+                 multi_target: str = constant.PER_TARGET,
+                 predict_chunk_size: int = DEFAULT_PREDICT_CHUNK_SIZE,
+                 predict_n_jobs: Optional[int] = 1,
                  verbose: bool = True):
         """
         Symbolic Regressor using Genetic Programming.
@@ -54,6 +105,82 @@ class SymbolicRegressor:
             erc_range: Range for ERCs.
             func_set: List of GPFunction objects to use. Defaults to basic arithmetic.
             loss_metric: 'mse', 'mae', 'rmse', or 'log_cosh'.
+            subtree_cache_bytes: Memory budget for caching evaluated subtree outputs
+                                 across the population. None disables the cache.
+            fitness_cache: Whether to cache fitness values by tree structure, so elites
+                           and clones are not re-evaluated.
+            n_jobs: Number of worker processes for fitness evaluation (-1 uses every core).
+                    Results are identical to serial mode for a given random_state.
+            random_state: Seed for the random number generators, for reproducible runs.
+            n_islands: Number of island sub-populations, each evolved in its own process.
+                       1 runs a single population.
+            migration_interval: Generations between migrations (island mode).
+            migration_size: Individuals sent by each island per migration (island mode).
+            migration_topology: 'ring' or 'full' (island mode).
+            backend: 'tree' for GPNode graphs, or 'array' for the struct-of-arrays
+                     population where variation is array slicing (lower memory at large sizes).
+            sample_size: Score each generation on a random mini-batch of this many rows
+                         (int) or this fraction of the data (float). The batch grows by
+                         sample_growth per generation until it covers the full data.
+                         The best individuals are always re-scored on the full data.
+                         None scores every generation on the full data.
+            sample_growth: Growth factor of the mini-batch per generation.
+            sample_seed: Seed for drawing the mini-batches. Defaults to random_state.
+            chunk_size: Stream the training data through fitness evaluation in chunks of
+                        this many rows instead of loading it into memory. np.memmap inputs
+                        are always streamed (with a default chunk size).
+            racing: Stop scoring offspring whose partial loss provably exceeds a threshold:
+                    'elite' (worst elite fitness) or a quantile q of the previous generation.
+                    Rejected trees get their loss lower bound as fitness. None disables racing.
+                    Cannot be combined with sample_size.
+            optimize_constants: Tune the ERCs of the best trees every generation with
+                                gradient-based L-BFGS (in-memory data only).
+            optimize_top_k: Number of best trees whose constants are tuned per generation.
+            optimize_time_budget: Seconds of constant tuning allowed per generation.
+            simplify: Fold constants and apply algebraic identities (x + 0, x * 1, x - x, ...)
+                      to every tree before it is scored (tree backend), and to best_estimator_
+                      after fitting (both backends) for a cheaper predict.
+            max_tree_depth: Depth limit enforced by crossover and subtree mutation during
+                            evolution (max_depth only bounds initialization). Offspring over
+                            the limit are redrawn, then fall back to the parent. None: no limit.
+            max_tree_size: Node count limit, enforced like max_tree_depth. None: no limit.
+            parsimony_coefficient: Tournaments rank trees by fitness + coefficient * size.
+            size_pressure: Double tournament: the smaller of two tournament winners is
+                           picked with probability size_pressure / 2 (in [1, 2]). None disables it.
+            tarpeian_rate: Probability that a tree larger than the average is excluded from
+                           selection each generation (Tarpeian method).
+            selection: 'tournament', or 'lexicase' for epsilon-lexicase selection on the
+                       per-sample errors (tree backend, in-memory data, no racing).
+            lexicase_epsilon: Tolerance of lexicase selection. None: each sample's median
+                              absolute deviation over the population; 0: plain lexicase.
+            lexicase_cases: Samples used by each generation's lexicase selections, as a
+                            count (int) or a fraction (float). None: all of them.
+            callbacks: EvolutionEngine callbacks receiving per-generation metrics, e.g.
+                       MetricsRecorder, JSONLinesLogger or CProfileCallback
+                       (genetic_algorithm/metrics.py). Not run in island mode.
+            checkpoint_path: Save the run to this .npz file every checkpoint_interval
+                             generations and at the end, so fit(..., resume_from=path) can
+                             continue it after a crash. Not supported in island mode.
+            checkpoint_interval: Generations between checkpoints.
+            target_loss: Stop as soon as the best training loss is at or below this value.
+            patience: Stop when the best loss has not improved for this many generations.
+            time_budget: Wall-clock budget of the evolution in seconds; a generation that
+                         would end past it (judging by the previous one) is not started.
+            max_evaluations: Stop once this many individuals have been scored (fitness
+                             cache hits excluded).
+                             The stopping criteria are not supported in island mode; generations
+                             stays the upper bound, and engine_.stop_reason tells which fired.
+            warm_start: Continue from the population of the previous fit instead of
+                        initializing a new one (same backend and number of features).
+                        The population keeps its size and is re-scored on the new data.
+            partial_fit_generations: Generations run by each partial_fit() call.
+            multi_target: How fit() handles y of shape (n_samples, n_targets): 'per_target'
+                          evolves one population per target, 'shared' one population scored
+                          against every target. Either way X is converted once and tree
+                          outputs are shared across targets (see README).
+            predict_chunk_size: Rows per chunk when predicting (see symbolic_regression/serving.py).
+            predict_n_jobs: Threads for predict() on inputs of more than one chunk
+                            (-1 for all cores).
             verbose: Whether to print progress.
         """
         self.population_size = population_size
@@ -68,96 +195,452 @@ class SymbolicRegressor:
         self.erc_range = erc_range
         self.func_set = func_set if func_set is not None else DEFAULT_FUNC_SET
         self.loss_metric = loss_metric
+        self.subtree_cache_bytes = subtree_cache_bytes
+        self.fitness_cache = fitness_cache
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.n_islands = n_islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.migration_topology = migration_topology
+        self.backend = backend
+        self.sample_size = sample_size
+        self.sample_growth = sample_growth
+        self.sample_seed = sample_seed
+        self.chunk_size = chunk_size
+        self.racing = racing
+        self.optimize_constants = optimize_constants
+        self.optimize_top_k = optimize_top_k
+        self.optimize_time_budget = optimize_time_budget
+        self.simplify = simplify
+        self.max_tree_depth = max_tree_depth
+        self.max_tree_size = max_tree_size
+        self.parsimony_coefficient = parsimony_coefficient
+        self.size_pressure = size_pressure
+        self.tarpeian_rate = tarpeian_rate
+        self.selection = selection
+        self.lexicase_epsilon = lexicase_epsilon
+        self.lexicase_cases = lexicase_cases
+        self.callbacks = callbacks
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.target_loss = target_loss
+        self.patience = patience
+        self.time_budget = time_budget
+        self.max_evaluations = max_evaluations
+        self.warm_start = warm_start
+        self.partial_fit_generations = partial_fit_generations
+        self.multi_target = multi_target
+        self.predict_chunk_size = predict_chunk_size
+        self.predict_n_jobs = predict_n_jobs
         self.verbose = verbose
         
         self.population: Optional[GAPopulation] = None
         self.best_estimator_ = None
+        self.engine_ = None
+        self.predictor_: Optional[Predictor] = None
         self.variable_names_ = None
+        # Multi-target fits: one best tree and one predictor per target
+        self.best_estimators_: Optional[List[GPTree]] = None
+        self.engines_: Optional[List[EvolutionEngine]] = None
+        self.predictors_: Optional[List[Predictor]] = None
 
-    def fit(self, X: Union[np.ndarray, List[List[float]]], y: Union[np.ndarray, List[float]]):
+    def fit(self, X: Union[np.ndarray, List[List[float]], Iterable], y: Optional[Union[np.ndarray, List[float]]] = None,
+            resume_from: Optional[str] = None):
         """
         Fit the symbolic regressor to the data.
         
         Args:
-            X: Input features. Shape (n_samples, n_features).
-            y: Target values. Shape (n_samples,).
+            X: Input features. Shape (n_samples, n_features). An np.memmap is streamed
+               in chunks rather than loaded. With y=None, X is a source of (X_chunk, y_chunk)
+               pairs: a list or a zero-argument callable returning a fresh iterator.
+            y: Target values. Shape (n_samples,), or (n_samples, n_targets) to fit every
+               target at once (see multi_target); best_estimators_ then holds one tree per
+               target and predict() returns (n_samples, n_targets).
+            resume_from: Optional checkpoint written by a previous fit with the same
+                         parameters and data (see checkpoint_path). The run continues
+                         from the saved generation up to generations.
         """
-        X = np.array(X)
-        y = np.array(y)
-        
-        # Determine variable names
-        n_features = X.shape[1]
-        self.variable_names_ = [f'x{i}' for i in range(n_features)]
+        if y is not None and np.ndim(y) == 2:
+            return self._fit_multi_target(X, y, resume_from)
+        return self._fit(X, y, self.generations, resume_from, warm=self.warm_start)
+
+    def partial_fit(self, X: Union[np.ndarray, List[List[float]], Iterable],
+                    y: Optional[Union[np.ndarray, List[float]]] = None,
+                    generations: Optional[int] = None):
+        """
+        Evolve the current population for a few generations on a new batch of data.
+
+        The first call initializes the population; later calls continue from it (as with
+        warm_start=True), re-scoring every individual on the new batch since fitness
+        values and caches measured on earlier batches no longer apply.
+
+        Args:
+            X: Input features of the batch, as in fit()
+            y: Target values of the batch, as in fit()
+            generations: Generations to run on this batch. Defaults to partial_fit_generations.
+        """
+        if generations is None:
+            generations = self.partial_fit_generations
+        return self._fit(X, y, generations, None, warm=True)
+
+    def _fit(self, X, y, generations: int, resume_from: Optional[str], warm: bool):
+        if y is not None and np.ndim(y) == 2:
+            raise ValueError("Multiple targets are only supported by fit()")
+        warm = warm and self.population is not None
+        if warm and resume_from is not None:
+            raise ValueError("resume_from cannot be combined with a warm start")
+        if self.n_islands > 1 and (resume_from is not None or self.checkpoint_path is not None):
+            raise ValueError("Checkpoints are not supported in island mode")
+        if self.n_islands > 1 and self._stopping_criteria():
+            raise ValueError("target_loss, patience, time_budget and max_evaluations are not "
+                             "supported in island mode")
+        streaming = y is None or isinstance(X, np.memmap) or self.chunk_size is not None
+        if streaming:
+            if self.sample_size is not None:
+                raise ValueError("sample_size cannot be combined with streamed data")
+            # Out-of-core: only one chunk of rows is in memory at a time
+            data = ChunkedDataset(X, y, chunk_size=self.chunk_size or DEFAULT_CHUNK_SIZE)
+            targets = None
+            n_features = data.n_features
+        else:
+            # Column-major layout keeps each feature column contiguous for eval_array
+            X = np.asfortranarray(X, dtype=float)
+            y = np.array(y)
+            data, targets = X, y
+            n_features = X.shape[1]
         
-        # Convert X to list of dicts for current GPTree evaluation
-        # Optimization: Ideally GPTree should handle numpy arrays directly, 
-        # but for now we adapt to the existing interface.
-        data_dicts = [
-            {name: val for name, val in zip(self.variable_names_, row)}
-            for row in X
-        ]
+        self._check_depth_limit()
         
-        # Select loss function
-        if self.loss_metric == constant.MSE:
-            loss_f = loss_function.mse
-        elif self.loss_metric == constant.MAE:
-            loss_f = loss_function.mae
-        elif self.loss_metric == constant.RMSE:
-            loss_f = loss_function.rmse
-        elif self.loss_metric == constant.LOG_COSH:
-            loss_f = loss_function.log_cosh
+        if warm:
+            # The population's trees index their variables by column
+            if n_features != len(self.variable_names_):
+                raise ValueError(f"X has {n_features} features, but the population was "
+                                 f"fitted with {len(self.variable_names_)}")
         else:
-            raise ValueError(f"Unknown loss metric: {self.loss_metric}")
+            # A warm start continues the random streams of the previous fit instead
+            self._start(n_features)
+        
+        loss_f = self._loss_function()
             
         # Initialize Population
-        self.population = GAPopulation(self.population_size)
-        self.population.initialize(
-            func_set=self.func_set,
-            variables=self.variable_names_,
-            use_erc=self.use_erc,
-            erc_range=self.erc_range,
-            min_depth=self.min_depth,
-            max_depth=self.max_depth
-        )
+        if warm:
+            if isinstance(self.population, ArrayPopulation) != (self.backend == constant.ARRAY_BACKEND):
+                raise ValueError("backend cannot be changed between warm-started fits")
+            # Fitness was measured on the previous data
+            self.population.reset_fitness()
+        elif self.backend == constant.ARRAY_BACKEND:
+            self.population = ArrayPopulation(
+                func_set=self.func_set,
+                variables=self.variable_names_,
+                use_erc=self.use_erc,
+                erc_range=self.erc_range,
+                n_jobs=self.n_jobs
+            )
+            self.population.initialize(self.population_size, self.min_depth, self.max_depth)
+        elif self.backend == constant.TREE_BACKEND:
+            subtree_cache = None
+            if self.subtree_cache_bytes is not None:
+                subtree_cache = SubtreeCache(max_bytes=self.subtree_cache_bytes)
+            self.population = self._tree_population(subtree_cache, self.n_jobs)
+        else:
+            raise ValueError(f"backend must be either '{constant.TREE_BACKEND}' or '{constant.ARRAY_BACKEND}'")
+        
+        sampler = None
+        if self.sample_size is not None:
+            sampler = ProgressiveSampler(
+                self.sample_size,
+                growth=self.sample_growth,
+                seed=self.sample_seed if self.sample_seed is not None else self.random_state
+            )
         
         # Initialize Engine
-        engine = EvolutionEngine(
-            population=self.population,
-            crossover_rate=self.crossover_rate,
-            mutation_rate=self.mutation_rate,
-            tournament_size=self.tournament_size,
-            elitism_size=self.elitism_size
-        )
+        engine = self._engine(self.population, sampler, self.callbacks)
+        
+        self.engine_ = engine
+        self.engines_ = None
         
         # Run Evolution
-        self.best_estimator_ = engine.evolve(
-            data=data_dicts,
-            target_values=y,
-            loss_function=loss_f,
-            generations=self.generations,
-            verbose=self.verbose
-        )
+        try:
+            if self.n_islands > 1:
+                self.best_estimator_ = engine.evolve_islands(
+                    data=data,
+                    target_values=targets,
+                    loss_function=loss_f,
+                    generations=generations,
+                    n_islands=self.n_islands,
+                    migration_interval=self.migration_interval,
+                    migration_size=self.migration_size,
+                    topology=self.migration_topology,
+                    verbose=self.verbose
+                )
+            else:
+                self.best_estimator_ = engine.evolve(
+                    data=data,
+                    target_values=targets,
+                    loss_function=loss_f,
+                    generations=generations,
+                    verbose=self.verbose,
+                    resume_from=resume_from
+                )
+        finally:
+            # Release worker processes and shared memory, if any
+            self.population.close()
+        
+        if self.simplify:
+            self.best_estimator_.simplify()
+        # Serve predictions through the fused numpy expression, in chunks
+        self._close_predictors()
+        self.predictor_ = Predictor(self.best_estimator_, self.predict_chunk_size, self.predict_n_jobs)
+        self.best_estimators_ = None
+        self.predictors_ = None
         
         return self
 
-    def predict(self, X: Union[np.ndarray, List[List[float]]]) -> np.ndarray:
+    def _fit_multi_target(self, X, y, resume_from: Optional[str]):
+        if self.multi_target not in (constant.PER_TARGET, constant.SHARED_POPULATION):
+            raise ValueError(f"multi_target must be either '{constant.PER_TARGET}' or "
+                             f"'{constant.SHARED_POPULATION}'")
+        if resume_from is not None or self.checkpoint_path is not None or self.warm_start:
+            raise ValueError("Checkpoints and warm starts are not supported with multiple targets")
+        if self.backend != constant.TREE_BACKEND or self.n_islands > 1:
+            raise ValueError("Multiple targets require the tree backend, without islands")
+        if isinstance(X, np.memmap) or self.chunk_size is not None or self.sample_size is not None \
+                or self.racing is not None or self.optimize_constants:
+            raise ValueError("Multiple targets require in-memory data, without sampling, racing "
+                             "or constant optimization")
+        self._check_depth_limit()
+
+        # One buffer each for all targets, column-major so every feature and target is contiguous
+        X = np.asfortranarray(X, dtype=float)
+        Y = np.asfortranarray(y, dtype=float)
+        if X.ndim != 2 or Y.shape[0] != X.shape[0]:
+            raise ValueError("X must be (n_samples, n_features) and y (n_samples, n_targets)")
+        self._start(X.shape[1])
+        loss_f = self._loss_function()
+
+        if self.multi_target == constant.SHARED_POPULATION:
+            best = self._evolve_shared(X, Y, loss_f)
+        else:
+            best = self._evolve_per_target(X, Y, loss_f)
+
+        if self.simplify:
+            for tree in best:
+                tree.simplify()
+        self._close_predictors()
+        self.best_estimators_ = best
+        self.predictors_ = [Predictor(tree, self.predict_chunk_size, self.predict_n_jobs) for tree in best]
+        # Nothing to warm-start from: the next single-target fit starts afresh
+        self.population = None
+        self.best_estimator_ = None
+        self.predictor_ = None
+        self.engine_ = None
+        return self
+
+    def _evolve_shared(self, X: np.ndarray, Y: np.ndarray, loss_f: Callable) -> List[GPTree]:
+        """
+        Evolve one population whose trees are evaluated once and scored against every
+        target (fitness: mean loss over the targets). The best tree of each target is
+        tracked from the population's (n_individuals, n_targets) loss matrix.
+        """
+        subtree_cache = None
+        if self.subtree_cache_bytes is not None:
+            subtree_cache = SubtreeCache(max_bytes=self.subtree_cache_bytes)
+        population = self._tree_population(subtree_cache)
+        engine = self._engine(population, None, self.callbacks)
+        self.engines_ = [engine]
+
+        n_targets = Y.shape[1]
+        best: List[Optional[GPTree]] = [None] * n_targets
+        best_losses = np.full(n_targets, np.inf)
+        try:
+            for _ in engine.evolve_steps(X, Y, loss_f, self.generations, self.verbose):
+                losses = population.case_errors
+                rows = losses.argmin(axis=0)
+                row_losses = losses[rows, np.arange(n_targets)]
+                # Targets no tree has a finite loss on yet also take the current best
+                for target in np.flatnonzero((row_losses < best_losses) | np.isinf(best_losses)):
+                    tree = population.population[rows[target]].copy()
+                    tree.fitness = float(row_losses[target])
+                    best[target] = tree
+                    best_losses[target] = row_losses[target]
+        finally:
+            population.close()
+        return best
+
+    def _evolve_per_target(self, X: np.ndarray, Y: np.ndarray, loss_f: Callable) -> List[GPTree]:
+        """
+        Evolve one population per target, in lockstep, sharing the work of evaluating trees:
+        - every population starts from the same initial trees, evaluated once against all
+          targets (one loss matrix), and seeded with their fitness on its target;
+        - the populations share one SubtreeCache bound to X, so subtrees (whole trees
+          included) that appear in several populations are evaluated once per generation.
+        """
+        subtree_cache = SubtreeCache(max_bytes=self.subtree_cache_bytes) \
+            if self.subtree_cache_bytes is not None else SubtreeCache()
+        initial = self._tree_population(subtree_cache)
+        initial.evaluate(X, Y, loss_f)
+
+        # The same column objects are passed at every evaluation, so the caches recognise them
+        columns = [Y[:, target] for target in range(Y.shape[1])]
+        populations = []
+        for target, column in enumerate(columns):
+            population = self._tree_population(subtree_cache, initialize=False)
+            population.population = [tree.copy() for tree in initial.population]
+            for tree, loss in zip(population.population, initial.case_errors[:, target].tolist()):
+                tree.fitness = loss
+            if population.fitness_cache is not None:
+                # Served as cache hits by the engine's initial evaluation
+                population.fitness_cache.bind(X, column, loss_f)
+                for tree in population.population:
+                    population.fitness_cache.put(tree, tree.fitness)
+            populations.append(population)
+        # Callbacks receive the events of a single engine, so they are not run here
+        engines = [self._engine(population, None, None) for population in populations]
+        self.engines_ = engines
+
+        runs = [engine.evolve_steps(X, column, loss_f, self.generations, verbose=False)
+                for engine, column in zip(engines, columns)]
+        try:
+            generation = 0
+            while runs:
+                # One generation of every population before the next, while the cache holds its subtrees
+                runs = [run for run in runs if next(run, None) is not None]
+                if self.verbose and runs:
+                    mean_best = np.mean([engine.best_individual.fitness for engine in engines])
+                    print(f"Gen {generation}: Mean Best Fitness = {mean_best:.5f} ({len(runs)} targets running)")
+                generation += 1
+        finally:
+            for run in runs:
+                run.close()
+        return [engine.best_individual for engine in engines]
+
+    def _check_depth_limit(self):
+        if self.max_tree_depth is not None and self.max_tree_depth < self.max_depth:
+            raise ValueError("max_tree_depth must be at least max_depth")
+
+    def _start(self, n_features: int):
+        """Seed the random generators and name the variables of a new fit."""
+        if self.random_state is not None:
+            random.seed(self.random_state)
+            np.random.seed(self.random_state)
+        self.variable_names_ = [f'x{i}' for i in range(n_features)]
+
+    def _loss_function(self) -> Callable:
+        if self.loss_metric == constant.MSE:
+            return loss_function.mse
+        if self.loss_metric == constant.MAE:
+            return loss_function.mae
+        if self.loss_metric == constant.RMSE:
+            return loss_function.rmse
+        if self.loss_metric == constant.LOG_COSH:
+            return loss_function.log_cosh
+        raise ValueError(f"Unknown loss metric: {self.loss_metric}")
+
+    def _tree_population(self, subtree_cache: Optional[SubtreeCache], n_jobs: Optional[int] = 1,
+                         initialize: bool = True) -> GAPopulation:
+        population = GAPopulation(
+            self.population_size,
+            subtree_cache=subtree_cache,
+            fitness_cache=FitnessCache() if self.fitness_cache else None,
+            n_jobs=n_jobs,
+            simplify=self.simplify
+        )
+        if initialize:
+            population.initialize(
+                func_set=self.func_set,
+                variables=self.variable_names_,
+                use_erc=self.use_erc,
+                erc_range=self.erc_range,
+                min_depth=self.min_depth,
+                max_depth=self.max_depth
+            )
+        return population
+
+    def _engine(self, population, sampler: Optional[ProgressiveSampler],
+                callbacks: Optional[List[Callback]]) -> EvolutionEngine:
+        return EvolutionEngine(
+            population=population,
+            crossover_rate=self.crossover_rate,
+            mutation_rate=self.mutation_rate,
+            tournament_size=self.tournament_size,
+            elitism_size=self.elitism_size,
+            sampler=sampler,
+            racing=self.racing,
+            constant_optimizer=ConstantOptimizer(self.optimize_top_k, self.optimize_time_budget)
+                               if self.optimize_constants else None,
+            max_tree_depth=self.max_tree_depth,
+            max_tree_size=self.max_tree_size,
+            parsimony_coefficient=self.parsimony_coefficient,
+            size_pressure=self.size_pressure,
+            tarpeian_rate=self.tarpeian_rate,
+            selection=self.selection,
+            lexicase_epsilon=self.lexicase_epsilon,
+            lexicase_cases=self.lexicase_cases,
+            callbacks=callbacks,
+            checkpoint_path=self.checkpoint_path,
+            checkpoint_interval=self.checkpoint_interval,
+            stopping_criteria=self._stopping_criteria()
+        )
+
+    def _close_predictors(self):
+        for predictor in [self.predictor_] + (self.predictors_ or []):
+            if predictor is not None:
+                predictor.close()
+
+    def _stopping_criteria(self) -> List:
+        criteria = []
+        if self.target_loss is not None:
+            criteria.append(TargetLoss(self.target_loss))
+        if self.patience is not None:
+            criteria.append(NoImprovement(self.patience))
+        if self.time_budget is not None:
+            criteria.append(TimeBudget(self.time_budget))
+        if self.max_evaluations is not None:
+            criteria.append(EvaluationBudget(self.max_evaluations))
+        return criteria
+
+    def predict(self, X: Union[np.ndarray, List[List[float]]], out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Predict targets for X.
+
+        Args:
+            X: Input of shape (n_samples, n_features)
+            out: Optional float array of shape (n_samples,) to write the predictions to,
+                 or (n_samples, n_targets) after a multi-target fit
         """
-        if self.best_estimator_ is None:
+        if self.predictors_ is not None:
+            return self._predict_targets(X, out)
+        if self.predictor_ is None:
             raise ValueError("Model is not fitted yet.")
-            
-        X = np.array(X)
-        
-        # Adapt data
-        data_dicts = [
-            {name: val for name, val in zip(self.variable_names_, row)}
-            for row in X
-        ]
-        
-        # Vectorized evaluation if possible, else loop
-        # The population.evaluate loop did something similar.
-        # We can implement a helper or just loop here.
-        predictions = np.array([self.best_estimator_.eval_tree(**d) for d in data_dicts])
-        
-        return predictions
+        return self.predictor_.predict(X, out)
+
+    def _predict_targets(self, X, out: Optional[np.ndarray]) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        shape = (X.shape[0], len(self.predictors_))
+        if out is None:
+            # Column-major, so each target's predictions are written to contiguous memory
+            out = np.empty(shape, order="F")
+        elif out.shape != shape or out.dtype != np.float64:
+            raise ValueError("out must be a float64 array of shape (n_samples, n_targets)")
+        # Targets with the same best tree (equal digests, confirmed node by node) share its predictions
+        first = {}
+        for target, (tree, predictor) in enumerate(zip(self.best_estimators_, self.predictors_)):
+            source = first.setdefault(tree.structural_hash(), target)
+            if source != target and same_subtree(self.best_estimators_[source].root, tree.root):
+                out[:, target] = out[:, source]
+            else:
+                predictor.predict(X, out[:, target])
+        return out
+
+    def predict_one(self, x: Union[np.ndarray, List[float]]) -> float:
+        """
+        Predict the target of a single sample (a sequence of n_features values)
+        without building any array, for low-latency serving. After a multi-target fit,
+        returns an array of n_targets predictions instead.
+        """
+        if self.predictors_ is not None:
+            return np.array([predictor.predict_one(x) for predictor in self.predictors_])
+        if self.predictor_ is None:
+            raise ValueError("Model is not fitted yet.")
+        return self.predictor_.predict_one(x)
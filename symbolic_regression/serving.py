@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+from utils.gp_tree import GPTree
+from utils import gp_codegen
+from genetic_algorithm.parallel import resolve_n_jobs
+
+# Rows per chunk: large enough to amortize the per-chunk overhead on small trees,
+# small enough to spread large requests over the threads
+DEFAULT_PREDICT_CHUNK_SIZE = 65536
+
+
+class Predictor:
+
+    def __init__(self,
+                 tree: GPTree,
+                 chunk_size: int = DEFAULT_PREDICT_CHUNK_SIZE,
+                 n_jobs: Optional[int] = 1):
+        """
+        Low-latency evaluation of a fitted tree, for serving predictions.
+
+        Batches are evaluated in chunks of contiguous rows by the tree's fused numpy
+        function (GPTree.to_function), or by its GPProgram if the tree is too deep to be
+        compiled, and each chunk is written into one preallocated output array. Requests
+        of more than one chunk are spread over a thread pool; the numpy ufuncs doing the
+        per-row work release the GIL, so the threads run in parallel. Single rows go
+        through a compiled scalar expression instead (see predict_one).
+
+        Columns of X follow tree.variables. The tree must not be modified afterwards.
+
+        Args:
+            tree: The tree to serve
+            chunk_size: Rows per chunk
+            n_jobs: Threads for large requests (None or 1 for none, -1 for all cores)
+        """
+        if tree.root is None:
+            raise ValueError("Cannot serve an empty tree")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer")
+        self.tree = tree
+        self.chunk_size = chunk_size
+        self.n_jobs = resolve_n_jobs(n_jobs)
+        self.n_features = len(tree.variables)
+        self._program = tree.compile()
+        self._function = tree.to_function()
+        self._row_function = gp_codegen.compile_row_function(tree)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def predict(self, X: Union[np.ndarray, List[List[float]]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Predict targets for a batch of samples.
+
+        Args:
+            X: Input of shape (n_samples, n_features)
+            out: Optional float array of shape (n_samples,) to write the predictions to,
+                 e.g. a buffer reused across requests
+
+        Returns:
+            Array of shape (n_samples,) (out, if given)
+        """
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] < self.n_features:
+            raise ValueError(f"X must be a 2D array with at least {self.n_features} columns")
+        n_samples = X.shape[0]
+        if out is None:
+            if n_samples <= self.chunk_size:
+                # One chunk: hand out the evaluation's own (fresh) array rather than a copy
+                return self._function(X) if self._function is not None else self._program.execute(X)
+            out = np.empty(n_samples, dtype=float)
+        elif out.shape != (n_samples,) or out.dtype != np.float64:
+            raise ValueError("out must be a float64 array of shape (n_samples,)")
+
+        starts = range(0, n_samples, self.chunk_size)
+        if self.n_jobs > 1 and len(starts) > 1:
+            # Results land in disjoint slices of out; list() waits and re-raises errors
+            list(self._executor().map(lambda start: self._predict_chunk(X, out, start), starts))
+        else:
+            for start in starts:
+                self._predict_chunk(X, out, start)
+        return out
+
+    def _predict_chunk(self, X: np.ndarray, out: np.ndarray, start: int):
+        end = min(start + self.chunk_size, X.shape[0])
+        chunk = X[start:end]
+        if self._function is not None:
+            out[start:end] = self._function(chunk)
+        else:
+            # The interpreter writes the result straight into out
+            self._program.execute(chunk, out=out[start:end])
+
+    def predict_one(self, x: Sequence[float]) -> float:
+        """
+        Predict the target for a single sample, without building any array.
+
+        numpy's scalar and vectorized kernels of transcendental functions (sin, cos, ...)
+        can differ in the last ulp, so the result may differ from predict by a few ulps
+        (the tests allow a relative difference of 1e-12).
+
+        Args:
+            x: Feature values (list, tuple or 1D array), indexed like the columns of X
+
+        Returns:
+            The prediction as a float
+        """
+        if self._row_function is not None:
+            return self._row_function(x)
+        # Too deep to compile: fall back to a one-row batch
+        return float(self._program.execute(np.asarray(x, dtype=float).reshape(1, -1))[0])
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.n_jobs, thread_name_prefix="gp-predict")
+        return self._pool
+
+    def close(self):
+        """Shut down the thread pool, if any. Later calls start a new one."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "Predictor":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        # Thread pools and compiled functions cannot be pickled; they are rebuilt on load
+        return {"tree": self.tree, "chunk_size": self.chunk_size, "n_jobs": self.n_jobs}
+
+    def __setstate__(self, state):
+        self.__init__(state["tree"], state["chunk_size"], state["n_jobs"])
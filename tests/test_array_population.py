@@ -0,0 +1,101 @@
+import random
+
+import numpy as np
+
+from utils import constant, loss_function
+from utils.gp_node import GPNode
+from utils.gp_program import subtree_sizes
+from utils.gp_tree import GPTree
+from genetic_algorithm.array_population import ArrayPopulation, node_depths, splice
+from genetic_algorithm.selection import elite_indices
+from symbolic_regression.estimator import DEFAULT_FUNC_SET
+
+VARIABLES = ["x0", "x1"]
+MAX_DEPTH, MAX_SIZE = 6, 40
+
+
+def _population(size: int = 30) -> ArrayPopulation:
+    population = ArrayPopulation(DEFAULT_FUNC_SET, VARIABLES, use_erc=True)
+    population.initialize(size, max_depth=4)
+    return population
+
+
+def _depths(node, depth=0, out=None):
+    # Reference: prefix-order depths from a recursive walk
+    out = [] if out is None else out
+    out.append(depth)
+    for child in node.next:
+        _depths(child, depth + 1, out)
+    return out
+
+
+def _check_valid(population: ArrayPopulation, individual, max_depth=None, max_size=None):
+    codes, operands, constants, sizes = individual
+    np.testing.assert_array_equal(sizes, subtree_sizes(codes, population.arities))
+    population._store([individual], np.array([np.nan]))
+    root = population.program(0).to_node(VARIABLES)
+    assert root.size == len(codes)
+    np.testing.assert_array_equal(node_depths(sizes), _depths(root))
+    if max_depth is not None:
+        assert root.height <= max_depth
+    if max_size is not None:
+        assert root.size <= max_size
+
+
+def test_splice_decodes_to_valid_trees():
+    random.seed(0)
+    population = _population()
+    individuals = [population.individual(i) for i in range(population.population_size)]
+    for _ in range(200):
+        target, donor = random.choice(individuals), random.choice(individuals)
+        position, start = random.randrange(len(target[0])), random.randrange(len(donor[0]))
+        child = splice(target, position, donor, start)
+        assert len(child[0]) == len(target[0]) - target[3][position] + donor[3][start]
+        _check_valid(population, child)
+
+
+def test_variation_respects_limits():
+    random.seed(1)
+    population = _population()
+    individuals = [population.individual(i) for i in range(population.population_size)]
+    for _ in range(200):
+        parent1, parent2 = random.choice(individuals), random.choice(individuals)
+        _check_valid(population, population.crossover(parent1, parent2, MAX_DEPTH, MAX_SIZE), MAX_DEPTH, MAX_SIZE)
+        for mut_type in (constant.POINT, constant.SUBTREE, constant.HOIST):
+            _check_valid(population, population.mutate(parent1, mut_type, MAX_DEPTH, MAX_SIZE), MAX_DEPTH, MAX_SIZE)
+
+
+def test_breed_keeps_elite_fitness_and_limits():
+    random.seed(2)
+    rng = np.random.default_rng(0)
+    X = rng.uniform(-1, 1, (50, 2))
+    y = X[:, 0] * X[:, 1]
+    population = _population(40)
+    population.evaluate(X, y, loss_function.mse)
+    elites = elite_indices(population.fitness, 3)
+    expected = [(population.individual(i)[0].copy(), population.fitness[i]) for i in elites]
+
+    population.breed(0.9, 3, 3, max_tree_depth=MAX_DEPTH, max_tree_size=MAX_SIZE, rng=rng)
+    assert population.population_size == 40
+    for i, (codes, fitness) in enumerate(expected):
+        np.testing.assert_array_equal(population.individual(i)[0], codes)
+        assert population.fitness[i] == fitness
+    assert np.isnan(population.fitness[3:]).all()
+    for tree in population.to_trees():
+        assert tree.root.height <= MAX_DEPTH and tree.root.size <= MAX_SIZE
+
+    population.evaluate(X, y, loss_function.mse)
+    assert population.evaluation_stats["cached"] == 3
+
+
+def test_nan_loss_is_stored_as_inf():
+    # x0 - x0 is NaN on the inf row
+    population = ArrayPopulation(DEFAULT_FUNC_SET, VARIABLES)
+    tree = GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode(DEFAULT_FUNC_SET[1], [GPNode("x0"), GPNode("x0")]))
+    population.set_trees([tree, tree.copy()])
+    X = np.array([[np.inf, 0.0], [1.0, 0.0]])
+    with np.errstate(invalid="ignore"):
+        population.evaluate(X, np.zeros(2), loss_function.mse)
+        assert population.fitness.tolist() == [np.inf, np.inf]
+        population.evaluate(X, np.zeros(2), loss_function.mse)
+    assert population.evaluation_stats["evaluated"] == 0
@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils import loss_function
+from genetic_algorithm.array_population import ArrayPopulation
+from genetic_algorithm.evolution import EvolutionEngine
+from genetic_algorithm.population import GAPopulation
+from symbolic_regression.estimator import DEFAULT_FUNC_SET
+
+VARIABLES = ["x0", "x1"]
+rng = np.random.default_rng(0)
+X = rng.uniform(-2, 2, (80, 2))
+y = X[:, 0] ** 2 - X[:, 1]
+
+
+def _engine(backend: str = "tree", func_set=DEFAULT_FUNC_SET, **kwargs) -> EvolutionEngine:
+    random.seed(0)
+    np.random.seed(0)
+    if backend == "array":
+        population = ArrayPopulation(func_set, VARIABLES, use_erc=True)
+        population.initialize(40, max_depth=4)
+    else:
+        population = GAPopulation(40)
+        population.initialize(func_set, VARIABLES, use_erc=True, max_depth=4)
+    return EvolutionEngine(population, elitism_size=2, max_tree_depth=8, **kwargs)
+
+
+@pytest.mark.parametrize("backend, selection", [("tree", "tournament"), ("tree", "lexicase"),
+                                                ("array", "tournament")])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, backend, selection):
+    full = _engine(backend, selection=selection)
+    full.evolve(X, y, loss_function.mse, generations=6, verbose=False)
+
+    path = str(tmp_path / "run.npz")
+    _engine(backend, selection=selection, checkpoint_path=path, checkpoint_interval=3).evolve(
+        X, y, loss_function.mse, generations=3, verbose=False)
+    # Global random state moves on in between, the checkpoint restores it
+    random.seed(123)
+    np.random.seed(123)
+    resumed = _engine(backend, selection=selection)
+    resumed.evolve(X, y, loss_function.mse, generations=6, verbose=False, resume_from=path)
+
+    assert resumed.history == full.history
+    assert resumed.best_individual.fitness == full.best_individual.fitness
+    assert repr(resumed.best_individual) == repr(full.best_individual)
+
+
+def _checkpoint(tmp_path) -> str:
+    path = str(tmp_path / "run.npz")
+    _engine(checkpoint_path=path).evolve(X, y, loss_function.mse, generations=1, verbose=False)
+    return path
+
+
+def test_version_mismatch_is_rejected(tmp_path):
+    path = _checkpoint(tmp_path)
+    with np.load(path) as data:
+        state = {key: data[key] for key in data.files}
+    state["version"] = np.array(state["version"] + 1)
+    np.savez(path, **state)
+    with pytest.raises(ValueError, match="version"):
+        _engine().evolve(X, y, loss_function.mse, generations=2, verbose=False, resume_from=path)
+
+
+def test_function_set_mismatch_is_rejected(tmp_path):
+    path = _checkpoint(tmp_path)
+    with pytest.raises(ValueError, match="function set"):
+        _engine(func_set=DEFAULT_FUNC_SET[::-1]).evolve(X, y, loss_function.mse, generations=2, verbose=False,
+                                                        resume_from=path)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from utils import loss_function
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from genetic_algorithm.constant_optimizer import ConstantOptimizer
+from genetic_algorithm.fitness_cache import FitnessCache
+from genetic_algorithm.population import GAPopulation
+from symbolic_regression.estimator import DEFAULT_FUNC_SET, SymbolicRegressor
+
+ADD, MUL = DEFAULT_FUNC_SET[0], DEFAULT_FUNC_SET[2]
+X = np.random.default_rng(0).uniform(-2, 2, (50, 1))
+y = 3.0 * X[:, 0] + 1.0
+
+
+def _tree(scale: float, offset: float) -> GPTree:
+    root = GPNode(ADD, [GPNode(MUL, [GPNode(scale, is_learnable=True), GPNode("x0")]),
+                        GPNode(offset, is_learnable=True)])
+    return GPTree(DEFAULT_FUNC_SET, ["x0"], root=root)
+
+
+def test_tuned_trees_get_new_case_errors():
+    population = GAPopulation(3, fitness_cache=FitnessCache(), keep_case_errors=True)
+    population.population = [_tree(1.0, 0.0), _tree(1.0, 0.0), _tree(0.5, -1.0)]
+    population.evaluate(X, y, loss_function.mse)
+    ConstantOptimizer(top_k=3).optimize(population, X, y, loss_function.mse)
+    assert population.population[0].fitness < 1e-6
+
+    expected = GAPopulation(3, keep_case_errors=True)
+    expected.population = [tree.copy() for tree in population.population]
+    expected.evaluate(X, y, loss_function.mse)
+    np.testing.assert_array_equal(population.case_errors, expected.case_errors)
+    for key, row in population._case_error_rows.items():
+        assert population.population[row].structural_hash() == key
+
+    # A tree with the original constants is scored again rather than served the tuned row
+    population.population = [_tree(1.0, 0.0)] + population.population[1:]
+    population.evaluate(X, y, loss_function.mse)
+    np.testing.assert_array_equal(population.case_errors[0], np.abs(X[:, 0] - y).astype(np.float32))
+
+
+def test_lexicase_with_constant_optimization():
+    estimator = SymbolicRegressor(population_size=40, generations=3, selection="lexicase", optimize_constants=True,
+                                  use_erc=True, random_state=0, verbose=False)
+    estimator.fit(X, y)
+    population = estimator.engine_.population
+    expected = GAPopulation(len(population.population), keep_case_errors=True)
+    expected.population = [tree.copy() for tree in population.population]
+    expected.evaluate(X, y, loss_function.mse)
+    np.testing.assert_allclose(population.case_errors, expected.case_errors, rtol=1e-6)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from genetic_algorithm.evolution import EvolutionEngine
+from genetic_algorithm.population import GAPopulation
+from genetic_algorithm.sampling import ProgressiveSampler
+from genetic_algorithm.stopping import StoppingCriterion
+from symbolic_regression.estimator import SymbolicRegressor
+
+
+def test_racing_is_rejected_with_a_sampler():
+    with pytest.raises(ValueError, match="racing"):
+        EvolutionEngine(GAPopulation(10), racing="elite", sampler=ProgressiveSampler(100))
+
+
+def test_estimator_rejects_racing_with_sample_size():
+    X = np.random.default_rng(0).random((200, 2))
+    estimator = SymbolicRegressor(population_size=20, generations=1, racing=0.5, sample_size=50, verbose=False)
+    with pytest.raises(ValueError, match="racing"):
+        estimator.fit(X, X[:, 0])
+
+
+def test_stopping_criterion_must_implement_should_stop():
+    class Incomplete(StoppingCriterion):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_stopping_criteria_are_rejected_in_island_mode():
+    X = np.random.default_rng(0).random((50, 2))
+    estimator = SymbolicRegressor(population_size=20, generations=1, n_islands=2, patience=3, verbose=False)
+    with pytest.raises(ValueError, match="island mode"):
+        estimator.fit(X, X[:, 0])
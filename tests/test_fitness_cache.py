@@ -0,0 +1,32 @@
+import numpy as np
+
+from utils import loss_function
+from utils.gp_function import GPFunction
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from genetic_algorithm.fitness_cache import FitnessCache
+from genetic_algorithm.population import GAPopulation
+
+ADD = GPFunction("add", np.add, 2)
+
+
+def _tree(constant: float) -> GPTree:
+    root = GPNode(ADD, [GPNode("x0"), GPNode(constant, is_learnable=True)])
+    return GPTree([ADD], ["x0"], root=root)
+
+
+def test_cached_fitness_is_not_shared_by_colliding_constants():
+    # hash(-1.0) == hash(-2.0) in CPython; y = x0 - 2 is fitted exactly by the second tree
+    X = np.array([[0.0], [1.0], [2.0]])
+    y = X[:, 0] - 2.0
+    population = GAPopulation(2, fitness_cache=FitnessCache())
+    population.population = [_tree(-1.0), _tree(-2.0)]
+    population.evaluate(X, y, loss_function.mse)
+    assert population.population[0].fitness == 1.0
+    assert population.population[1].fitness == 0.0
+
+    # Served from the cache on the next evaluation
+    population.population = [_tree(-2.0), _tree(-1.0)]
+    population.evaluate(X, y, loss_function.mse)
+    assert population.evaluation_stats["cached"] == 2
+    assert [tree.fitness for tree in population.population] == [0.0, 1.0]
@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils.gp_codegen import FunctionCache
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from genetic_algorithm.population import GAPopulation
+from symbolic_regression.estimator import DEFAULT_FUNC_SET
+
+ADD = DEFAULT_FUNC_SET[0]
+VARIABLES = ["x0", "x1"]
+X = np.random.default_rng(0).uniform(-3, 3, (64, 2))
+
+
+def test_to_function_matches_eval_array():
+    random.seed(0)
+    population = GAPopulation(80)
+    population.initialize(DEFAULT_FUNC_SET, VARIABLES, use_erc=True, max_depth=6)
+    population.population.append(GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode(1.25)))
+    with np.errstate(all="ignore"):
+        for tree in population.population:
+            expected = tree.compile().execute(X)
+            function = tree.to_function(FunctionCache())
+            np.testing.assert_array_equal(function(X), expected)
+            # eval_array now goes through the compiled function
+            np.testing.assert_array_equal(tree.eval_array(X), expected)
+
+
+def _tree(constant: float) -> GPTree:
+    return GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode(ADD, [GPNode("x0"), GPNode(constant)]))
+
+
+def test_function_cache_counts_hits_and_shares_functions():
+    cache = FunctionCache(maxsize=4)
+    first = _tree(1.0).to_function(cache)
+    assert _tree(1.0).to_function(cache) is first
+    assert _tree(2.0).to_function(cache) is not first
+    info = cache.info()
+    assert (info["hits"], info["misses"], info["size"]) == (1, 2, 2)
+    assert info["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_function_cache_evicts_least_recently_used():
+    cache = FunctionCache(maxsize=2)
+    functions = [_tree(float(i)).to_function(cache) for i in range(2)]
+    _tree(0.0).to_function(cache)  # 0 becomes the most recently used
+    _tree(2.0).to_function(cache)
+    assert len(cache) == 2 and cache.evictions == 1
+    assert _tree(0.0).to_function(cache) is functions[0]
+    assert _tree(1.0).to_function(cache) is not functions[1]
+
+    cache.resize(1)
+    assert len(cache) == 1 and cache.evictions == 3
+    cache.resize(0)
+    _tree(5.0).to_function(cache)
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        cache.resize(-1)
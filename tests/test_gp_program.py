@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils.gp_node import GPNode
+from utils.gp_program import CONST, ERC, VAR, GPProgram
+from utils.gp_tree import GPTree
+from genetic_algorithm.population import GAPopulation
+from symbolic_regression.estimator import DEFAULT_FUNC_SET
+
+ADD, MUL, SIN = DEFAULT_FUNC_SET[0], DEFAULT_FUNC_SET[2], DEFAULT_FUNC_SET[4]
+VARIABLES = ["x0", "x1", "x2"]
+X = np.random.default_rng(0).uniform(-3, 3, (64, 3))
+
+
+def _reference(tree: GPTree, X: np.ndarray) -> np.ndarray:
+    # Recursive evaluation on whole columns, constants broadcast to full columns
+    def evaluate(node: GPNode) -> np.ndarray:
+        if node.is_function():
+            return node.value(*[evaluate(child) for child in node.next])
+        if isinstance(node.value, str):
+            return X[:, tree.variables.index(node.value)]
+        return np.full(X.shape[0], float(node.value))
+    return evaluate(tree.root)
+
+
+def _trees(n: int = 60):
+    random.seed(0)
+    population = GAPopulation(n)
+    population.initialize(DEFAULT_FUNC_SET, VARIABLES, use_erc=True, max_depth=5)
+    # Fixed constants, learnable constants and a bare terminal
+    population.population += [
+        GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode(ADD, [GPNode(2.5), GPNode(SIN, [GPNode("x1")])])),
+        GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode(MUL, [GPNode(-1.5, is_learnable=True), GPNode("x2")])),
+        GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode(0.75)),
+        GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode("x0")),
+    ]
+    return population.population
+
+
+def test_execute_matches_recursive_evaluation():
+    with np.errstate(all="ignore"):
+        for tree in _trees():
+            program = tree.compile()
+            np.testing.assert_allclose(program.execute(X), _reference(tree, X), rtol=1e-12, equal_nan=True)
+            out = np.empty(len(X))
+            assert program.execute(X, out=out) is out
+            np.testing.assert_allclose(out, _reference(tree, X), rtol=1e-12, equal_nan=True)
+
+
+def test_constant_opcodes():
+    tree = GPTree(DEFAULT_FUNC_SET, VARIABLES,
+                  root=GPNode(ADD, [GPNode(2.5), GPNode(MUL, [GPNode(-1.5, is_learnable=True), GPNode("x2")])]))
+    program = tree.compile()
+    assert program.codes.tolist() == [0, CONST, 2, ERC, VAR]
+    assert program.operands.tolist() == [0, 0, 0, 0, 2]
+    assert program.constants.tolist() == [0.0, 2.5, 0.0, -1.5, 0.0]
+    np.testing.assert_array_equal(program.execute(X), 2.5 - 1.5 * X[:, 2])
+
+
+def test_decode_round_trips():
+    for tree in _trees():
+        program = tree.compile()
+        root = program.to_node(VARIABLES)
+        assert repr(GPTree(DEFAULT_FUNC_SET, VARIABLES, root=root)) == repr(tree)
+        assert root.structural_hash() == tree.root.structural_hash()
+        recompiled = GPProgram.compile(root, DEFAULT_FUNC_SET, VARIABLES)
+        for name in ("codes", "operands", "constants"):
+            np.testing.assert_array_equal(getattr(recompiled, name), getattr(program, name))
+
+
+def test_unmapped_variable_raises():
+    tree = GPTree(DEFAULT_FUNC_SET, VARIABLES, root=GPNode(ADD, [GPNode("x0"), GPNode("x2")]))
+    with pytest.raises(ValueError, match="not mapped"):
+        tree.compile().execute(X, columns=[0, 1, -1])
+    with pytest.raises(ValueError, match="not mapped"):
+        tree.eval_array(X, variable_index={"x0": 0, "x1": 1})
+    # Remapped columns are used as given
+    np.testing.assert_array_equal(tree.eval_array(X, variable_index={"x0": 1, "x1": 0, "x2": 2}),
+                                  X[:, 1] + X[:, 2])
+
+
+def test_unknown_variable_is_rejected_at_compile_time():
+    with pytest.raises(ValueError, match="Unknown variable"):
+        GPProgram.compile(GPNode("z"), DEFAULT_FUNC_SET, VARIABLES)
@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+from utils import loss_function
+from genetic_algorithm.islands import emigrate, immigrate
+from genetic_algorithm.population import GAPopulation
+from symbolic_regression.estimator import DEFAULT_FUNC_SET, SymbolicRegressor
+
+rng = np.random.default_rng(0)
+X = rng.uniform(-2, 2, (60, 2))
+y = X[:, 0] * X[:, 1] + X[:, 0]
+
+
+def _population(size: int) -> GAPopulation:
+    population = GAPopulation(size, keep_case_errors=True)
+    population.initialize(DEFAULT_FUNC_SET, ["x0", "x1"], max_depth=4)
+    population.evaluate(X, y, loss_function.mse)
+    return population
+
+
+def test_immigration_keeps_case_errors_aligned():
+    random.seed(1)
+    island, neighbour = _population(20), _population(20)
+    immigrants, rows = emigrate(neighbour, 5)
+    assert [tree.fitness for tree in immigrants] == sorted(tree.fitness for tree in neighbour.population)[:5]
+    immigrate(island, immigrants, rows)
+    assert island.population[-5:] == immigrants
+
+    expected = GAPopulation(20, keep_case_errors=True)
+    expected.population = [tree.copy() for tree in island.population]
+    expected.evaluate(X, y, loss_function.mse)
+    np.testing.assert_array_equal(island.case_errors, expected.case_errors)
+    for key, row in island._case_error_rows.items():
+        assert island.population[row].structural_hash() == key
+
+
+def test_lexicase_runs_in_island_mode():
+    estimator = SymbolicRegressor(population_size=40, generations=4, n_islands=2, migration_interval=2,
+                                  selection="lexicase", random_state=0, verbose=False)
+    estimator.fit(X, y)
+    assert np.isfinite(estimator.best_estimator_.fitness)
+
+
+def test_islands_inherit_population_settings():
+    estimator = SymbolicRegressor(population_size=60, generations=3, n_islands=2, simplify=True,
+                                  random_state=0, verbose=False)
+    estimator.fit(X, y)
+    population = estimator.engine_.population.population
+    assert len(population) == 60
+    for tree in population:
+        simplified = tree.copy()
+        simplified.simplify()
+        assert simplified.root.size == tree.root.size
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from genetic_algorithm.selection import lexicase_selection, _median_absolute_deviation
+
+
+def _reference(errors: np.ndarray, n_selections: int, rng: np.random.Generator, epsilon: np.ndarray) -> np.ndarray:
+    """Per-parent epsilon-lexicase: filter the whole population over a shuffle of the cases."""
+    picks = np.empty(n_selections, dtype=np.intp)
+    for i in range(n_selections):
+        candidates = np.arange(len(errors))
+        for case in rng.permutation(errors.shape[1]):
+            column = errors[candidates, case]
+            candidates = candidates[column <= column.min() + epsilon[case]]
+            if len(candidates) == 1:
+                break
+        picks[i] = candidates[rng.integers(len(candidates))]
+    return picks
+
+
+def _frequencies(picks: np.ndarray, n: int) -> np.ndarray:
+    return np.bincount(picks, minlength=n) / len(picks)
+
+
+@pytest.mark.parametrize("epsilon", [None, 0.0])
+def test_matches_per_parent_reference(epsilon):
+    rng = np.random.default_rng(0)
+    errors = np.abs(rng.normal(size=(12, 6))).astype(np.float32)
+    errors[[3, 7]] = errors[2]  # Clones
+    errors[9] = np.inf  # Failed evaluation
+    tolerance = _median_absolute_deviation(np.ascontiguousarray(errors.T)) if epsilon is None \
+        else np.zeros(errors.shape[1])
+    n = 20000
+    fast = _frequencies(lexicase_selection(errors, n, np.random.default_rng(1), epsilon), len(errors))
+    reference = _frequencies(_reference(errors, n, np.random.default_rng(2), tolerance), len(errors))
+    np.testing.assert_allclose(fast, reference, atol=0.015)
+
+
+def test_ties_are_broken_over_individuals_not_groups():
+    # Three clones and one distinct row, all within epsilon on every case
+    errors = np.array([[1.0, 1.0], [1.0, 1.0], [1.0, 1.0], [1.1, 1.1]])
+    picks = lexicase_selection(errors, 20000, np.random.default_rng(0), epsilon=0.5)
+    assert abs(np.mean(picks < 3) - 0.75) < 0.015
+
+
+def test_large_tied_sets_terminate():
+    # 100 distinct rows within epsilon of each other: blocks stay below max_block
+    rng = np.random.default_rng(0)
+    distinct = 1 + 0.01 * rng.random((100, 200))
+    errors = distinct[rng.integers(0, 100, size=1000)]
+    picks = lexicase_selection(errors, 1900, rng, epsilon=0.1)
+    assert len(picks) == 1900 and picks.max() < 1000
+
+
+def test_many_selections_on_a_tiny_matrix_terminate():
+    errors = np.array([[1.0, 2.0, 3.0], [1.0, 2.0, 3.0], [3.0, 2.0, 1.0], [2.0, 2.0, 2.0]])
+    picks = lexicase_selection(errors, 200000, np.random.default_rng(0), epsilon=0.0)
+    # Row 3 is never the best on any case
+    assert not np.any(picks == 3)
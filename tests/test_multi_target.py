@@ -0,0 +1,35 @@
+import numpy as np
+
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from symbolic_regression.estimator import SymbolicRegressor, DEFAULT_FUNC_SET
+from symbolic_regression.serving import Predictor
+
+ADD = DEFAULT_FUNC_SET[0]
+
+
+def _tree(constant: float) -> GPTree:
+    root = GPNode(ADD, [GPNode("x0"), GPNode(constant, is_learnable=True)])
+    return GPTree(DEFAULT_FUNC_SET, ["x0"], root=root)
+
+
+def test_targets_only_share_predictions_of_identical_trees():
+    estimator = SymbolicRegressor(verbose=False)
+    # hash(-1.0) == hash(-2.0) in CPython
+    estimator.best_estimators_ = [_tree(-1.0), _tree(-2.0), _tree(-1.0)]
+    estimator.predictors_ = [Predictor(tree) for tree in estimator.best_estimators_]
+    X = np.array([[0.0], [1.0], [2.0]])
+    np.testing.assert_array_equal(estimator.predict(X), [[-1.0, -2.0, -1.0], [0.0, -1.0, 0.0], [1.0, 0.0, 1.0]])
+
+
+def test_multi_target_fit_returns_one_model_per_target():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(-1, 1, (200, 2))
+    Y = np.column_stack([X[:, 0] * X[:, 1], X[:, 0] + 1.0, np.sin(X[:, 1])])
+    for mode in ("per_target", "shared"):
+        estimator = SymbolicRegressor(population_size=50, generations=2, random_state=0, multi_target=mode,
+                                      verbose=False).fit(X, Y)
+        predictions = estimator.predict(X)
+        assert predictions.shape == Y.shape
+        losses = np.mean((predictions - Y) ** 2, axis=0)
+        np.testing.assert_allclose(losses, [tree.fitness for tree in estimator.best_estimators_])
@@ -0,0 +1,102 @@
+import random
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from utils import loss_function
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from genetic_algorithm import parallel
+from genetic_algorithm.parallel import ParallelEvaluator
+from genetic_algorithm.population import GAPopulation
+from symbolic_regression.estimator import DEFAULT_FUNC_SET
+
+SUB = DEFAULT_FUNC_SET[1]
+
+
+def _population(n_jobs: int, trees):
+    population = GAPopulation(len(trees), n_jobs=n_jobs)
+    population.population = [tree.copy() for tree in trees]
+    return population
+
+
+def _fitness(n_jobs: int, trees, X, y):
+    population = _population(n_jobs, trees)
+    try:
+        population.evaluate(X, y, loss_function.mse)
+    finally:
+        population.close()
+    return [tree.fitness for tree in population.population]
+
+
+def test_parallel_fitness_matches_serial():
+    random.seed(0)
+    rng = np.random.default_rng(0)
+    X = rng.uniform(-2, 2, (300, 2))
+    y = X[:, 0] ** 2 + np.sin(X[:, 1])
+    population = GAPopulation(40)
+    population.initialize(DEFAULT_FUNC_SET, ["x0", "x1"], use_erc=True, max_depth=5)
+    trees = population.population
+    np.testing.assert_allclose(_fitness(2, trees, X, y), _fitness(1, trees, X, y), rtol=1e-12)
+
+
+def test_non_finite_losses_are_inf_in_both_modes():
+    # x0 - x0 is NaN on the inf rows
+    X = np.array([[np.inf, 1.0], [1.0, 2.0], [2.0, 3.0], [3.0, 4.0]])
+    y = np.zeros(4)
+    trees = [GPTree(DEFAULT_FUNC_SET, ["x0", "x1"], root=GPNode(SUB, [GPNode("x0"), GPNode("x0")]))
+             for _ in range(4)]
+    with np.errstate(invalid="ignore"):
+        assert _fitness(1, trees, X, y) == [np.inf] * 4
+        assert _fitness(2, trees, X, y) == [np.inf] * 4
+
+
+def _exists(name: str) -> bool:
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    block.close()
+    return True
+
+
+def test_bind_reshares_only_changed_data_and_close_unlinks():
+    evaluator = ParallelEvaluator(2, DEFAULT_FUNC_SET)
+    X = np.ones((10, 2))
+    try:
+        evaluator.bind(X, np.zeros(10))
+        x_name, y_name = evaluator._X_descriptor[0], evaluator._y_descriptor[0]
+        # Same X object and equal y values keep their blocks
+        evaluator.bind(X, np.zeros(10))
+        assert (evaluator._X_descriptor[0], evaluator._y_descriptor[0]) == (x_name, y_name)
+
+        evaluator.bind(X.copy(), np.ones(10))
+        assert evaluator._X_descriptor[0] != x_name and evaluator._y_descriptor[0] != y_name
+        assert not _exists(x_name) and not _exists(y_name)
+        assert len(evaluator._blocks) == 2
+    finally:
+        names = [block.name for block in evaluator._blocks]
+        evaluator.close()
+    assert not any(_exists(name) for name in names)
+    with pytest.raises(ValueError, match="bind"):
+        evaluator.evaluate([GPTree(DEFAULT_FUNC_SET, ["x0"], root=GPNode("x0")).compile()], loss_function.mse)
+
+
+def test_workers_release_blocks_of_previous_datasets():
+    evaluator = ParallelEvaluator(1, DEFAULT_FUNC_SET)
+    try:
+        evaluator.bind(np.ones((5, 1)), np.zeros(5))
+        old = (evaluator._X_descriptor, evaluator._y_descriptor)
+        for descriptor in old:
+            parallel._attach(descriptor)
+        evaluator.bind(np.full((5, 1), 2.0), np.ones(5))
+        new = (evaluator._X_descriptor, evaluator._y_descriptor)
+        parallel._release_stale([descriptor[0] for descriptor in new])
+        assert not any(descriptor[0] in parallel._worker_blocks for descriptor in old)
+
+        # The pool sees the rebound data
+        program = GPTree(DEFAULT_FUNC_SET, ["x0"], root=GPNode("x0")).compile()
+        assert evaluator.evaluate([program], loss_function.mse) == [1.0]
+    finally:
+        evaluator.close()
@@ -0,0 +1,20 @@
+import numpy as np
+
+from genetic_algorithm.selection import batch_tournament, fitness_array
+
+
+class _Individual:
+    def __init__(self, fitness):
+        self.fitness = fitness
+
+
+def test_fitness_array_maps_missing_and_non_finite_fitness_to_inf():
+    fitness = fitness_array([_Individual(value) for value in (0.1, None, float("nan"), float("-inf"), 0.3)])
+    np.testing.assert_array_equal(fitness, [0.1, np.inf, np.inf, np.inf, 0.3])
+
+
+def test_nan_fitness_only_wins_tournaments_it_is_alone_in():
+    fitness = fitness_array([_Individual(value) for value in (0.1, 0.2, float("nan"), 0.3, 0.4)])
+    winners = batch_tournament(fitness, 10000, np.random.default_rng(0), tournament_size=3)
+    # Contestants are drawn with replacement: all three are the NaN individual 1 time in 125
+    assert np.mean(winners == 2) < 0.02
@@ -0,0 +1,70 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from symbolic_regression.estimator import DEFAULT_FUNC_SET, SymbolicRegressor
+from symbolic_regression.serving import Predictor
+
+SIN, COS = DEFAULT_FUNC_SET[4], DEFAULT_FUNC_SET[5]
+# Documented in Predictor.predict_one
+PREDICT_ONE_RTOL = 1e-12
+
+rng = np.random.default_rng(0)
+X = rng.uniform(-2, 2, (5000, 2))
+y = np.sin(X[:, 0]) * X[:, 1] + X[:, 0] ** 2
+
+
+@pytest.fixture(scope="module")
+def estimator():
+    return SymbolicRegressor(population_size=100, generations=5, random_state=0, verbose=False).fit(X, y)
+
+
+def test_chunked_and_threaded_predict_match_estimator(estimator):
+    expected = estimator.predict(X)
+    for chunk_size, n_jobs in ((len(X), 1), (700, 1), (700, 3)):
+        with Predictor(estimator.best_estimator_, chunk_size=chunk_size, n_jobs=n_jobs) as predictor:
+            np.testing.assert_array_equal(predictor.predict(X), expected)
+
+
+def test_predict_into_out(estimator):
+    predictor = Predictor(estimator.best_estimator_, chunk_size=1000, n_jobs=2)
+    out = np.empty(len(X))
+    assert predictor.predict(X, out=out) is out
+    np.testing.assert_array_equal(out, estimator.predict(X))
+    with pytest.raises(ValueError, match="out"):
+        predictor.predict(X, out=np.empty(len(X) - 1))
+    predictor.close()
+
+
+def test_pickle_round_trip(estimator):
+    predictor = Predictor(estimator.best_estimator_, chunk_size=1000, n_jobs=2)
+    restored = pickle.loads(pickle.dumps(predictor))
+    assert (restored.chunk_size, restored.n_jobs) == (1000, 2)
+    np.testing.assert_array_equal(restored.predict(X), estimator.predict(X))
+    restored_estimator = pickle.loads(pickle.dumps(estimator))
+    np.testing.assert_array_equal(restored_estimator.predict(X), estimator.predict(X))
+    predictor.close()
+    restored.close()
+
+
+def test_predict_one_matches_predict(estimator):
+    expected = estimator.predict(X[:200])
+    actual = [estimator.predict_one(row) for row in X[:200]]
+    np.testing.assert_allclose(actual, expected, rtol=PREDICT_ONE_RTOL)
+    assert isinstance(actual[0], float)
+
+
+def test_too_deep_trees_fall_back_to_the_interpreter():
+    root = GPNode("x0")
+    for i in range(300):
+        root = GPNode(SIN if i % 2 else COS, [root])
+    tree = GPTree(DEFAULT_FUNC_SET, ["x0", "x1"], root=root)
+    predictor = Predictor(tree, chunk_size=700, n_jobs=2)
+    assert predictor._function is None
+    expected = tree.compile().execute(X)
+    np.testing.assert_array_equal(predictor.predict(X), expected)
+    np.testing.assert_allclose(predictor.predict_one(X[0]), expected[0], rtol=PREDICT_ONE_RTOL)
+    predictor.close()
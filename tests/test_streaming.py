@@ -0,0 +1,47 @@
+import numpy as np
+
+from utils import loss_function
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from genetic_algorithm.population import GAPopulation
+from genetic_algorithm.streaming import ChunkedDataset, evaluate_streaming
+from symbolic_regression.estimator import DEFAULT_FUNC_SET
+
+ADD, SUB = DEFAULT_FUNC_SET[0], DEFAULT_FUNC_SET[1]
+
+# x0 - x0 is NaN on the inf row
+X = np.array([[1.0], [2.0], [np.inf], [3.0], [4.0], [5.0]])
+y = np.array([1.0, 2.0, 0.0, 3.0, 4.0, 5.0])
+
+
+def _trees():
+    variables = ["x0"]
+    return [GPTree(DEFAULT_FUNC_SET, variables, root=GPNode(SUB, [GPNode("x0"), GPNode("x0")])),
+            GPTree(DEFAULT_FUNC_SET, variables, root=GPNode(ADD, [GPNode("x0"), GPNode(1.0)]))]
+
+
+def _fitness(data, target_values, threshold=None):
+    population = GAPopulation(2)
+    population.population = _trees()
+    with np.errstate(invalid="ignore"):
+        population.evaluate(data, target_values, loss_function.mse, threshold=threshold)
+    return [tree.fitness for tree in population.population]
+
+
+def test_streamed_nan_loss_is_inf_like_in_memory():
+    in_memory = _fitness(X, y)
+    assert in_memory[0] == np.inf
+    assert _fitness(ChunkedDataset(X, y, chunk_size=2), None) == in_memory
+
+
+def test_racing_scores_nan_loss_as_inf():
+    fitness = _fitness(X[[0, 1, 3, 4, 5, 2]], y[[0, 1, 3, 4, 5, 2]], threshold=1e9)
+    assert fitness[0] == np.inf
+
+
+def test_nan_model_stops_being_scored():
+    dataset = ChunkedDataset(X, y, chunk_size=2)
+    with np.errstate(invalid="ignore"):
+        fitness, rows = evaluate_streaming([tree.eval_array for tree in _trees()], dataset, loss_function.mse)
+    assert fitness[0] == np.inf
+    assert rows == [4, 6]
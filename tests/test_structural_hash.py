@@ -0,0 +1,30 @@
+import numpy as np
+
+from utils.gp_function import GPFunction
+from utils.gp_node import GPNode
+from utils.gp_tree import GPTree
+from utils.subtree_cache import SubtreeCache
+
+ADD = GPFunction("add", np.add, 2)
+
+
+def _tree(constant: float) -> GPTree:
+    root = GPNode(ADD, [GPNode("x0"), GPNode(constant, is_learnable=True)])
+    return GPTree([ADD], ["x0"], root=root)
+
+
+def test_constants_with_equal_python_hashes_get_distinct_keys():
+    # hash(-1.0) == hash(-2.0) in CPython
+    assert _tree(-1.0).structural_hash() != _tree(-2.0).structural_hash()
+
+
+def test_identical_structures_share_a_key():
+    assert _tree(0.5).structural_hash() == _tree(0.5).structural_hash()
+    assert GPNode("x0").structural_hash() != GPNode(0.0, is_learnable=True).structural_hash()
+
+
+def test_subtree_cache_does_not_mix_colliding_constants():
+    X = np.array([[0.0], [1.0], [2.0]])
+    cache = SubtreeCache()
+    np.testing.assert_array_equal(_tree(-1.0).eval_array(X, cache=cache), [-1.0, 0.0, 1.0])
+    np.testing.assert_array_equal(_tree(-2.0).eval_array(X, cache=cache), [-2.0, -1.0, 0.0])